@@ -13,7 +13,51 @@
 //
 // CRETONNE_TARGETS (Optional)
 //     A setting for conditional compilation of isa targets. Possible values can be "native" or
-//     known isa targets separated by ','.
+//     known isa targets separated by ','. Tables are only generated for the selected targets.
+//
+// CRETONNE_META_CACHE (Optional)
+//     Directory where the meta build script caches generated sources. When none of the meta
+//     sources have changed, the generated files are copied from the cache instead.
+//
+// CRETONNE_PERFECT_HASH (Optional)
+//     When set to a non-empty value, the encoding lookup tables are generated as perfect hash
+//     tables, so each lookup examines a single table entry.
+//
+// CRETONNE_ENCODING_PROFILE (Optional)
+//     Path to a lookup frequency profile for the encoding tables. The most frequently used
+//     encodings are placed first in their hash tables. See `meta/encoding_profile.py`.
+//
+// CRETONNE_PREDICATE_PROFILE (Optional)
+//     Path to an outcome profile for the generated predicates. The operands of `&&` and `||`
+//     expressions are ordered so the ones that most often decide the result are evaluated first.
+//     Without a profile, they are ordered by estimated cost. See `meta/predicate_profile.py`.
+//
+// CRETONNE_PACK_TABLES (Optional)
+//     When set to a non-empty value, the sequence tables like `ENCLISTS` are packed by overlapping
+//     the end of one sequence with the beginning of another.
+//
+// CRETONNE_DENSE_LEVEL2 (Optional)
+//     A density between 0 and 1. Encoding level 2 tables where at least this fraction of the
+//     opcodes up to the largest one have encodings are generated as direct arrays indexed by
+//     opcode instead of hash tables. This trades table size for faster lookups.
+//
+// CRETONNE_ENCLIST_FORMAT (Optional)
+//     Word type of the encoding lists, `u16` or `u32`. By default, each ISA uses the smallest type
+//     that can represent its encoding lists.
+//
+// CRETONNE_SPECIALIZE_PRESETS (Optional)
+//     When set to a non-empty value, additional encoding tables are generated for each settings
+//     preset, such as `haswell` for Intel. The ISA predicates are resolved in these tables, and
+//     an ISA whose flags match a preset uses its tables.
+//
+// CRETONNE_ENCLIST_CACHE (Optional)
+//     When set to a non-empty value, the encoding lists that test ISA predicates are described in
+//     an `ISAP_ENCLISTS` table. The ISA evaluates their ISA predicates once and keeps a copy of
+//     each list without them, so later lookups don't test the same settings again.
+//
+// NUM_JOBS (Optional)
+//     Number of parallel jobs provided by Cargo. The meta build script uses this many processes
+//     to generate the per-ISA sources.
 //
 // The build script expects to be run from the directory where this build.rs file lives. The
 // current directory is used to find the sources.
@@ -29,17 +73,18 @@ fn main() {
     let cretonne_targets = cretonne_targets.as_ref().map(|s| s.as_ref());
 
     // Configure isa targets cfg.
-    match isa_targets(cretonne_targets, &target_triple) {
+    let isa_targets = match isa_targets(cretonne_targets, &target_triple) {
         Ok(isa_targets) => {
             for isa in &isa_targets {
                 println!("cargo:rustc-cfg=build_{}", isa.name());
             }
+            isa_targets
         }
         Err(err) => {
             eprintln!("Error: {}", err);
             process::exit(1);
         }
-    }
+    };
 
     println!("Build script generating files in {}", out_dir);
 
@@ -61,14 +106,57 @@ fn main() {
     // Launch build script with Python. We'll just find python in the path.
     // Use -B to disable .pyc files, because they cause trouble for vendoring
     // scripts, and this is a build step that isn't run very often anyway.
-    let status = process::Command::new("python")
-        .current_dir(crate_dir)
+    let mut cmd = process::Command::new("python");
+    cmd.current_dir(crate_dir)
         .arg("-B")
         .arg(build_script)
         .arg("--out-dir")
-        .arg(out_dir)
-        .status()
-        .expect("Failed to launch second-level build script");
+        .arg(out_dir);
+    // Only generate tables for the ISAs that are compiled in.
+    let isa_names = isa_targets.iter().map(Isa::name).collect::<Vec<_>>();
+    cmd.arg("--isa").arg(isa_names.join(","));
+    if let Ok(jobs) = env::var("NUM_JOBS") {
+        cmd.arg("--jobs").arg(jobs);
+    }
+    println!("cargo:rerun-if-env-changed=CRETONNE_META_CACHE");
+    if let Some(cache_dir) = env::var_os("CRETONNE_META_CACHE") {
+        cmd.arg("--cache-dir").arg(cache_dir);
+    }
+    println!("cargo:rerun-if-env-changed=CRETONNE_PERFECT_HASH");
+    if env::var_os("CRETONNE_PERFECT_HASH").map_or(false, |v| !v.is_empty()) {
+        cmd.arg("--perfect-hash");
+    }
+    println!("cargo:rerun-if-env-changed=CRETONNE_ENCODING_PROFILE");
+    if let Some(profile) = env::var_os("CRETONNE_ENCODING_PROFILE") {
+        cmd.arg("--encoding-profile").arg(profile);
+    }
+    println!("cargo:rerun-if-env-changed=CRETONNE_PREDICATE_PROFILE");
+    if let Some(profile) = env::var_os("CRETONNE_PREDICATE_PROFILE") {
+        cmd.arg("--predicate-profile").arg(profile);
+    }
+    println!("cargo:rerun-if-env-changed=CRETONNE_PACK_TABLES");
+    if env::var_os("CRETONNE_PACK_TABLES").map_or(false, |v| !v.is_empty()) {
+        cmd.arg("--pack-tables");
+    }
+    println!("cargo:rerun-if-env-changed=CRETONNE_DENSE_LEVEL2");
+    if let Some(density) = env::var_os("CRETONNE_DENSE_LEVEL2") {
+        cmd.arg("--dense-level2").arg(density);
+    }
+    println!("cargo:rerun-if-env-changed=CRETONNE_ENCLIST_FORMAT");
+    if let Some(format) = env::var_os("CRETONNE_ENCLIST_FORMAT") {
+        cmd.arg("--enclist-format").arg(format);
+    }
+    println!("cargo:rerun-if-env-changed=CRETONNE_SPECIALIZE_PRESETS");
+    if env::var_os("CRETONNE_SPECIALIZE_PRESETS").map_or(false, |v| !v.is_empty()) {
+        cmd.arg("--specialize-presets");
+    }
+    println!("cargo:rerun-if-env-changed=CRETONNE_ENCLIST_CACHE");
+    if env::var_os("CRETONNE_ENCLIST_CACHE").map_or(false, |v| !v.is_empty()) {
+        cmd.arg("--enclist-cache");
+    }
+    let status = cmd.status().expect(
+        "Failed to launch second-level build script",
+    );
     if !status.success() {
         process::exit(status.code().unwrap());
     }
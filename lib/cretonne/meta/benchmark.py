@@ -0,0 +1,245 @@
+"""
+Benchmarks for the meta generators.
+
+Run this script from the meta directory to time the expensive parts of the
+build script over the real ISA definitions:
+
+    python benchmark.py --output before.json
+    python benchmark.py --compare before.json
+
+Each benchmark runs a fixed number of iterations after a warm-up run, and the
+results are reported as JSON so they can be compared between commits.
+
+The `UniqueSeqTable` and `compute_quadratic` benchmarks replay the calls made
+while generating all the sources, so they measure realistic inputs.
+"""
+from __future__ import absolute_import, print_function
+import argparse
+import gc
+import json
+import os
+import shutil
+import sys
+import tempfile
+import timeit
+from collections import OrderedDict
+import isa
+import srcgen
+import constant_hash
+import unique_table
+import gen_all
+import gen_encoding
+import gen_instr
+import gen_legalizer
+
+try:
+    from typing import Any, Callable, Dict, List, Tuple  # noqa
+    from cdsl.isa import TargetISA  # noqa
+    from cdsl.instructions import InstructionGroup  # noqa
+    Benchmark = Callable[[], Any]
+except ImportError:
+    pass
+
+
+# Bump this when the report format changes.
+REPORT_VERSION = 1
+
+META_DIR = os.path.dirname(os.path.abspath(__file__))
+
+
+class Workload(object):
+    """
+    The inputs to the benchmarks.
+
+    Creating a workload generates all the sources once in `out_dir`, which
+    also records the calls to `UniqueSeqTable.add()` and
+    `compute_quadratic()`.
+    """
+
+    def __init__(self, out_dir):
+        # type: (str) -> None
+        self.out_dir = out_dir
+        self.isas = isa.all_isas()
+        self.groups = isa.instruction_groups()
+        # Sequences added to each `UniqueSeqTable`, in order.
+        self.seq_tables = []  # type: List[List[Tuple[Any, ...]]]
+        # Arguments to each `compute_quadratic()` call.
+        self.hash_tables = []  # type: List[Tuple[List[Any], Callable[[Any], int], int, float]]  # noqa
+        self._record()
+
+    def _record(self):
+        # type: () -> None
+        tables = OrderedDict()  # type: OrderedDict[int, List[Tuple[Any, ...]]]  # noqa
+        orig_add = unique_table.UniqueSeqTable.add
+        orig_quadratic = constant_hash.compute_quadratic
+
+        def add(table, seq):
+            # type: (unique_table.UniqueSeqTable, Any) -> int
+            tables.setdefault(id(table), []).append(tuple(seq))
+            return orig_add(table, seq)
+
+        def compute_quadratic(
+                items, hash_function, seed=0,
+                multiplier=constant_hash.DEFAULT_MULTIPLIER, weight=None):
+            # type: (Any, Callable[[Any], int], int, float, Callable[[Any], int]) -> List[Any]  # noqa
+            items = list(items)
+            self.hash_tables.append((items, hash_function, seed, multiplier))
+            return orig_quadratic(
+                    items, hash_function, seed, multiplier, weight)
+
+        # This also records the layouts tried by `search_quadratic()`.
+        unique_table.UniqueSeqTable.add = add  # type: ignore
+        constant_hash.compute_quadratic = compute_quadratic
+        try:
+            gen_all.generate(self.isas, self.out_dir, groups=self.groups)
+        finally:
+            unique_table.UniqueSeqTable.add = orig_add  # type: ignore
+            constant_hash.compute_quadratic = orig_quadratic
+        self.seq_tables = list(tables.values())
+
+
+def exec_module(relpath, package):
+    # type: (str, str) -> Benchmark
+    """
+    Benchmark executing the module in `relpath` in a fresh namespace. This
+    constructs all the objects defined by the module again without affecting
+    the imported module.
+    """
+    path = os.path.join(META_DIR, relpath)
+    with open(path) as f:
+        code = compile(f.read(), path, 'exec')
+
+    def run():
+        # type: () -> None
+        ns = {
+                '__name__': package + '.__benchmark__',
+                '__package__': package,
+                '__file__': path}  # type: Dict[str, Any]
+        exec(code, ns)
+    return run
+
+
+def benchmarks(work):
+    # type: (Workload) -> OrderedDict[str, Benchmark]
+    """Get the benchmarks for `work`, indexed by name."""
+    b = OrderedDict()  # type: OrderedDict[str, Benchmark]
+
+    b['xforms.base'] = exec_module(os.path.join('base', 'legalize.py'), 'base')
+    b['xforms.intel'] = exec_module(
+            os.path.join('isa', 'intel', 'legalize.py'), 'isa.intel')
+
+    def gen_isa_encoding(target):
+        # type: (TargetISA) -> Benchmark
+        return lambda: gen_encoding.gen_isa(target, srcgen.Formatter())
+    for target in work.isas:
+        b['gen_encoding.' + target.name] = gen_isa_encoding(target)
+
+    b['gen_legalizer'] = lambda: gen_legalizer.generate(
+            work.isas, work.out_dir)
+    b['gen_instr'] = lambda: gen_instr.generate(work.groups, work.out_dir)
+
+    def seq_tables():
+        # type: () -> None
+        for seqs in work.seq_tables:
+            table = unique_table.UniqueSeqTable()
+            for seq in seqs:
+                table.add(seq)
+    b['unique_seq_table'] = seq_tables
+
+    def hash_tables():
+        # type: () -> None
+        for items, hash_function, seed, multiplier in work.hash_tables:
+            constant_hash.compute_quadratic(
+                    items, hash_function, seed, multiplier)
+    b['compute_quadratic'] = hash_tables
+
+    return b
+
+
+def measure(bench, iterations):
+    # type: (Benchmark, int) -> Dict[str, Any]
+    """
+    Run `bench` once to warm up, then time `iterations` runs of it.
+    """
+    bench()
+    times = []  # type: List[float]
+    for _ in range(iterations):
+        gc.collect()
+        start = timeit.default_timer()
+        bench()
+        times.append(timeit.default_timer() - start)
+    ordered = sorted(times)
+    return {
+            'iterations': iterations,
+            'times': times,
+            'min': ordered[0],
+            'median': ordered[len(ordered) // 2],
+            'mean': sum(times) / len(times),
+            'max': ordered[-1]}
+
+
+def run(names=None, iterations=10):
+    # type: (List[str], int) -> Dict[str, Any]
+    """
+    Run the benchmarks whose names start with one of `names`, or all of them.
+
+    Return the JSON report.
+    """
+    out_dir = tempfile.mkdtemp()
+    try:
+        work = Workload(out_dir)
+        results = OrderedDict()  # type: OrderedDict[str, Dict[str, Any]]
+        for name, bench in benchmarks(work).items():
+            if names and not any(name.startswith(n) for n in names):
+                continue
+            results[name] = measure(bench, iterations)
+    finally:
+        shutil.rmtree(out_dir)
+    return {
+            'version': REPORT_VERSION,
+            'python': sys.version.split()[0],
+            'benchmarks': results}
+
+
+def compare(old, new):
+    # type: (Dict[str, Any], Dict[str, Any]) -> None
+    """Print the change in median time between two reports."""
+    for name, r in new['benchmarks'].items():
+        if name not in old['benchmarks']:
+            continue
+        before = old['benchmarks'][name]['median']
+        after = r['median']
+        print('{:24} {:9.2f}ms {:9.2f}ms {:+7.1%}'.format(
+            name, before * 1e3, after * 1e3, after / before - 1))
+
+
+def main():
+    # type: () -> None
+    parser = argparse.ArgumentParser(
+            description='Benchmark the Cretonne meta generators.')
+    parser.add_argument(
+            'names', nargs='*',
+            help='only run benchmarks whose names start with these prefixes')
+    parser.add_argument(
+            '-n', '--iterations', type=int, default=10,
+            help='number of timed runs of each benchmark')
+    parser.add_argument('-o', '--output', help='write the JSON report here')
+    parser.add_argument(
+            '--compare', help='compare with the JSON report in this file')
+    args = parser.parse_args()
+
+    report = run(args.names, args.iterations)
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=2)
+            f.write('\n')
+    if args.compare:
+        with open(args.compare) as f:
+            compare(json.load(f), report)
+    elif not args.output:
+        json.dump(report, sys.stdout, indent=2)
+        print()
+
+
+if __name__ == "__main__":
+    main()
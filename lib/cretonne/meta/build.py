@@ -1,18 +1,149 @@
 # Second-level build script.
 #
 # This script is run from lib/cretonne/build.rs to generate Rust files.
+#
+# The ISA definitions are only loaded when the generated files can't be
+# restored from the output cache, see `build_cache.py`. With a cache directory,
+# the finished ISA model is also loaded from a snapshot, see `snapshot.py`.
+#
+# With `--watch`, the script keeps running after generating the sources and
+# regenerates them when the meta sources change, see `watch.py`.
 
-from __future__ import absolute_import
+from __future__ import absolute_import, print_function
 import argparse
-import isa
-import gen_types
-import gen_instr
-import gen_settings
+import hashlib
+import os
+import shutil
 import gen_build_deps
-import gen_encoding
-import gen_legalizer
-import gen_registers
-import gen_binemit
+import build_cache
+import build_profile
+import srcgen
+from isa_names import ISA_NAMES
+
+try:
+    from typing import Any, Dict, List, Optional, Set  # noqa
+except ImportError:
+    pass
+
+# Modules imported by `generate()`. The cache key covers all the meta sources
+# imported by these modules.
+GENERATORS = ['snapshot', 'gen_all']
+
+# Name of the profile report written by `--profile`.
+PROFILE_FILE = 'meta-profile.json'
+
+
+def encoding_options(args):
+    # type: (argparse.Namespace) -> Any
+    """Get the `gen_encoding.EncodingOptions` from the command line."""
+    import gen_encoding
+    profile = None
+    if args.encoding_profile:
+        import encoding_profile
+        profile = encoding_profile.EncodingProfile.load(args.encoding_profile)
+    return gen_encoding.EncodingOptions(
+            perfect_hash=args.perfect_hash, profile=profile,
+            dense_level2=args.dense_level2,
+            enclist_format=args.enclist_format,
+            specialize_presets=args.specialize_presets,
+            enclist_cache=args.enclist_cache)
+
+
+def file_digest(path):
+    # type: (Optional[str]) -> str
+    """Get a digest of the contents of the file at `path`, if any."""
+    if not path:
+        return ''
+    with open(path, 'rb') as f:
+        return hashlib.sha1(f.read()).hexdigest()
+
+
+def parse_multipliers(value):
+    # type: (str) -> List[float]
+    """
+    Parse the comma-separated `--hash-multipliers` option.
+
+        >>> parse_multipliers('1.2,2')
+        [1.2, 2.0]
+    """
+    return [float(m) for m in value.split(',') if m]
+
+
+def configure_tables(args):
+    # type: (argparse.Namespace) -> None
+    """
+    Configure the hash table layout search, the sequence table packing, and
+    the predicate operand order from the command line.
+    """
+    import constant_hash
+    import unique_table
+    from cdsl import predicates
+    unique_table.configure_packing(args.pack_tables)
+    outcomes = None
+    if args.predicate_profile:
+        import predicate_profile
+        outcomes = predicate_profile.PredicateProfile.load(
+                args.predicate_profile)
+    predicates.configure_outcomes(outcomes)
+    kwargs = dict()  # type: Dict[str, Any]
+    if args.hash_seeds is not None:
+        kwargs['seeds'] = args.hash_seeds
+    if args.hash_multipliers is not None:
+        kwargs['multipliers'] = parse_multipliers(args.hash_multipliers)
+    constant_hash.configure_search(**kwargs)
+
+
+def generate(out_dir, jobs, isa_names, cache_dir=None, enc_options=None):
+    # type: (str, int, List[str], Optional[str], Any) -> None
+    """
+    Load the ISA definitions and generate all sources in `out_dir`.
+
+    Only the target ISAs in `isa_names` are finished and get their tables
+    generated, but the shared opcode enumeration covers all of them.
+
+    The finished model is loaded from a snapshot in `cache_dir` if possible.
+    """
+    import snapshot
+    import gen_all
+    model = snapshot.load_model(isa_names, cache_dir)
+    gen_all.generate(
+            model.isas, out_dir, jobs, groups=model.groups,
+            enc_options=enc_options)
+
+
+def warn_removed_encodings(out_dir, isa_names):
+    # type: (str, List[str]) -> None
+    """
+    Print a Cargo warning for each shadowed encoding removed from the tables
+    of the target ISAs in `isa_names`.
+
+    The removed encodings are read from the table size reports in `out_dir`,
+    so the warnings are the same when the outputs come from the cache.
+    """
+    import table_sizes
+    removed = table_sizes.read_removed_encodings(out_dir, isa_names)
+    for descriptions in removed.values():
+        for description in descriptions:
+            print('cargo:warning={}'.format(description))
+
+
+def parse_isa_names(values):
+    # type: (Optional[List[str]]) -> List[str]
+    """
+    Get the list of target ISA names from the `--isa` options. Each option can
+    contain multiple comma-separated names.
+
+        >>> parse_isa_names(['intel,riscv', 'arm32'])
+        ['arm32', 'intel', 'riscv']
+        >>> parse_isa_names(None) == ISA_NAMES
+        True
+    """
+    if not values:
+        return list(ISA_NAMES)
+    names = set()  # type: Set[str]
+    for v in values:
+        names.update(n for n in v.split(',') if n)
+    return sorted(names)
 
 
 def main():
@@ -20,20 +151,144 @@ def main():
     parser = argparse.ArgumentParser(
             description='Generate sources for Cretonne.')
     parser.add_argument('--out-dir', help='set output directory')
+    parser.add_argument(
+            '-j', '--jobs', type=int, default=1,
+            help='generate per-ISA sources with this many processes')
+    parser.add_argument(
+            '--cache-dir',
+            help='reuse generated sources from this cache directory')
+    parser.add_argument(
+            '--isa', action='append',
+            help='only generate tables for these comma-separated target ISAs')
+    parser.add_argument(
+            '--dep-map',
+            help='write the meta sources used by each generated file to this '
+            'JSON file')
+    parser.add_argument(
+            '--profile', action='store_true',
+            help='write a timing and memory profile to {} in the output '
+            'directory'.format(PROFILE_FILE))
+    parser.add_argument(
+            '--perfect-hash', action='store_true',
+            help='generate perfect hash tables for encoding lookups')
+    parser.add_argument(
+            '--encoding-profile',
+            help='lay out the encoding hash tables for the lookup '
+            'frequencies in this profile, see encoding_profile.py')
+    parser.add_argument(
+            '--predicate-profile',
+            help='order the operands of the generated predicates for the '
+            'outcomes in this profile, see predicate_profile.py')
+    parser.add_argument(
+            '--dense-level2', type=float, metavar='DENSITY',
+            help='emit encoding level 2 tables where at least this fraction '
+            'of the opcodes up to the largest one are used as direct arrays '
+            'indexed by opcode, e.g. 0.3')
+    parser.add_argument(
+            '--enclist-format', choices=['u16', 'u32'],
+            help='word type of the encoding lists for all ISAs, instead of '
+            'the smallest one that fits each ISA')
+    parser.add_argument(
+            '--specialize-presets', action='store_true',
+            help='also generate encoding tables specialized for each '
+            'settings preset')
+    parser.add_argument(
+            '--enclist-cache', action='store_true',
+            help='describe the encoding lists with ISA predicates, so they '
+            'are filtered for the ISA flags at run time')
+    parser.add_argument(
+            '--pack-tables', action='store_true',
+            help='overlap the sequences in the generated sequence tables')
+    parser.add_argument(
+            '--hash-seeds', type=int,
+            help='number of insertion orders to try for each hash table')
+    parser.add_argument(
+            '--hash-multipliers',
+            help='comma-separated table size multipliers to try for each '
+            'hash table')
+    parser.add_argument(
+            '--watch', action='store_true',
+            help='keep running and regenerate the sources when the meta '
+            'sources change')
 
     args = parser.parse_args()
     out_dir = args.out_dir
+    isa_names = parse_isa_names(args.isa)
+    if args.profile:
+        build_profile.start()
+
+    if args.watch:
+        configure_tables(args)
+        # The watcher reloads ISA packages on top of the loaded `base`
+        # definitions, so the model must be built from the sources.
+        generate(out_dir, args.jobs, isa_names,
+                 enc_options=encoding_options(args))
+    elif args.cache_dir:
+        cache = build_cache.OutputCache(args.cache_dir)
+        enc_options = encoding_options(args)
+        with build_profile.phase('cache', 'key'):
+            key = build_cache.source_key(
+                    GENERATORS, extra=[
+                        'isa=' + ','.join(isa_names),
+                        enc_options.cache_key(),
+                        'pack_tables={:d}'.format(args.pack_tables),
+                        'predicate_profile=' +
+                        file_digest(args.predicate_profile),
+                        'hash_seeds={}'.format(args.hash_seeds),
+                        'hash_multipliers={}'.format(args.hash_multipliers)])
+        with build_profile.phase('cache', 'restore'):
+            restored = cache.restore(key, out_dir)
+        if not restored:
+            staging = cache.staging_dir()
+            configure_tables(args)
+            try:
+                generate(staging, args.jobs, isa_names, args.cache_dir,
+                         enc_options)
+                cache.store(key, staging)
+            finally:
+                shutil.rmtree(staging, ignore_errors=True)
+            # Only count the files restored into `out_dir`.
+            srcgen.reset_update_stats()
+            with build_profile.phase('cache', 'restore'):
+                cache.restore(key, out_dir)
+    else:
+        configure_tables(args)
+        generate(out_dir, args.jobs, isa_names,
+                 enc_options=encoding_options(args))
+
+    warn_removed_encodings(out_dir, isa_names)
+    checked, written = srcgen.update_stats()
+    print('Generated {} files, {} changed.'.format(checked, written))
+
+    prof = build_profile.stop()
+    if prof is not None:
+        prof.write(
+                os.path.join(out_dir, PROFILE_FILE),
+                isas=isa_names, jobs=args.jobs,
+                perfect_hash=args.perfect_hash,
+                cache=args.cache_dir is not None,
+                files=checked, changed=written)
+
+    if args.dep_map:
+        gen_build_deps.write_dependency_map(args.dep_map, isa_names, ISA_NAMES)
+
+    if args.encoding_profile:
+        print('cargo:rerun-if-changed={}'.format(
+            os.path.abspath(args.encoding_profile)))
+    if args.predicate_profile:
+        print('cargo:rerun-if-changed={}'.format(
+            os.path.abspath(args.predicate_profile)))
 
-    isas = isa.all_isas()
+    deps = gen_build_deps.loaded_sources()
+    if args.cache_dir:
+        # The ISA definitions are not imported when the outputs or the model
+        # come from the cache, so add everything the cache key covers.
+        deps.update(build_cache.dependencies(GENERATORS))
+    gen_build_deps.generate(deps)
 
-    gen_types.generate(out_dir)
-    gen_instr.generate(isas, out_dir)
-    gen_settings.generate(isas, out_dir)
-    gen_encoding.generate(isas, out_dir)
-    gen_legalizer.generate(isas, out_dir)
-    gen_registers.generate(isas, out_dir)
-    gen_binemit.generate(isas, out_dir)
-    gen_build_deps.generate()
+    if args.watch:
+        import watch
+        watch.Watcher(out_dir, isa_names, encoding_options(args)).run()
 
 
 if __name__ == "__main__":
@@ -0,0 +1,299 @@
+"""
+Content-addressed cache for generated sources.
+
+Running the meta build script is pure repeated work when none of the meta
+sources that the generators depend on have changed. The `OutputCache` class
+keeps copies of the generated files in a persistent directory, keyed by a hash
+of those sources.
+
+The dependencies are found by scanning the import statements in the meta
+modules, starting from the generator modules. This means that we can compute
+the cache key without importing the ISA definitions, which is the expensive
+part of running the build script. Modules that are not imported by the
+generators, like the unit tests and the `semantics` package, don't affect the
+key.
+"""
+from __future__ import absolute_import
+import hashlib
+import os
+import re
+import shutil
+import sys
+import tempfile
+import srcgen
+from os.path import abspath, dirname, join, isfile, isdir
+
+try:
+    from typing import Dict, Iterable, List, Optional, Set, Tuple  # noqa
+except ImportError:
+    pass
+
+
+# Bump this when the cache layout or the generated outputs change in a way
+# that isn't captured by the meta sources.
+CACHE_VERSION = 1
+
+# The directory containing the meta modules.
+META_DIR = dirname(abspath(__file__))
+
+
+def module_path(name, top=META_DIR):
+    # type: (str, str) -> Optional[str]
+    """
+    Find the source file for the meta module `name`, or `None` if `name` is
+    not a meta module. Packages are represented by their `__init__.py` file.
+
+        >>> module_path('cdsl.isa') == join(META_DIR, 'cdsl', 'isa.py')
+        True
+        >>> module_path('cdsl') == join(META_DIR, 'cdsl', '__init__.py')
+        True
+        >>> module_path('os') is None
+        True
+    """
+    base = join(top, *name.split('.'))
+    if isfile(base + '.py'):
+        return base + '.py'
+    pkg = join(base, '__init__.py')
+    if isfile(pkg):
+        return pkg
+    return None
+
+
+def _package_of(name, path):
+    # type: (str, str) -> str
+    """Get the package that relative imports in module `name` refer to."""
+    if path.endswith('__init__.py'):
+        return name
+    return name.rpartition('.')[0]
+
+
+# Import statements. Statements can be continued with backslashes or
+# parentheses.
+_import_re = re.compile(
+        r'^[ \t]*(?:'
+        r'from[ \t]+(?P<base>\.*[\w.]*)[ \t]+import[ \t]+'
+        r'(?P<names>\([^)]*\)|(?:[^\n]*\\\n)*[^\n]*)'
+        r'|import[ \t]+(?P<mods>(?:[^\n]*\\\n)*[^\n]*))',
+        re.MULTILINE)
+
+
+def _import_names(s):
+    # type: (str) -> List[str]
+    """
+    Get the module or member names from the text following `import`.
+
+        >>> _import_names('a, b as c  # noqa')
+        ['a', 'b']
+        >>> _import_names('(a,\\n    b)')
+        ['a', 'b']
+    """
+    s = s.split('#', 1)[0]
+    s = s.replace('\\', ' ').strip('() \t\n')
+    return [part.split()[0] for part in s.split(',') if part.strip()]
+
+
+# Results of `imported_modules()`, indexed by module name, path, and
+# modification time. The build script computes more than one cache key from
+# mostly the same modules.
+_scanned = dict()  # type: Dict[Tuple[str, str, float], Set[str]]
+
+
+def imported_modules(name, path):
+    # type: (str, str) -> Set[str]
+    """
+    Scan the source of the module `name` found in `path` and return the names
+    of all the modules it may import.
+
+    All import statements are included, also the ones inside functions and
+    `TYPE_CHECKING` blocks. Importing `a.b.c` also imports the packages `a`
+    and `a.b`.
+
+    A module that uses `importlib.import_module()` is assumed to import any
+    module in its own package, see `package_modules()`.
+
+    This is a textual scan which is much faster than parsing the module. It
+    may find spurious imports in strings, which is harmless.
+    """
+    scan_key = (name, path, os.path.getmtime(path))
+    if scan_key in _scanned:
+        return _scanned[scan_key]
+
+    with open(path) as f:
+        source = f.read()
+
+    pkg = _package_of(name, path)
+    names = set()  # type: Set[str]
+    if 'import_module(' in source:
+        names.update(package_modules(pkg, dirname(path)))
+
+    def add(full):
+        # type: (str) -> None
+        parts = full.split('.')
+        for n in range(1, len(parts) + 1):
+            names.add('.'.join(parts[:n]))
+
+    for m in _import_re.finditer(source):
+        if m.group('mods') is not None:
+            for mod in _import_names(m.group('mods')):
+                add(mod)
+            continue
+
+        base = m.group('base')
+        level = len(base) - len(base.lstrip('.'))
+        base = base[level:]
+        if level:
+            parts = pkg.split('.') if pkg else []
+            if level > 1:
+                parts = parts[:1 - level]
+            if base:
+                parts.append(base)
+            base = '.'.join(parts)
+        if base:
+            add(base)
+        # `from pkg import mod` imports a submodule.
+        for member in _import_names(m.group('names')):
+            if member != '*':
+                add(base + '.' + member if base else member)
+    _scanned[scan_key] = names
+    return names
+
+
+def package_modules(pkg, pkg_dir):
+    # type: (str, str) -> List[str]
+    """
+    List the names of all the modules in the package `pkg` found in
+    `pkg_dir`, including sub-packages. Unit tests are not included.
+
+        >>> mods = package_modules('isa', join(META_DIR, 'isa'))
+        >>> 'isa.intel.encodings' in mods
+        True
+    """
+    names = []  # type: List[str]
+    for dirpath, dirnames, filenames in os.walk(pkg_dir):
+        # Only descend into packages.
+        dirnames[:] = sorted(d for d in dirnames
+                             if isfile(join(dirpath, d, '__init__.py')))
+        rel = os.path.relpath(dirpath, pkg_dir)
+        prefix = pkg if rel == os.curdir else '.'.join(
+                [pkg] + rel.split(os.sep))
+        for f in sorted(filenames):
+            if not f.endswith('.py') or f.startswith('test_'):
+                continue
+            if f == '__init__.py':
+                names.append(prefix)
+            else:
+                names.append(prefix + '.' + f[:-3])
+    return names
+
+
+def dependencies(roots, top=META_DIR):
+    # type: (Iterable[str], str) -> List[str]
+    """
+    Compute the transitive closure of meta modules imported by the modules
+    named in `roots`.
+
+    Return a sorted list of source file paths.
+    """
+    seen = dict()  # type: Dict[str, str]
+    work = list(roots)
+    while work:
+        name = work.pop()
+        if name in seen:
+            continue
+        path = module_path(name, top)
+        if path is None:
+            continue
+        seen[name] = path
+        work.extend(imported_modules(name, path))
+    return sorted(set(seen.values()))
+
+
+def source_key(roots, extra=(), top=META_DIR):
+    # type: (Iterable[str], Iterable[str], str) -> str
+    """
+    Compute a cache key for the outputs of the generator modules in `roots`.
+
+    The key is a hash of the contents of all the meta sources the modules
+    depend on, the Python version, and the `extra` strings which should
+    describe any options that affect the generated outputs.
+    """
+    h = hashlib.sha1()
+
+    def feed(s):
+        # type: (str) -> None
+        h.update(s.encode('utf-8'))
+        h.update(b'\0')
+
+    feed('cache version {}'.format(CACHE_VERSION))
+    feed(sys.version)
+    for e in extra:
+        feed(e)
+    for path in dependencies(roots, top):
+        feed(os.path.relpath(path, top))
+        with open(path, 'rb') as f:
+            h.update(f.read())
+        h.update(b'\0')
+    return h.hexdigest()
+
+
+class OutputCache(object):
+    """
+    A persistent directory of generated source files.
+
+    Each cache entry is a sub-directory named by its key, containing a copy of
+    all the files that were generated.
+
+    :param cache_dir: Directory holding the cache entries. It is created if
+        necessary.
+    """
+
+    def __init__(self, cache_dir):
+        # type: (str) -> None
+        self.cache_dir = cache_dir
+        if not isdir(cache_dir):
+            os.makedirs(cache_dir)
+
+    def entry(self, key):
+        # type: (str) -> str
+        """Get the directory for the cache entry `key`."""
+        return join(self.cache_dir, key)
+
+    def restore(self, key, out_dir):
+        # type: (str, str) -> bool
+        """
+        Copy the files in the cache entry `key` to `out_dir`. Files in
+        `out_dir` that already have the right contents are not touched.
+
+        Return `False` if there is no such cache entry.
+        """
+        entry = self.entry(key)
+        if not isdir(entry):
+            return False
+        for name in sorted(os.listdir(entry)):
+            with open(join(entry, name), 'rb') as f:
+                srcgen.update_file(join(out_dir, name), f.read())
+        return True
+
+    def staging_dir(self):
+        # type: () -> str
+        """
+        Create a new temporary directory for generating files into. The
+        directory should be passed to `store()` or removed afterwards.
+        """
+        return tempfile.mkdtemp(prefix='tmp-', dir=self.cache_dir)
+
+    def store(self, key, staging):
+        # type: (str, str) -> None
+        """
+        Turn the `staging` directory into the cache entry for `key`.
+
+        The directory is renamed into place, so concurrent builds never see a
+        partial cache entry. If another build got there first, `staging` is
+        simply removed.
+        """
+        try:
+            os.rename(staging, self.entry(key))
+        except OSError:
+            if not isdir(self.entry(key)):
+                raise
+            shutil.rmtree(staging)
@@ -0,0 +1,155 @@
+"""
+Timing and memory profile of the meta build.
+
+The build script is divided into phases like importing a target ISA or running
+one of the generators. When profiling is enabled with `start()`, each phase
+records its wall time, CPU time, and the peak resident set size of the process
+at the end of the phase. The results are written as a JSON report.
+
+Phases are marked with the `phase()` context manager, which does nothing when
+profiling is not enabled:
+
+    >>> with phase('generate', 'gen_types'):
+    ...     pass
+"""
+from __future__ import absolute_import
+import json
+import os
+import sys
+import time
+from contextlib import contextmanager
+
+try:
+    from typing import Any, Callable, Dict, Iterator, List, Optional  # noqa
+except ImportError:
+    pass
+
+
+# Bump this when the report format changes.
+REPORT_VERSION = 1
+
+
+def cpu_time():
+    # type: () -> float
+    """Get the user and system CPU time used by this process in seconds."""
+    process_time = getattr(
+            time, 'process_time', None)  # type: Optional[Callable[[], float]]
+    if process_time is not None:
+        return process_time()
+    # Python 2 doesn't have `process_time()`, and `os.times()` has a coarse
+    # resolution.
+    t = os.times()
+    return t[0] + t[1]
+
+
+def peak_rss(who='self'):
+    # type: (str) -> Optional[int]
+    """
+    Get the peak resident set size in bytes of this process, or of its
+    terminated child processes when `who` is `'children'`.
+
+    Return `None` if the platform doesn't provide this information.
+    """
+    try:
+        import resource
+    except ImportError:
+        # Not available on Windows.
+        return None
+    if who == 'children':
+        usage = resource.getrusage(resource.RUSAGE_CHILDREN)
+    else:
+        usage = resource.getrusage(resource.RUSAGE_SELF)
+    # Linux reports kilobytes, macOS reports bytes.
+    if sys.platform == 'darwin':
+        return usage.ru_maxrss
+    return usage.ru_maxrss * 1024
+
+
+class Profile(object):
+    """
+    The recorded phases of a build.
+
+    Phases are recorded in the order they finish, so nested phases appear
+    before the phase containing them.
+    """
+
+    def __init__(self):
+        # type: () -> None
+        self.phases = []  # type: List[Dict[str, Any]]
+        self.start_wall = time.time()
+        self.start_cpu = cpu_time()
+
+    @contextmanager
+    def phase(self, category, name):
+        # type: (str, str) -> Iterator[None]
+        """Record the time spent in the body of a `with` statement."""
+        wall = time.time()
+        cpu = cpu_time()
+        yield
+        self.phases.append({
+            'category': category,
+            'name': name,
+            'wall_time': time.time() - wall,
+            'cpu_time': cpu_time() - cpu,
+            'peak_rss': peak_rss()})
+
+    def report(self, **info):
+        # type: (**Any) -> Dict[str, Any]
+        """
+        Get the JSON report for the phases recorded so far. The keyword
+        arguments are included as additional information about the build.
+        """
+        return {
+                'version': REPORT_VERSION,
+                'python': sys.version.split()[0],
+                'info': info,
+                'phases': self.phases,
+                'total': {
+                    'wall_time': time.time() - self.start_wall,
+                    'cpu_time': cpu_time() - self.start_cpu,
+                    'peak_rss': peak_rss(),
+                    'children_peak_rss': peak_rss('children')}}
+
+    def write(self, path, **info):
+        # type: (str, **Any) -> None
+        """Write the JSON report to `path`."""
+        with open(path, 'w') as f:
+            json.dump(self.report(**info), f, indent=2, sort_keys=True)
+            f.write('\n')
+
+
+# The active profile, if profiling is enabled.
+_active = None  # type: Optional[Profile]
+
+
+def start():
+    # type: () -> Profile
+    """Enable profiling and return the new active profile."""
+    global _active
+    _active = Profile()
+    return _active
+
+
+def stop():
+    # type: () -> Optional[Profile]
+    """Disable profiling and return the profile that was active."""
+    global _active
+    prof = _active
+    _active = None
+    return prof
+
+
+@contextmanager
+def phase(category, name):
+    # type: (str, str) -> Iterator[None]
+    """
+    Record a phase of the build in the active profile, if any.
+
+    :param category: The kind of phase, like `'import'` or `'generate'`.
+    :param name: The name of the phase within its category.
+    """
+    if _active is None:
+        yield
+    else:
+        with _active.phase(category, name):
+            yield
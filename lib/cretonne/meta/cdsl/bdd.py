@@ -0,0 +1,149 @@
+"""
+Reduced ordered binary decision diagrams.
+
+A BDD represents a boolean function of some variables as a directed acyclic
+graph. With a fixed variable order and shared nodes, the representation is
+canonical: Two functions are equivalent if and only if they are represented by
+the same node. This makes it cheap to check predicates for equivalence and
+implication, see `cdsl.predicates.Normalizer`.
+"""
+from __future__ import absolute_import
+import sys
+
+try:
+    from typing import Any, Dict, Hashable, List, Tuple  # noqa
+    Node = int
+except ImportError:
+    pass
+
+
+class BDD(object):
+    """
+    A manager of shared BDD nodes.
+
+    Nodes are represented as integers. All the nodes that are combined must
+    come from the same manager.
+
+    Variables are identified by arbitrary hashable keys, and they are ordered
+    by their first use.
+
+        >>> bdd = BDD()
+        >>> a = bdd.var('a')
+        >>> b = bdd.var('b')
+        >>> bdd.conj(a, b) == bdd.conj(b, a)
+        True
+        >>> bdd.disj(a, bdd.neg(a)) == BDD.TRUE
+        True
+        >>> bdd.implies(bdd.conj(a, b), a)
+        True
+        >>> bdd.implies(a, bdd.conj(a, b))
+        False
+    """
+
+    # The constant nodes.
+    FALSE = 0
+    TRUE = 1
+
+    # Variable number used for the constant nodes. It orders after all real
+    # variables.
+    CONSTANT = sys.maxsize
+
+    def __init__(self):
+        # type: () -> None
+        # The `(var, low, high)` triple of each node, indexed by node number.
+        self.nodes = [(BDD.CONSTANT, 0, 0), (BDD.CONSTANT, 1, 1)]  # type: List[Tuple[int, Node, Node]]  # noqa
+        # Maps `(var, low, high)` -> node, so equal nodes are shared.
+        self.unique = dict()  # type: Dict[Tuple[int, Node, Node], Node]
+        # Maps variable key -> variable number.
+        self.variables = dict()  # type: Dict[Hashable, int]
+        # Results of `conj()`, `disj()`, and `neg()`.
+        self.cache = dict()  # type: Dict[Tuple[Any, ...], Node]
+
+    def __len__(self):
+        # type: () -> int
+        """Get the number of nodes, including the constants."""
+        return len(self.nodes)
+
+    def mk(self, var, low, high):
+        # type: (int, Node, Node) -> Node
+        """
+        Get the node testing variable number `var` that leads to `low` when
+        the variable is false, and to `high` when it is true.
+        """
+        if low == high:
+            return low
+        key = (var, low, high)
+        node = self.unique.get(key)
+        if node is None:
+            node = len(self.nodes)
+            self.nodes.append(key)
+            self.unique[key] = node
+        return node
+
+    def var(self, key):
+        # type: (Hashable) -> Node
+        """Get the node that is true when the variable `key` is true."""
+        v = self.variables.get(key)
+        if v is None:
+            v = len(self.variables)
+            self.variables[key] = v
+        return self.mk(v, BDD.FALSE, BDD.TRUE)
+
+    def neg(self, a):
+        # type: (Node) -> Node
+        """Get the negation of `a`."""
+        if a <= BDD.TRUE:
+            return BDD.TRUE - a
+        key = ('neg', a)
+        r = self.cache.get(key)
+        if r is None:
+            v, low, high = self.nodes[a]
+            r = self.mk(v, self.neg(low), self.neg(high))
+            self.cache[key] = r
+        return r
+
+    def conj(self, a, b):
+        # type: (Node, Node) -> Node
+        """Get the conjunction of `a` and `b`."""
+        if a == BDD.FALSE or b == BDD.FALSE:
+            return BDD.FALSE
+        if a == BDD.TRUE or a == b:
+            return b
+        if b == BDD.TRUE:
+            return a
+        return self._apply('conj', a, b)
+
+    def disj(self, a, b):
+        # type: (Node, Node) -> Node
+        """Get the disjunction of `a` and `b`."""
+        if a == BDD.TRUE or b == BDD.TRUE:
+            return BDD.TRUE
+        if a == BDD.FALSE or a == b:
+            return b
+        if b == BDD.FALSE:
+            return a
+        return self._apply('disj', a, b)
+
+    def _apply(self, op, a, b):
+        # type: (str, Node, Node) -> Node
+        """Apply the commutative operator `op` to two non-constant nodes."""
+        key = (op, min(a, b), max(a, b))
+        r = self.cache.get(key)
+        if r is None:
+            va, alow, ahigh = self.nodes[a]
+            vb, blow, bhigh = self.nodes[b]
+            # Expand both nodes on the first of their variables.
+            v = min(va, vb)
+            if va != v:
+                alow = ahigh = a
+            if vb != v:
+                blow = bhigh = b
+            f = getattr(self, op)
+            r = self.mk(v, f(alow, blow), f(ahigh, bhigh))
+            self.cache[key] = r
+        return r
+
+    def implies(self, a, b):
+        # type: (Node, Node) -> bool
+        """Check if `a` implies `b`."""
+        return self.conj(a, self.neg(b)) == BDD.FALSE
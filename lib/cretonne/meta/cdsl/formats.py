@@ -148,6 +148,10 @@ class InstructionFormat(object):
         Each non-value format member becomes a corresponding `FormatField`
         attribute.
         """
+        # Special methods like `__setstate__` are looked up by pickle before
+        # the instance attributes are restored.
+        if attr.startswith('__'):
+            raise AttributeError(attr)
         for f in self.imm_fields:
             if f.member == attr:
                 # Cache this field attribute so we won't have to search again.
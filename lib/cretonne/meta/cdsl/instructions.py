@@ -331,6 +331,10 @@ class Instruction(object):
 
         >>> iadd.i32
         """
+        # Special methods like `__setstate__` are looked up by pickle before
+        # the instance attributes are restored.
+        if name.startswith('__'):
+            raise AttributeError(name)
         assert name != 'any', 'Wildcard not allowed for ctrl_typevar'
         return self.bind(ValueType.by_name(name))
 
@@ -409,6 +413,10 @@ class BoundInstruction(object):
 
         >>> uext.i32.i8
         """
+        # Special methods like `__setstate__` are looked up by pickle before
+        # the instance attributes are restored.
+        if name.startswith('__'):
+            raise AttributeError(name)
         if name == 'any':
             # This is a wild card bind represented as a None type variable.
             return self.bind(None)
@@ -1,7 +1,7 @@
 """Defining instruction set architectures."""
 from __future__ import absolute_import
 from collections import OrderedDict
-from .predicates import And, TypePredicate
+from .predicates import And, TypePredicate, Normalizer
 from .registers import RegClass, Register, Stack
 from .ast import Apply
 from .types import ValueType
@@ -11,9 +11,10 @@ from .instructions import InstructionGroup
 # outside type comments.
 try:
     from typing import Tuple, Union, Any, Iterable, Sequence, List, Set, Dict, TYPE_CHECKING  # noqa
+    from typing import Callable, ContextManager, Optional  # noqa
     if TYPE_CHECKING:
         from .instructions import MaybeBoundInst, InstructionFormat  # noqa
-        from .predicates import PredNode, PredKey  # noqa
+        from .predicates import PredNode  # noqa
         from .settings import SettingGroup  # noqa
         from .registers import RegBank  # noqa
         from .xform import XFormGroup  # noqa
@@ -25,7 +26,7 @@ try:
         BranchRange = Sequence[int]
         # A recipe predicate consisting of an ISA predicate and an instruction
         # predicate.
-        RecipePred = Tuple[PredNode, PredNode]
+        RecipePred = Tuple[Optional[PredNode], Optional[PredNode]]
 except ImportError:
     pass
 
@@ -50,8 +51,8 @@ class TargetISA(object):
         self.regbanks = list()  # type: List[RegBank]
         self.regclasses = list()  # type: List[RegClass]
         self.legalize_codes = OrderedDict()  # type: OrderedDict[XFormGroup, int]  # noqa
-        # Unique copies of all predicates.
-        self._predicates = dict()  # type: Dict[PredKey, PredNode]
+        # Unique simplified copies of all predicates.
+        self._predicates = Normalizer()
 
         assert InstructionGroup._current is None,\
             "InstructionGroup {} is still open!"\
@@ -61,8 +62,8 @@ class TargetISA(object):
         # type: () -> str
         return self.name
 
-    def finish(self):
-        # type: () -> TargetISA
+    def finish(self, phase=None):
+        # type: (Optional[Callable[[str], ContextManager[None]]]) -> TargetISA
         """
         Finish the definition of a target ISA after adding all CPU modes and
         settings.
@@ -70,12 +71,22 @@ class TargetISA(object):
         This computes some derived properties that are used in multiple
         places.
 
+        :param phase: Optional function returning a context manager for each
+            step of the computation, given the name of the step. This is used
+            for profiling.
         :returns self:
         """
-        self._collect_encoding_recipes()
-        self._collect_predicates()
-        self._collect_regclasses()
-        self._collect_legalize_codes()
+        steps = [
+                self._collect_encoding_recipes,
+                self._collect_predicates,
+                self._collect_regclasses,
+                self._collect_legalize_codes]
+        for step in steps:
+            if phase is None:
+                step()
+            else:
+                with phase(step.__name__):
+                    step()
         return self
 
     def _collect_encoding_recipes(self):
@@ -94,8 +105,8 @@ class TargetISA(object):
                     rcps.add(recipe)
                     self.all_recipes.append(recipe)
                     # Make sure ISA predicates are registered.
+                    recipe.isap = self.unique_pred(recipe.isap)
                     if recipe.isap:
-                        recipe.isap = self.unique_pred(recipe.isap)
                         self.settings.number_predicate(recipe.isap)
                     recipe.instp = self.unique_pred(recipe.instp)
 
@@ -195,19 +206,35 @@ class TargetISA(object):
         return code
 
     def unique_pred(self, pred):
-        # type: (PredNode) -> PredNode
+        # type: (Optional[PredNode]) -> Optional[PredNode]
         """
         Get a unique predicate that is equivalent to `pred`.
+
+        The predicate is simplified, and equivalent predicates are merged,
+        even when they are written differently. ISA predicates that are
+        equivalent to a setting or a named predicate in the settings group
+        are replaced by it. Returns `None` if `pred` is always true.
         """
         if pred is None:
             return pred
-        # TODO: We could actually perform some algebraic simplifications. It's
-        # not clear if it is worthwhile.
-        k = pred.predicate_key()
-        if k in self._predicates:
-            return self._predicates[k]
-        self._predicates[k] = pred
-        return pred
+        if self.settings is not None:
+            self._predicates.add_settings(self.settings)
+        return self._predicates.unique_pred(pred)
+
+    def pred_implies(self, a, b):
+        # type: (Sequence[Optional[PredNode]], Sequence[Optional[PredNode]]) -> bool  # noqa
+        """
+        Check if the conjunction of the predicates in `a` implies the
+        conjunction of the predicates in `b`. `None` members are always true.
+        """
+        return self._predicates.implies(a, b)
+
+    def pred_satisfiable(self, preds):
+        # type: (Sequence[Optional[PredNode]]) -> bool
+        """
+        Check if the predicates in `preds` can all be true at the same time.
+        """
+        return self._predicates.satisfiable(preds)
 
 
 class CPUMode(object):
@@ -439,10 +466,21 @@ class Encoding(object):
     :param encbits: Additional encoding bits to be interpreted by `recipe`.
     :param instp: Instruction predicate, or `None`.
     :param isap: ISA predicate, or `None`.
+    :param shadowed: This encoding is intentionally shadowed by an earlier
+                     encoding. Keep it in the tables without a warning.
     """
 
-    def __init__(self, cpumode, inst, recipe, encbits, instp=None, isap=None):
-        # type: (CPUMode, InstSpec, EncRecipe, int, PredNode, PredNode) -> None # noqa
+    def __init__(
+            self,
+            cpumode,         # type: CPUMode
+            inst,            # type: InstSpec
+            recipe,          # type: EncRecipe
+            encbits,         # type: int
+            instp=None,      # type: PredNode
+            isap=None,       # type: PredNode
+            shadowed=False   # type: bool
+            ):
+        # type: (...) -> None
         assert isinstance(cpumode, CPUMode)
         assert isinstance(recipe, EncRecipe)
 
@@ -476,6 +514,7 @@ class Encoding(object):
 
         self.recipe = recipe
         self.encbits = encbits
+        self.shadowed = shadowed
 
         # Record specific predicates. Note that the recipe also has predicates.
         self.instp = self.cpumode.isa.unique_pred(instp)
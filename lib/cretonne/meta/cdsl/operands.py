@@ -98,6 +98,10 @@ class ImmediateKind(OperandKind):
         Enumerated immediate kinds allow the use of dot syntax to produce
         `Enumerator` AST nodes: `icmp.i32(intcc.ult, a, b)`.
         """
+        # Special methods like `__setstate__` are looked up by pickle before
+        # the instance attributes are restored.
+        if value.startswith('__'):
+            raise AttributeError(value)
         from .ast import Enumerator  # noqa
         if not self.values:
             raise AssertionError(
@@ -20,13 +20,20 @@ and `Not` combinators defined in this module.
 All predicates have a *context* which determines where they can be evaluated.
 For an ISA predicate, the context is the ISA settings group. For an instruction
 predicate, the context is the instruction format.
+
+Every predicate has a `cost` estimating how expensive the generated Rust code
+is to evaluate. The operands of `And` and `Or` are commutative, so they are
+emitted in the order given by `evaluation_order()` instead of the order they
+were written in.
 """
 from __future__ import absolute_import
 from functools import reduce
+from .bdd import BDD
 from .formats import instruction_context
 
 try:
-    from typing import Sequence, Tuple, Set, Any, Union, TYPE_CHECKING  # noqa
+    from typing import Dict, List, Sequence, Tuple, Set, Any, Union, TYPE_CHECKING  # noqa
+    from typing import Optional  # noqa
     if TYPE_CHECKING:
         from .formats import InstructionFormat, InstructionContext, FormatField  # noqa
         from .instructions import Instruction  # noqa
@@ -45,6 +52,49 @@ except ImportError:
     pass
 
 
+# Outcome profile used to order the operands of `And` and `Or`, see
+# `configure_outcomes()`.
+_outcomes = [None]  # type: List[Any]
+
+
+def configure_outcomes(profile):
+    # type: (Any) -> None
+    """
+    Configure the predicate outcome profile used by `evaluation_order()`, or
+    `None` to order operands by cost alone.
+
+    The profile must have a `false_ratio(pred)` method returning the fraction
+    of evaluations where `pred` was false, or `None` if it wasn't profiled. See
+    `predicate_profile.PredicateProfile`.
+    """
+    _outcomes[0] = profile
+
+
+def evaluation_order(parts, decides):
+    # type: (Sequence[PredNode], bool) -> List[PredNode]
+    """
+    Get the operands `parts` of an `And` or `Or` predicate in the order they
+    should be evaluated. The `decides` outcome is the one that short-circuits
+    the expression: `False` for an `And` and `True` for an `Or`.
+
+    Without a profile, the cheapest operands are evaluated first.
+
+    When a profile is configured, the profiled operands come first, ordered
+    by how often they decide the outcome. Ties and unprofiled operands are
+    ordered by cost. The sort is stable, so equivalent operands keep their
+    declared order.
+    """
+    profile = _outcomes[0]
+
+    def key(p):
+        # type: (PredNode) -> Tuple[int, float, int]
+        ratio = profile.false_ratio(p) if profile else None
+        if ratio is None:
+            return (1, 0.0, p.cost)
+        return (0, ratio - 1.0 if decides else -ratio, p.cost)
+    return sorted(parts, key=key)
+
+
 def _is_parent(a, b):
     # type: (PredContext, PredContext) -> bool
     """
@@ -105,6 +155,12 @@ class Predicate(object):
         for part in self.parts:
             part.predicate_leafs(leafs)
 
+    @property
+    def cost(self):
+        # type: () -> int
+        """Estimated cost of evaluating all the parts."""
+        return sum(p.cost for p in self.parts)
+
     def rust_predicate(self, prec):
         # type: (int) -> str
         raise NotImplementedError("rust_predicate is an abstract method")
@@ -124,6 +180,8 @@ class And(Predicate):
     """
 
     precedence = 2
+    # The operand value that determines the result of the expression.
+    decides = False
 
     def __init__(self, *args):
         # type: (*PredNode) -> None
@@ -140,8 +198,11 @@ class And(Predicate):
         1. An `||` expression.
         2. An `&&` expression.
         3. A `!` expression.
+
+        The operands are emitted in `evaluation_order()`.
         """
-        s = ' && '.join(p.rust_predicate(And.precedence) for p in self.parts)
+        s = ' && '.join(p.rust_predicate(And.precedence)
+                        for p in evaluation_order(self.parts, And.decides))
         if prec > And.precedence:
             s = '({})'.format(s)
         return s
@@ -170,6 +231,8 @@ class Or(Predicate):
     """
 
     precedence = 1
+    # The operand value that determines the result of the expression.
+    decides = True
 
     def __init__(self, *args):
         # type: (*PredNode) -> None
@@ -177,7 +240,8 @@ class Or(Predicate):
 
     def rust_predicate(self, prec):
         # type: (int) -> str
-        s = ' || '.join(p.rust_predicate(Or.precedence) for p in self.parts)
+        s = ' || '.join(p.rust_predicate(Or.precedence)
+                        for p in evaluation_order(self.parts, Or.decides))
         if prec > Or.precedence:
             s = '({})'.format(s)
         return s
@@ -208,6 +272,9 @@ class FieldPredicate(object):
     :param args: Additional arguments for the predicate function.
     """
 
+    # Loading a field from the instruction data is cheap.
+    cost = 2
+
     def __init__(self, field, function, args):
         # type: (FormatField, str, Sequence[Any]) -> None
         self.field = field
@@ -276,6 +343,8 @@ class IsSignedInt(FieldPredicate):
     and a multiple of `2^scale`.
     """
 
+    cost = 3
+
     def __init__(self, field, width, scale=0):
         # type: (FormatField, int, int) -> None
         super(IsSignedInt, self).__init__(
@@ -299,6 +368,8 @@ class IsUnsignedInt(FieldPredicate):
     `0 -- 2^width - 1` and a multiple of `2^scale`.
     """
 
+    cost = 3
+
     def __init__(self, field, width, scale=0):
         # type: (FormatField, int, int) -> None
         super(IsUnsignedInt, self).__init__(
@@ -323,6 +394,9 @@ class TypePredicate(object):
     :param value_type: The required value type.
     """
 
+    # Looking up the value type goes through the DFG value table.
+    cost = 8
+
     def __init__(self, value_arg, value_type):
         # type: (int, ValueType) -> None
         assert value_arg >= 0
@@ -383,6 +457,10 @@ class CtrlTypePredicate(object):
     :param value_type: The required value type.
     """
 
+    # Computing the controlling type variable inspects the instruction format
+    # and may look up the type of a result or an argument.
+    cost = 10
+
     def __init__(self, value_type):
         # type: (ValueType) -> None
         assert value_type is not None
@@ -413,3 +491,197 @@ class CtrlTypePredicate(object):
         """
         return 'dfg.ctrl_typevar(inst) == {}'.format(
                 self.value_type.rust_name())
+
+
+class Normalizer(object):
+    """
+    Simplify predicates and find equivalent predicates.
+
+    Predicates are compared by their canonical form as a reduced ordered
+    binary decision diagram over the leaf predicates, see `cdsl.bdd`. This
+    catches equivalent predicates that are written differently, as well as
+    parts of a predicate that are implied by other parts.
+
+    Some predicates are atomic: They are never rewritten, and other predicates
+    that are equivalent to them are replaced by them. These are the named
+    predicates in setting groups which are precomputed when the settings are
+    created, so testing them is as cheap as testing a single setting.
+    """
+
+    def __init__(self):
+        # type: () -> None
+        self.bdd = BDD()
+        # BDD node for each predicate key.
+        self.nodes = dict()  # type: Dict[PredKey, int]
+        # The unique predicate for each `(context, node)`.
+        self.unique = dict()  # type: Dict[Tuple[PredContext, int], PredNode]
+        # Keys of the atomic predicates.
+        self.atoms = set()  # type: Set[PredKey]
+        # Setting groups whose named predicates have been added.
+        self.groups = set()  # type: Set[SettingGroup]
+
+    def node(self, pred):
+        # type: (PredNode) -> int
+        """Get the BDD node representing `pred`."""
+        key = pred.predicate_key()
+        n = self.nodes.get(key)
+        if n is not None:
+            return n
+        if isinstance(pred, Not):
+            n = self.bdd.neg(self.node(pred.parts[0]))
+        elif isinstance(pred, And):
+            n = BDD.TRUE
+            for part in pred.parts:
+                n = self.bdd.conj(n, self.node(part))
+        elif isinstance(pred, Or):
+            n = BDD.FALSE
+            for part in pred.parts:
+                n = self.bdd.disj(n, self.node(part))
+        else:
+            assert not isinstance(pred, Predicate), pred
+            n = self.bdd.var(key)
+        self.nodes[key] = n
+        return n
+
+    def add_atom(self, pred):
+        # type: (PredNode) -> None
+        """
+        Add an atomic predicate. It becomes the unique predicate for its
+        equivalence class unless an equivalent predicate was added first.
+        """
+        self.atoms.add(pred.predicate_key())
+        self.unique.setdefault(
+                (pred.predicate_context(), self.node(pred)), pred)
+
+    def add_settings(self, group):
+        # type: (SettingGroup) -> None
+        """
+        Add the boolean settings and named predicates in `group` and its
+        parents as atomic predicates.
+        """
+        while group is not None and group not in self.groups:
+            self.groups.add(group)
+            # After the layout, these are the boolean settings followed by
+            # the named predicates.
+            for pred in group.predicate_number:
+                self.add_atom(pred)
+            group = group.parent
+
+    def simplify(self, pred):
+        # type: (Optional[PredNode]) -> Optional[PredNode]
+        """
+        Get a simplified predicate that is equivalent to `pred`.
+
+        - Subtrees that are always true are removed, and `None` is returned
+          if all of `pred` is always true.
+        - Nested `And` and `Or` predicates are flattened, and double
+          negations are removed.
+        - Parts of an `And` that are implied by the other parts are removed,
+          and so are parts of an `Or` that imply the other parts.
+
+        Predicates that didn't change are returned as is.
+        """
+        if pred is None or self.node(pred) == BDD.TRUE:
+            return None
+        if (not isinstance(pred, Predicate) or
+                pred.predicate_key() in self.atoms):
+            return pred
+
+        if isinstance(pred, Not):
+            part = self.simplify(pred.parts[0])
+            if part is None:
+                # Always false.
+                return pred
+            if (isinstance(part, Not) and
+                    part.predicate_key() not in self.atoms):
+                return part.parts[0]
+            return pred if part is pred.parts[0] else Not(part)
+
+        # Simplify the parts of an `And` or an `Or`, dropping the ones that
+        # don't affect the result.
+        identity = BDD.TRUE if isinstance(pred, And) else BDD.FALSE
+        parts = list()  # type: List[PredNode]
+        for p in pred.parts:
+            sp = self.simplify(p)
+            if sp is None:
+                # An always true part. `pred` is an `And` since an `Or` would
+                # be always true too, and it was returned above.
+                continue
+            if (isinstance(sp, Predicate) and type(sp) is type(pred) and
+                    sp.predicate_key() not in self.atoms):
+                parts.extend(sp.parts)
+            elif self.node(sp) != identity:
+                parts.append(sp)
+
+        # Drop the redundant parts, starting from the end, so the first of two
+        # equivalent parts is kept.
+        for i in reversed(range(len(parts))):
+            others = identity
+            for j, p in enumerate(parts):
+                if j != i:
+                    others = self._combine(pred, others, self.node(p))
+            n = self.node(parts[i])
+            if isinstance(pred, And):
+                redundant = self.bdd.implies(others, n)
+            else:
+                redundant = self.bdd.implies(n, others)
+            if redundant:
+                del parts[i]
+
+        if not parts:
+            # An `Or` that is always false.
+            return pred
+        if len(parts) == 1:
+            return parts[0]
+        if tuple(parts) == tuple(pred.parts):
+            return pred
+        if isinstance(pred, And):
+            return And(*parts)
+        return Or(*parts)
+
+    def _combine(self, pred, a, b):
+        # type: (Predicate, int, int) -> int
+        if isinstance(pred, And):
+            return self.bdd.conj(a, b)
+        return self.bdd.disj(a, b)
+
+    def implies(self, a, b):
+        # type: (Sequence[Optional[PredNode]], Sequence[Optional[PredNode]]) -> bool  # noqa
+        """
+        Check if the conjunction of the predicates in `a` implies the
+        conjunction of the predicates in `b`.
+
+        The predicates can have different contexts, and `None` members are
+        always true.
+        """
+        return self.bdd.implies(self._conj(a), self._conj(b))
+
+    def satisfiable(self, preds):
+        # type: (Sequence[Optional[PredNode]]) -> bool
+        """
+        Check if the predicates in `preds` can all be true at the same time.
+        """
+        return self._conj(preds) != BDD.FALSE
+
+    def _conj(self, preds):
+        # type: (Sequence[Optional[PredNode]]) -> int
+        n = BDD.TRUE
+        for p in preds:
+            if p is not None:
+                n = self.bdd.conj(n, self.node(p))
+        return n
+
+    def unique_pred(self, pred):
+        # type: (Optional[PredNode]) -> Optional[PredNode]
+        """
+        Get a unique simplified predicate that is equivalent to `pred`.
+
+        Equivalent predicates in the same context get the same unique
+        predicate, which is the first one seen. Returns `None` if `pred` is
+        always true.
+        """
+        pred = self.simplify(pred)
+        if pred is None:
+            return None
+        key = (pred.predicate_context(), self.node(pred))
+        return self.unique.setdefault(key, pred)
@@ -328,6 +328,10 @@ class RegClass(object):
 
         For example: `GPR.r5`.
         """
+        # Special methods like `__setstate__` are looked up by pickle before
+        # the instance attributes are restored.
+        if attr.startswith('__'):
+            raise AttributeError(attr)
         reg = Register(self, self.bank.unit_by_name(attr))
         # Save this register so we won't have to create it again.
         setattr(self, attr, reg)
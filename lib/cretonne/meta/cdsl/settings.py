@@ -1,10 +1,11 @@
 """Classes for describing settings and groups of settings."""
 from __future__ import absolute_import
 from collections import OrderedDict
-from .predicates import Predicate
+from .predicates import Predicate, And, Or, Not
 
 try:
     from typing import Tuple, Set, List, Dict, Any, Union, TYPE_CHECKING  # noqa
+    from typing import Optional  # noqa
     BoolOrPresetOrDict = Union['BoolSetting', 'Preset', Dict['Setting', Any]]
     if TYPE_CHECKING:
         from .predicates import PredLeaf, PredNode, PredKey  # noqa
@@ -59,6 +60,9 @@ class BoolSetting(Setting):
     :param default: The default value of this setting.
     """
 
+    # Testing a bit in the settings bytes is the cheapest predicate.
+    cost = 1
+
     def __init__(self, doc, default=False):
         # type: (str, bool) -> None
         super(BoolSetting, self).__init__(doc)
@@ -405,3 +409,43 @@ class Preset(object):
             lst[ofs] = (l_mask, l_val)
 
         return lst
+
+    def setting_values(self):
+        # type: () -> Dict[BoolSetting, bool]
+        """
+        Get the value of every boolean setting in the group after applying
+        this preset to the default settings.
+        """
+        values = dict(
+                (s, s.default) for s in self.group.settings
+                if isinstance(s, BoolSetting))
+        for s, v in self.values:
+            if isinstance(s, BoolSetting):
+                values[s] = bool(v)
+        return values
+
+    def evaluate(self, pred):
+        # type: (PredNode) -> Optional[bool]
+        """
+        Evaluate the predicate `pred` with the settings in `setting_values()`.
+
+        Return `None` if the value of `pred` depends on anything else, such as
+        the settings in a parent group.
+        """
+        if isinstance(pred, BoolSetting):
+            if pred.group is not self.group:
+                return None
+            return self.setting_values()[pred]
+        if not isinstance(pred, Predicate):
+            return None
+        parts = [self.evaluate(p) for p in pred.parts]
+        if isinstance(pred, Not):
+            return None if parts[0] is None else not parts[0]
+        if isinstance(pred, And):
+            if False in parts:
+                return False
+            return None if None in parts else True
+        assert isinstance(pred, Or)
+        if True in parts:
+            return True
+        return None if None in parts else False
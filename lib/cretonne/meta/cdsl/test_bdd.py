@@ -0,0 +1,35 @@
+from __future__ import absolute_import
+from unittest import TestCase
+from doctest import DocTestSuite
+from . import bdd
+from .bdd import BDD
+
+
+def load_tests(loader, tests, ignore):
+    tests.addTests(DocTestSuite(bdd))
+    return tests
+
+
+class TestBDD(TestCase):
+    def test_canonical(self):
+        b = BDD()
+        x, y, z = b.var('x'), b.var('y'), b.var('z')
+        # x & (y | z) == (x & y) | (x & z)
+        self.assertEqual(
+                b.conj(x, b.disj(y, z)),
+                b.disj(b.conj(x, y), b.conj(x, z)))
+        # De Morgan.
+        self.assertEqual(
+                b.neg(b.conj(x, y)), b.disj(b.neg(x), b.neg(y)))
+        self.assertEqual(b.neg(b.neg(z)), z)
+        self.assertEqual(b.conj(x, b.neg(x)), BDD.FALSE)
+        self.assertNotEqual(b.conj(x, y), b.conj(x, z))
+
+    def test_shared(self):
+        b = BDD()
+        x, y = b.var('x'), b.var('y')
+        n = len(b)
+        self.assertEqual(b.var('x'), x)
+        b.conj(x, y)
+        self.assertEqual(b.conj(y, x), b.conj(x, y))
+        self.assertEqual(len(b), n + 1)
@@ -0,0 +1,96 @@
+from __future__ import absolute_import
+from unittest import TestCase
+from base.formats import BinaryImm
+from base.settings import group, is_64bit, is_pic, is_compressed
+from .predicates import And, Or, Not, IsSignedInt, Normalizer
+from .predicates import TypePredicate, configure_outcomes
+from base.types import i32
+from predicate_profile import PredicateProfile
+
+
+class TestNormalizer(TestCase):
+    def setUp(self):
+        self.norm = Normalizer()
+
+    def test_equivalent(self):
+        p1 = And(is_pic, Not(is_64bit))
+        p2 = And(Not(is_64bit), is_pic)
+        p3 = Not(Or(is_64bit, Not(is_pic)))
+        u = self.norm.unique_pred(p1)
+        self.assertIs(u, p1)
+        self.assertIs(self.norm.unique_pred(p2), p1)
+        self.assertIs(self.norm.unique_pred(p3), p1)
+        self.assertIsNot(self.norm.unique_pred(And(is_pic, is_64bit)), p1)
+
+    def test_simplify(self):
+        s = self.norm.simplify
+        self.assertIs(s(And(is_pic)), is_pic)
+        self.assertIs(s(Not(Not(is_pic))), is_pic)
+        self.assertIs(s(Or(is_pic, Not(is_pic))), None)
+        self.assertIs(s(And(is_pic, Or(is_64bit, Not(is_64bit)))), is_pic)
+        # Implied parts are dropped.
+        self.assertIs(s(And(is_pic, Or(is_pic, is_64bit))), is_pic)
+        self.assertIs(s(Or(is_64bit, And(is_64bit, is_pic))), is_64bit)
+        self.assertEqual(
+                str(s(And(And(is_pic, is_64bit), is_compressed))),
+                'And(shared.is_pic, shared.is_64bit, shared.is_compressed)')
+        # Predicates that can't be simplified are kept.
+        p = Or(is_pic, is_64bit)
+        self.assertIs(s(p), p)
+
+    def test_atoms(self):
+        named = And(is_pic, is_64bit)
+        self.norm.add_atom(named)
+        # Equivalent predicates are replaced by the atom.
+        self.assertIs(self.norm.unique_pred(And(is_64bit, is_pic)), named)
+        # Implied parts are dropped, but the atom is not rewritten.
+        self.assertIs(self.norm.simplify(And(named, is_pic)), named)
+        self.assertIs(self.norm.simplify(named), named)
+
+    def test_settings(self):
+        self.norm.add_settings(group)
+        self.assertIs(self.norm.unique_pred(And(is_pic)), is_pic)
+
+    def test_instp(self):
+        imm8 = IsSignedInt(BinaryImm.imm, 8)
+        imm16 = IsSignedInt(BinaryImm.imm, 16)
+        u = self.norm.unique_pred(And(imm8, imm16))
+        self.assertIsInstance(u, And)
+        self.assertIs(self.norm.unique_pred(And(imm16, imm8)), u)
+        self.assertIs(self.norm.unique_pred(Or(imm8, imm8)), imm8)
+
+
+class TestEvaluationOrder(TestCase):
+    def setUp(self):
+        self.imm8 = IsSignedInt(BinaryImm.imm, 8)
+        self.i32 = TypePredicate(0, i32)
+
+    def tearDown(self):
+        configure_outcomes(None)
+
+    def test_cost(self):
+        # The immediate is tested before the more expensive type check.
+        self.assertEqual(
+                And(self.i32, self.imm8).rust_predicate(0),
+                'predicates::is_signed_int(imm, 8, 0) && '
+                'dfg.value_type(args[0]) == ir::types::I32')
+        p = Or(And(is_pic, is_compressed), Not(is_64bit))
+        self.assertEqual(
+                p.rust_predicate(0),
+                '!shared.is_64bit() || '
+                'shared.is_pic() && shared.is_compressed()')
+
+    def test_outcomes(self):
+        configure_outcomes(PredicateProfile.parse([
+            '100 10 shared.is_pic',
+            '100 90 shared.is_64bit']))
+        # `is_64bit` is usually false, so it goes first in an `And`.
+        self.assertEqual(
+                And(is_pic, is_compressed, is_64bit).rust_predicate(0),
+                'shared.is_64bit() && shared.is_pic() && '
+                'shared.is_compressed()')
+        # `is_pic` is usually true, so it goes first in an `Or`.
+        self.assertEqual(
+                Or(is_compressed, is_64bit, is_pic).rust_predicate(0),
+                'shared.is_pic() || shared.is_64bit() || '
+                'shared.is_compressed()')
@@ -1,19 +1,45 @@
 """
 Generate constant hash tables.
 
-The `constant_hash` module can generate constant pre-populated hash tables. We
-don't attempt parfect hashing, but simply generate an open addressed
-quadratically probed hash table.
+The `constant_hash` module can generate constant pre-populated hash tables.
+The default is an open addressed quadratically probed hash table, see
+`compute_quadratic()`.
+
+Tables that are used on hot paths can instead be built as perfect hash tables
+with `compute_perfect()`. A lookup in a perfect hash table always examines a
+single table slot, at the cost of an additional array of displacements.
+
+The generators use `search_quadratic()` to try a few layouts of each
+quadratically probed table and keep the one with the shortest probe sequences.
+When the items have known lookup frequencies, the most frequently used items
+are inserted first so they get the shortest probe sequences.
+The probe length statistics of all the tables built are recorded by name, see
+`table_stats()`.
 """
 from __future__ import absolute_import
 from cdsl import next_power_of_two
 
 try:
-    from typing import Any, List, Iterable, Callable  # noqa
+    from typing import Any, Dict, List, Iterable, Callable, Optional, Sequence, Tuple  # noqa
 except ImportError:
     pass
 
 
+# Default fraction of a quadratically probed table to fill with items. Tables
+# are at least this much larger than the number of items.
+DEFAULT_MULTIPLIER = 1.2
+
+# Default number of insertion orders tried by `search_quadratic()`.
+DEFAULT_SEEDS = 8
+
+# Layouts tried by `search_quadratic()`, see `configure_search()`.
+_search_seeds = list(range(DEFAULT_SEEDS))  # type: List[int]
+_search_multipliers = [DEFAULT_MULTIPLIER]  # type: List[float]
+
+# Statistics of the tables built by this process, keyed by table name.
+_table_stats = dict()  # type: Dict[str, ProbeStats]
+
+
 def simple_hash(s):
     # type: (str) -> int
     """
@@ -31,8 +57,10 @@ def simple_hash(s):
     return h
 
 
-def compute_quadratic(items, hash_function):
-    # type: (Iterable[Any], Callable[[Any], int]) -> List[Any]
+def compute_quadratic(
+        items, hash_function, seed=0, multiplier=DEFAULT_MULTIPLIER,
+        weight=None):
+    # type: (Iterable[Any], Callable[[Any], int], int, float, Optional[Callable[[Any], int]]) -> List[Any]  # noqa
     """
     Compute an open addressed, quadratically probed hash table containing
     `items`. The returned table is a list containing the elements of the
@@ -41,15 +69,33 @@ def compute_quadratic(items, hash_function):
     :param items: Iterable set of items to place in hash table.
     :param hash_function: Hash function which takes an item and returns a
             number.
+    :param seed: Items are inserted in the order given when this is 0.
+            Other values select a pseudo-random insertion order, which
+            changes the probe lengths of colliding items.
+    :param multiplier: The table size is the next power of two larger than
+            the number of items times this.
+    :param weight: Function returning the lookup frequency of an item. Items
+            with higher weights are inserted first, and the seed only orders
+            items with the same weight.
 
     Simple example (see hash values above, they collide on slot 1):
         >>> compute_quadratic(['Hello', 'world'], simple_hash)
         [None, 'Hello', 'world', None]
+        >>> compute_quadratic(['Hello', 'world'], simple_hash, seed=1)
+        [None, 'world', 'Hello', None]
+        >>> compute_quadratic(['Hello', 'world'], simple_hash,
+        ...                   weight=lambda i: len(i) if i == 'world' else 0)
+        [None, 'world', 'Hello', None]
     """
 
     items = list(items)
+    if seed:
+        items.sort(key=lambda i: displace(hash_function(i) & 0xffffffff, seed))
+    if weight is not None:
+        # This sort is stable, so it keeps the seeded order for equal weights.
+        items.sort(key=weight, reverse=True)
     # Table size must be a power of two. Aim for >20% unused slots.
-    size = next_power_of_two(int(1.20*len(items)))
+    size = next_power_of_two(int(multiplier * len(items)))
     table = [None] * size  # type: List[Any]
 
     for i in items:
@@ -61,3 +107,358 @@ def compute_quadratic(items, hash_function):
         table[h] = i
 
     return table
+
+
+# Largest displacement that can be stored in a displacement table entry.
+MAX_DISPLACEMENT = 0xffff
+
+# Average number of keys per displacement table entry.
+BUCKET_SIZE = 4
+
+
+def mix32(h):
+    # type: (int) -> int
+    """
+    Scramble the bits of the 32-bit hash value `h`. This is the finalizer from
+    MurmurHash3.
+
+    Must match `mix32()` in `lib/cretonne/src/constant_hash.rs`.
+
+        >>> "0x%x" % mix32(1)
+        '0x514e28b7'
+    """
+    h ^= h >> 16
+    h = (h * 0x85ebca6b) & 0xffffffff
+    h ^= h >> 13
+    h = (h * 0xc2b2ae35) & 0xffffffff
+    h ^= h >> 16
+    return h
+
+
+def displace(h, d):
+    # type: (int, int) -> int
+    """
+    Compute the hash used to find a table slot for the hash value `h` with the
+    displacement `d`.
+
+    Must match `displace()` in `lib/cretonne/src/constant_hash.rs`.
+
+        >>> displace(1, 0) == mix32(1)
+        True
+        >>> "0x%x" % displace(1, 1)
+        '0x96a0f96b'
+    """
+    return mix32((h + d * 0x9e3779b9) & 0xffffffff)
+
+
+def perfect_bucket(h, buckets):
+    # type: (int, int) -> int
+    """
+    Get the index into a displacement table of size `buckets` for the hash
+    value `h`.
+
+    This uses the high bits of the mixed hash while table slots are selected
+    by the low bits, so keys sharing a displacement are spread over the table.
+    """
+    return (mix32(h) >> 16) & (buckets - 1)
+
+
+def _place_buckets(hashes, size, buckets):
+    # type: (List[int], int, int) -> Optional[Tuple[List[Optional[int]], List[int]]]  # noqa
+    """
+    Try to find displacements that map the `hashes` to distinct slots in a
+    table of size `size`.
+
+    Return `(slots, displacements)` where `slots[i]` is the index of the hash
+    value placed in slot `i`, or `None` if no displacements could be found.
+    """
+    members = [[] for _ in range(buckets)]  # type: List[List[int]]
+    for idx, h in enumerate(hashes):
+        members[perfect_bucket(h, buckets)].append(idx)
+
+    slots = [None] * size  # type: List[Optional[int]]
+    displacements = [0] * buckets
+    # Place the largest buckets first while the table is mostly empty.
+    for b in sorted(range(buckets), key=lambda b: -len(members[b])):
+        if not members[b]:
+            break
+        for d in range(MAX_DISPLACEMENT + 1):
+            cand = [displace(hashes[i], d) & (size - 1) for i in members[b]]
+            if (len(set(cand)) == len(cand) and
+                    all(slots[s] is None for s in cand)):
+                break
+        else:
+            return None
+        displacements[b] = d
+        for s, i in zip(cand, members[b]):
+            slots[s] = i
+    return slots, displacements
+
+
+def compute_perfect(items, hash_function, name=None):
+    # type: (Iterable[Any], Callable[[Any], int], Optional[str]) -> Tuple[List[Any], List[int]]  # noqa
+    """
+    Compute a perfect hash table containing `items` using the
+    hash-and-displace method.
+
+    The items are divided into buckets by their hash values, and each bucket
+    gets a displacement which is combined with the item hashes to select
+    distinct table slots. A lookup computes the bucket of the key, and then
+    examines the single slot selected by the bucket's displacement.
+
+    The table size is the smallest power of two that can hold `items`, so the
+    table is minimal when the number of items is a power of two. The number of
+    displacements is also a power of two.
+
+    :param items: Iterable set of items to place in hash table.
+    :param hash_function: Hash function which takes an item and returns a
+            number. The hash values must be distinct.
+    :param name: Record the table statistics under this name.
+    :returns: `(table, displacements)` where the table is a list containing
+            the elements of `items` and `None` in unused slots.
+
+    The two strings from the `compute_quadratic` example don't collide:
+        >>> compute_perfect(['Hello', 'world'], simple_hash)
+        (['Hello', 'world'], [0])
+    """
+    items = list(items)
+    hashes = [hash_function(i) & 0xffffffff for i in items]
+    assert len(set(hashes)) == len(hashes), "Hash values must be distinct"
+
+    size = next_power_of_two(len(items) - 1) if items else 1
+    buckets = next_power_of_two(max(len(items) - 1, 0) // BUCKET_SIZE)
+    while True:
+        placed = _place_buckets(hashes, size, buckets)
+        if placed is not None:
+            slots, displacements = placed
+            table = [items[i] if i is not None else None for i in slots]
+            if name is not None:
+                record_stats(name, perfect_stats(table))
+            return table, displacements
+        # Very unlikely with a reasonable hash function.
+        size *= 2
+
+
+class ProbeStats(object):
+    """
+    Probe length statistics for a hash table.
+
+    The probe length of a lookup is the number of table slots examined.
+
+    :param histogram: The number of items found with each probe length.
+            `histogram[n]` counts the items found after `n + 1` probes.
+    :param miss_mean: The average probe length of a lookup for a missing key,
+            assuming its hash value is uniformly distributed.
+    :param size: The number of table slots.
+    :param method: How the table was built, `quadratic` or `perfect`.
+    :param seed: The insertion order seed of a quadratic table.
+    :param weighted_mean: The average probe length of a lookup, weighted by
+            the lookup frequencies of the items, if they are known.
+    """
+
+    def __init__(
+            self, histogram, miss_mean, size, method, seed=0,
+            weighted_mean=None):
+        # type: (List[int], float, int, str, int, Optional[float]) -> None
+        self.histogram = histogram
+        self.miss_mean = miss_mean
+        self.size = size
+        self.method = method
+        self.seed = seed
+        self.weighted_mean = weighted_mean
+
+    @property
+    def items(self):
+        # type: () -> int
+        return sum(self.histogram)
+
+    @property
+    def mean(self):
+        # type: () -> float
+        """The average probe length when looking up an item in the table."""
+        if not self.items:
+            return 0.0
+        total = sum((n + 1) * c for n, c in enumerate(self.histogram))
+        return float(total) / self.items
+
+    @property
+    def worst(self):
+        # type: () -> int
+        """The longest probe length when looking up an item in the table."""
+        return len(self.histogram)
+
+    def key(self):
+        # type: () -> Tuple[float, float, int, float, int]
+        """
+        Sort key ranking the best table layout first. Layouts are ranked by
+        their weighted mean probe length first, when it is known.
+        """
+        weighted = self.weighted_mean
+        if weighted is None:
+            weighted = self.mean
+        return (weighted, self.mean, self.worst, self.miss_mean, self.size)
+
+    def comment(self):
+        # type: () -> str
+        """
+        Describe the statistics in a comment for the generated table.
+
+            >>> print(ProbeStats([3, 1], 1.5, 8, 'quadratic').comment())
+            4 items in 8 slots: probes mean 1.25, worst 2, miss 1.50 [3, 1]
+        """
+        s = '{} items in {} slots: probes mean {:.2f}, worst {}, ' \
+            'miss {:.2f} {}'.format(
+                    self.items, self.size, self.mean, self.worst,
+                    self.miss_mean, self.histogram)
+        if self.seed:
+            s += ', seed {}'.format(self.seed)
+        if self.weighted_mean is not None:
+            s += ', weighted mean {:.2f}'.format(self.weighted_mean)
+        return s
+
+    def to_json(self):
+        # type: () -> Dict[str, Any]
+        """Get the statistics as a JSON object."""
+        d = {
+                'method': self.method,
+                'items': self.items,
+                'size': self.size,
+                'seed': self.seed,
+                'histogram': self.histogram,
+                'mean': round(self.mean, 4),
+                'worst': self.worst,
+                'miss_mean': round(self.miss_mean, 4)}  # type: Dict[str, Any]
+        if self.weighted_mean is not None:
+            d['weighted_mean'] = round(self.weighted_mean, 4)
+        return d
+
+
+def quadratic_stats(table, hash_function, seed=0, weight=None):
+    # type: (List[Any], Callable[[Any], int], int, Optional[Callable[[Any], int]]) -> ProbeStats  # noqa
+    """
+    Compute the probe length statistics for the quadratically probed `table`.
+
+    If `weight` is given, it returns the lookup frequency of an item, and the
+    weighted mean probe length is computed too. It is left out if none of the
+    items have a positive weight.
+
+        >>> quadratic_stats([None, 'Hello', 'world', None], simple_hash).mean
+        1.5
+        >>> quadratic_stats([None, 'Hello', 'world', None], simple_hash,
+        ...                 weight=lambda i: 3 if i == 'world' else 1
+        ...                 ).weighted_mean
+        1.75
+    """
+    size = len(table)
+    histogram = []  # type: List[int]
+    total_weight = 0
+    weighted_probes = 0
+    for i in table:
+        if i is None:
+            continue
+        h = hash_function(i) % size
+        n = 0
+        while table[h] is not i:
+            n += 1
+            h = (h + n) % size
+        histogram.extend([0] * (n + 1 - len(histogram)))
+        histogram[n] += 1
+        if weight is not None:
+            w = weight(i)
+            total_weight += w
+            weighted_probes += w * (n + 1)
+
+    # Lookups of missing keys end at the first empty slot.
+    misses = 0
+    for start in range(size):
+        h = start
+        n = 0
+        while table[h] is not None:
+            n += 1
+            h = (h + n) % size
+        misses += n + 1
+    weighted_mean = None
+    if total_weight > 0:
+        weighted_mean = float(weighted_probes) / total_weight
+    return ProbeStats(
+            histogram, float(misses) / size, size, 'quadratic', seed,
+            weighted_mean)
+
+
+def perfect_stats(table):
+    # type: (List[Any]) -> ProbeStats
+    """Get the probe length statistics for the perfect hash `table`."""
+    items = sum(1 for i in table if i is not None)
+    return ProbeStats([items] if items else [], 1.0, len(table), 'perfect')
+
+
+def configure_search(seeds=DEFAULT_SEEDS, multipliers=(DEFAULT_MULTIPLIER,)):
+    # type: (int, Sequence[float]) -> None
+    """
+    Configure the layouts that `search_quadratic()` tries for each table.
+
+    :param seeds: Number of insertion orders to try.
+    :param multipliers: Table size multipliers to try, see
+            `compute_quadratic()`.
+    """
+    assert seeds > 0 and multipliers
+    assert all(m >= 1 for m in multipliers), "Tables need an empty slot"
+    _search_seeds[:] = list(range(seeds))
+    _search_multipliers[:] = multipliers
+
+
+def search_quadratic(items, hash_function, name=None, weight=None):
+    # type: (Iterable[Any], Callable[[Any], int], Optional[str], Optional[Callable[[Any], int]]) -> Tuple[List[Any], ProbeStats]  # noqa
+    """
+    Compute quadratically probed hash tables containing `items` with all the
+    layouts configured by `configure_search()`, and return the one with the
+    shortest probe lengths.
+
+    If `weight` is given, it returns the lookup frequency of an item. Frequent
+    items are inserted first, and the layouts are ranked by their probe
+    lengths weighted by frequency.
+
+    The statistics for the table are recorded under `name` if given.
+
+    Return `(table, stats)`.
+    """
+    items = list(items)
+    best = None  # type: Optional[Tuple[List[Any], ProbeStats]]
+    for multiplier in _search_multipliers:
+        for seed in _search_seeds:
+            table = compute_quadratic(
+                    items, hash_function, seed, multiplier, weight)
+            stats = quadratic_stats(table, hash_function, seed, weight)
+            if best is None or stats.key() < best[1].key():
+                best = (table, stats)
+    assert best is not None
+    if name is not None:
+        record_stats(name, best[1])
+    return best
+
+
+def record_stats(name, stats):
+    # type: (str, ProbeStats) -> None
+    """Record the statistics for the table `name`."""
+    _table_stats[name] = stats
+
+
+def table_stats():
+    # type: () -> Dict[str, ProbeStats]
+    """Get the statistics recorded for all the tables built so far."""
+    return _table_stats
+
+
+def reset_table_stats():
+    # type: () -> None
+    _table_stats.clear()
+
+
+def stats_report(stats):
+    # type: (Dict[str, ProbeStats]) -> Dict[str, Any]
+    """Get a JSON report of the table statistics in `stats`."""
+    return {
+            'seeds': len(_search_seeds),
+            'multipliers': list(_search_multipliers),
+            'tables': dict((name, st.to_json())
+                           for name, st in stats.items())}
@@ -0,0 +1,308 @@
+"""
+Lookup frequency profiles for the encoding tables.
+
+A profile counts how often `TargetISA::encode()` looks up each `(CPU mode,
+controlling type, opcode)` tuple. `gen_encoding` uses it to insert the most
+frequently used entries into the hash tables first, so those lookups find
+their entry at the first probe.
+
+A profile is a text file with one tuple per line:
+
+    intel.I64 i32 iadd 1200
+    intel.I64 void jump 310
+
+The CPU mode is qualified by the ISA name, non-polymorphic instructions use
+the `void` type, and the last column is the number of lookups. Blank lines and
+lines starting with `#` are ignored. Tuples that don't have an encoding are
+ignored too, so a profile can be collected without knowing which
+instructions are legal.
+
+Profiles can be recorded from production workloads. Running this module
+collects one from the instructions in a filetests corpus:
+
+    python encoding_profile.py -o profile.txt ../../../filetests
+
+The filetests parser is approximate: It infers the controlling type of an
+instruction from its type suffix or from the type of its type variable
+operand. Instructions whose operand types can't be inferred are skipped.
+"""
+from __future__ import absolute_import, print_function
+import argparse
+import os
+import re
+from collections import defaultdict
+from cdsl.types import ValueType
+from cdsl.typevar import TypeVar
+
+try:
+    from typing import Dict, Iterable, List, Optional, Tuple, TYPE_CHECKING  # noqa
+    if TYPE_CHECKING:
+        from cdsl.isa import CPUMode  # noqa
+        from cdsl.instructions import Instruction  # noqa
+    Key = Tuple[str, str, str]
+except ImportError:
+    pass
+
+
+def mode_name(cpumode):
+    # type: (CPUMode) -> str
+    """Get the ISA-qualified name of `cpumode` used in profiles."""
+    return '{}.{}'.format(cpumode.isa.name, cpumode.name)
+
+
+def lookup_type(name):
+    # type: (str) -> Optional[ValueType]
+    """Get the value type called `name`, or `None` if there isn't one."""
+    try:
+        return ValueType.by_name(name)
+    except AttributeError:
+        return None
+
+
+def type_name(ty):
+    # type: (Optional[ValueType]) -> str
+    """Get the name of the controlling type `ty` used in profiles."""
+    return 'void' if ty is None else ty.name
+
+
+class EncodingProfile(object):
+    """
+    Lookup counts for `(CPU mode, controlling type, opcode)` tuples.
+
+        >>> p = EncodingProfile()
+        >>> p.add('intel.I64', 'i32', 'iadd', 3)
+        >>> p.add('intel.I64', 'i32', 'iadd')
+        >>> p.add('intel.I64', 'i32', 'isub')
+        >>> p.counts[('intel.I64', 'i32', 'iadd')]
+        4
+        >>> p.type_counts[('intel.I64', 'i32')]
+        5
+    """
+
+    def __init__(self):
+        # type: () -> None
+        self.counts = defaultdict(int)  # type: Dict[Key, int]
+        # Total count for each `(CPU mode, controlling type)` pair.
+        self.type_counts = defaultdict(int)  # type: Dict[Tuple[str, str], int]  # noqa
+
+    def add(self, mode, ty, opcode, count=1):
+        # type: (str, str, str, int) -> None
+        self.counts[(mode, ty, opcode)] += count
+        self.type_counts[(mode, ty)] += count
+
+    def count(self, cpumode, ty, inst):
+        # type: (CPUMode, Optional[ValueType], Instruction) -> int
+        """Get the number of lookups of `inst` with the controlling type."""
+        return self.counts.get(
+                (mode_name(cpumode), type_name(ty), inst.name), 0)
+
+    def type_count(self, cpumode, ty):
+        # type: (CPUMode, Optional[ValueType]) -> int
+        """Get the number of lookups with the controlling type `ty`."""
+        return self.type_counts.get((mode_name(cpumode), type_name(ty)), 0)
+
+    def lines(self):
+        # type: () -> List[str]
+        """
+        Get the profile in the text format, most frequent tuples first.
+        """
+        keys = sorted(self.counts, key=lambda k: (-self.counts[k], k))
+        return ['{} {} {} {}'.format(m, t, o, self.counts[(m, t, o)])
+                for m, t, o in keys]
+
+    def write(self, path):
+        # type: (str) -> None
+        with open(path, 'w') as f:
+            for line in self.lines():
+                f.write(line + '\n')
+
+    @staticmethod
+    def parse(lines, source='<profile>'):
+        # type: (Iterable[str], str) -> EncodingProfile
+        """
+        Parse a profile from the lines of the text format.
+
+            >>> p = EncodingProfile.parse(['# hot', 'riscv.RV32 i32 iadd 7'])
+            >>> p.lines()
+            ['riscv.RV32 i32 iadd 7']
+        """
+        profile = EncodingProfile()
+        for lineno, line in enumerate(lines, 1):
+            line = line.strip()
+            if not line or line.startswith('#'):
+                continue
+            fields = line.split()
+            if len(fields) != 4 or not fields[3].isdigit():
+                raise ValueError('{}:{}: expected "mode type opcode count"'
+                                 .format(source, lineno))
+            profile.add(fields[0], fields[1], fields[2], int(fields[3]))
+        return profile
+
+    @staticmethod
+    def load(path):
+        # type: (str) -> EncodingProfile
+        with open(path) as f:
+            return EncodingProfile.parse(f, path)
+
+
+# Regular expressions for parsing filetests.
+ISA_RE = re.compile(r'^isa\s+(\w+)')
+SET_RE = re.compile(r'^set\s+(.*)')
+EBB_RE = re.compile(r'^ebb\d+\s*\((.*)\)\s*:')
+PARAM_RE = re.compile(r'(v\d+)\s*:\s*(\w+)')
+INST_RE = re.compile(
+        r'^(?:\[[^\]]*\]\s*)?'
+        r'(?:(v\d+(?:\s*,\s*v\d+)*)\s*=\s*)?'
+        r'([a-z][a-z0-9_]*)(?:\.([a-z0-9]+))?\b(.*)$')
+VALUE_RE = re.compile(r'\bv\d+\b')
+
+
+class FiletestCollector(object):
+    """
+    Collect an `EncodingProfile` from the instructions in filetests.
+
+    Each instruction in a file is counted for the CPU modes of all the `isa`
+    lines in the file. Target ISAs with more than one CPU mode are assumed to
+    use the mode with `64` in its name when the `is_64bit` setting is enabled.
+
+    :param instrs: All instructions, indexed by name.
+    :param cpumodes: The CPU modes of each target ISA, indexed by ISA name.
+    """
+
+    def __init__(self, instrs, cpumodes):
+        # type: (Dict[str, Instruction], Dict[str, List[CPUMode]]) -> None
+        self.instrs = instrs
+        self.cpumodes = cpumodes
+        self.profile = EncodingProfile()
+
+    def select_mode(self, isa_name, is_64bit):
+        # type: (str, bool) -> Optional[CPUMode]
+        modes = self.cpumodes.get(isa_name)
+        if not modes:
+            return None
+        for mode in modes:
+            if ('64' in mode.name) == is_64bit:
+                return mode
+        return modes[0]
+
+    def ctrl_type(self, inst, suffix, args, types):
+        # type: (Instruction, Optional[str], str, Dict[str, ValueType]) -> Tuple[bool, Optional[ValueType]]  # noqa
+        """
+        Infer the controlling type of an instruction.
+
+        Return `(known, ty)` where `ty` is `None` for non-polymorphic
+        instructions.
+        """
+        if not inst.is_polymorphic:
+            return True, None
+        if suffix:
+            ty = lookup_type(suffix)
+            return ty is not None, ty
+        if inst.use_typevar_operand:
+            values = VALUE_RE.findall(args)
+            idx = inst.format.typevar_operand
+            if idx < len(values) and values[idx] in types:
+                return True, types[values[idx]]
+        return False, None
+
+    def result_types(self, inst, ctrl, results, types):
+        # type: (Instruction, Optional[ValueType], List[str], Dict[str, ValueType]) -> None  # noqa
+        """Record the types of `results` in `types` where they are known."""
+        for value, opnum in zip(results, inst.value_results):
+            tv = inst.outs[opnum].typevar
+            if tv is inst.ctrl_typevar and ctrl is not None:
+                types[value] = ctrl
+            elif not tv.is_derived and tv.type_set.size() == 1:
+                types[value] = tv.type_set.get_singleton()
+            elif (tv.is_derived and tv.base is inst.ctrl_typevar and
+                    tv.derived_func == TypeVar.ASBOOL and ctrl is not None and
+                    ctrl.lane_count() == 1):
+                types[value] = ValueType.by_name('b1')
+
+    def collect_file(self, path):
+        # type: (str) -> None
+        modes = []  # type: List[CPUMode]
+        is_64bit = False
+        types = dict()  # type: Dict[str, ValueType]
+        with open(path) as f:
+            for line in f:
+                line = line.split(';', 1)[0].strip()
+                if not line:
+                    continue
+                m = SET_RE.match(line)
+                if m:
+                    for s in m.group(1).split():
+                        if s.split('=')[0] == 'is_64bit':
+                            is_64bit = s in ('is_64bit', 'is_64bit=1',
+                                             'is_64bit=true')
+                    continue
+                m = ISA_RE.match(line)
+                if m:
+                    mode = self.select_mode(m.group(1), is_64bit)
+                    if mode is not None:
+                        modes.append(mode)
+                    continue
+                if line.startswith('function'):
+                    types = dict()
+                    continue
+                m = EBB_RE.match(line)
+                if m:
+                    for value, name in PARAM_RE.findall(m.group(1)):
+                        ty = lookup_type(name)
+                        if ty is not None:
+                            types[value] = ty
+                    continue
+                m = INST_RE.match(line)
+                if not m or m.group(2) not in self.instrs or '->' in line:
+                    continue
+                inst = self.instrs[m.group(2)]
+                known, ctrl = self.ctrl_type(
+                        inst, m.group(3), m.group(4), types)
+                if not known:
+                    continue
+                if m.group(1):
+                    results = [v.strip() for v in m.group(1).split(',')]
+                    self.result_types(inst, ctrl, results, types)
+                for mode in modes:
+                    self.profile.add(
+                            mode_name(mode), type_name(ctrl), inst.name)
+
+    def collect(self, paths):
+        # type: (Iterable[str]) -> EncodingProfile
+        """Collect the profile from the `.cton` files under `paths`."""
+        for top in paths:
+            if os.path.isfile(top):
+                self.collect_file(top)
+                continue
+            for dirpath, dirnames, filenames in os.walk(top):
+                dirnames.sort()
+                for name in sorted(filenames):
+                    if name.endswith('.cton'):
+                        self.collect_file(os.path.join(dirpath, name))
+        return self.profile
+
+
+def main():
+    # type: () -> None
+    parser = argparse.ArgumentParser(
+            description='Collect an encoding profile from filetests.')
+    parser.add_argument(
+            'paths', nargs='+', help='.cton files or directories')
+    parser.add_argument(
+            '-o', '--output', required=True, help='write the profile here')
+    args = parser.parse_args()
+
+    import isa
+    instrs = dict()  # type: Dict[str, Instruction]
+    for group in isa.instruction_groups():
+        for inst in group.instructions:
+            instrs[inst.name] = inst
+    cpumodes = dict((target.name, target.cpumodes)
+                    for target in isa.all_isas())
+    profile = FiletestCollector(instrs, cpumodes).collect(args.paths)
+    profile.write(args.output)
+    print('Wrote {} entries to {}.'.format(len(profile.counts), args.output))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,220 @@
+"""
+Generate all the Rust sources.
+
+This module drives the individual `gen_*` generators. It is imported by
+`build.py` when the generated sources can't be found in the output cache.
+"""
+from __future__ import absolute_import
+import json
+import multiprocessing
+import os
+import srcgen
+import build_profile
+import constant_hash
+import table_sizes
+import gen_types
+import gen_instr
+import gen_settings
+import gen_encoding
+import gen_legalizer
+import gen_registers
+import gen_binemit
+
+try:
+    from typing import Any, Dict, Sequence, List, Optional, Tuple  # noqa
+    from constant_hash import ProbeStats  # noqa
+    from table_sizes import TableSize  # noqa
+    from cdsl.isa import TargetISA  # noqa
+    from cdsl.instructions import InstructionGroup  # noqa
+except ImportError:
+    pass
+
+
+def gen_isa_sources(target, enc_options=None):
+    # type: (TargetISA, Optional[gen_encoding.EncodingOptions]) -> List[Tuple[str, srcgen.Formatter]]  # noqa
+    """
+    Generate all the source files that are specific to `target`.
+
+    This produces the same files as the per-ISA loops in the `gen_*.generate()`
+    functions, in the same order. Shared files like `settings.rs` and
+    `legalizer.rs` are not included.
+
+    Return a list of `(filename, formatter)` pairs.
+    """
+    sources = []  # type: List[Tuple[str, srcgen.Formatter]]
+
+    target.settings.qual_mod = 'isa::{}::settings'.format(
+            target.settings.name)
+    fmt = srcgen.Formatter()
+    gen_settings.gen_group(target.settings, fmt)
+    sources.append(('settings-{}.rs'.format(target.name), fmt))
+
+    fmt = srcgen.Formatter()
+    gen_encoding.gen_isa(target, fmt, enc_options)
+    sources.append(('encoding-{}.rs'.format(target.name), fmt))
+
+    fmt = srcgen.Formatter()
+    gen_legalizer.gen_isa(target, fmt, set())
+    sources.append(('legalize-{}.rs'.format(target.name), fmt))
+
+    fmt = srcgen.Formatter()
+    gen_registers.gen_isa(target, fmt)
+    sources.append(('registers-{}.rs'.format(target.name), fmt))
+
+    fmt = srcgen.Formatter()
+    gen_binemit.gen_isa(target, fmt)
+    sources.append(('binemit-{}.rs'.format(target.name), fmt))
+
+    return sources
+
+
+# Name of the JSON file with probe length statistics for the hash tables.
+HASH_TABLES_REPORT = 'hash-tables.json'
+
+
+def write_hash_tables_report(out_dir):
+    # type: (str) -> None
+    """
+    Write the statistics for all the hash tables built so far to the
+    `HASH_TABLES_REPORT` file in `out_dir`.
+    """
+    report = constant_hash.stats_report(constant_hash.table_stats())
+    data = json.dumps(report, indent=2, sort_keys=True,
+                      separators=(',', ': ')) + '\n'
+    srcgen.update_file(
+            os.path.join(out_dir, HASH_TABLES_REPORT), data.encode('utf-8'))
+
+
+# Generators with a `generate(isas, out_dir)` function, in the order they are
+# run by a serial build.
+PER_ISA_GENERATORS = [
+        gen_settings, gen_encoding, gen_legalizer, gen_registers,
+        gen_binemit]  # type: List[Any]
+
+# Target ISAs available to worker processes, keyed by name. This is populated
+# before the process pool is created, so forked workers inherit the finished
+# ISA definitions and the instruction numbering assigned by `gen_instr`.
+_worker_isas = dict()  # type: Dict[str, TargetISA]
+_worker_enc_options = [None]  # type: List[Optional[gen_encoding.EncodingOptions]]  # noqa
+
+
+def _gen_isa_worker(name):
+    # type: (str) -> Tuple[List[Tuple[str, List[str]]], Dict[str, ProbeStats], Dict[str, Dict[str, TableSize]], Dict[str, List[str]]]  # noqa
+    """
+    Process pool entry point: Generate the per-ISA sources for `name`.
+
+    Formatter objects are reduced to their lines before being sent back,
+    along with the statistics for the hash tables built, the sizes of the
+    tables generated, and the removed encodings.
+    """
+    constant_hash.reset_table_stats()
+    table_sizes.reset_table_sizes()
+    sources = [(filename, fmt.lines)
+               for filename, fmt in gen_isa_sources(
+                   _worker_isas[name], _worker_enc_options[0])]
+    return (sources, constant_hash.table_stats(), table_sizes.table_sizes(),
+            table_sizes.removed_encodings())
+
+
+def fork_context():
+    # type: () -> Any
+    """
+    Get a multiprocessing context that starts workers with `fork()`, or `None`
+    if that is not supported on this platform.
+
+    The workers depend on inheriting the in-memory ISA definitions, so we can't
+    use the `spawn` start method.
+    """
+    get_context = getattr(multiprocessing, 'get_context', None)
+    if get_context is None:
+        # Python 2 always forks on POSIX systems.
+        return multiprocessing if hasattr(os, 'fork') else None
+    try:
+        return get_context('fork')
+    except ValueError:
+        return None
+
+
+def generate_parallel(isas, jobs, out_dir, enc_options=None):
+    # type: (Sequence[TargetISA], int, str, Optional[gen_encoding.EncodingOptions]) -> None  # noqa
+    """
+    Generate the per-ISA sources using a pool of `jobs` worker processes.
+
+    The shared `settings.rs` and `legalizer.rs` files are generated by this
+    process, and all the files are written in a fixed order, so the output is
+    identical to a serial build.
+    """
+    ctx = fork_context()
+    if ctx is None:
+        generate_serial(isas, out_dir, enc_options)
+        return
+
+    # The ISA settings refer to the shared settings module which is assigned
+    # here, so this must happen before the workers are forked.
+    gen_settings.gen_shared(gen_settings.shared_group(isas), out_dir)
+
+    _worker_isas.clear()
+    for target in isas:
+        _worker_isas[target.name] = target
+    _worker_enc_options[0] = enc_options
+
+    pool = ctx.Pool(min(jobs, len(isas)))
+    try:
+        results = pool.map(_gen_isa_worker, [target.name for target in isas])
+    finally:
+        pool.close()
+        pool.join()
+
+    for sources, stats, sizes, removed in results:
+        constant_hash.table_stats().update(stats)
+        table_sizes.table_sizes().update(sizes)
+        table_sizes.removed_encodings().update(removed)
+        for filename, lines in sources:
+            fmt = srcgen.Formatter()
+            fmt.lines = lines
+            fmt.update_file(filename, out_dir)
+
+    gen_legalizer.gen_shared(gen_legalizer.shared_groups(isas), out_dir)
+
+
+def generate_serial(isas, out_dir, enc_options=None):
+    # type: (Sequence[TargetISA], str, Optional[gen_encoding.EncodingOptions]) -> None  # noqa
+    """
+    Generate the per-ISA sources and the shared files that depend on them.
+    """
+    for gen in PER_ISA_GENERATORS:
+        with build_profile.phase('generate', gen.__name__):
+            if gen is gen_encoding:
+                gen_encoding.generate(isas, out_dir, enc_options)
+            else:
+                gen.generate(isas, out_dir)
+
+
+def generate(isas, out_dir, jobs=1, groups=None, enc_options=None):
+    # type: (Sequence[TargetISA], str, int, Optional[Sequence[InstructionGroup]], Optional[gen_encoding.EncodingOptions]) -> None  # noqa
+    """
+    Generate all the Rust sources for `isas` in `out_dir`.
+
+    :param jobs: Number of worker processes to use for per-ISA generation.
+    :param groups: Instruction groups to include in the shared opcode
+        enumeration. This defaults to the groups used by `isas`, but it can
+        cover more target ISAs than the ones being generated.
+    :param enc_options: Options for the encoding tables.
+    """
+    if groups is None:
+        groups = gen_instr.collect_instr_groups(isas)
+    constant_hash.reset_table_stats()
+    table_sizes.reset_table_sizes()
+    with build_profile.phase('generate', 'gen_types'):
+        gen_types.generate(out_dir)
+    # This numbers the instructions, so it must happen before the per-ISA
+    # tables are generated.
+    with build_profile.phase('generate', 'gen_instr'):
+        gen_instr.generate(groups, out_dir)
+    if jobs > 1 and len(isas) > 1:
+        with build_profile.phase('generate', 'parallel'):
+            generate_parallel(isas, jobs, out_dir, enc_options)
+    else:
+        generate_serial(isas, out_dir, enc_options)
+    write_hash_tables_report(out_dir)
+    table_sizes.write_reports(out_dir)
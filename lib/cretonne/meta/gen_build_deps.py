@@ -11,33 +11,146 @@ If the build script outputs lines of the form:
 
 cargo will rerun the build script when those files have changed since the last
 build.
+
+The dependencies are the meta modules that were actually loaded by the build
+script, so editing unit tests or other unused files doesn't cause a rebuild.
+Directories are never listed since Cargo checks every file below them. A new
+target ISA package doesn't need a directory dependency: It is only used once
+it has been added to `isa/__init__.py`, which is always loaded.
 """
 from __future__ import absolute_import, print_function
+import json
 import os
-from os.path import dirname, abspath, join
+import sys
+from os.path import dirname, abspath, basename, join
+import build_cache
 
 try:
-    from typing import Iterable  # noqa
+    from typing import Dict, Iterable, List, Optional, Set  # noqa
 except ImportError:
     pass
 
 
-def source_files(top):
-    # type: (str) -> Iterable[str]
+META_DIR = dirname(abspath(__file__))
+
+# Generators of per-ISA files, keyed by file name prefix.
+PER_ISA_OUTPUTS = [
+        ('settings', 'gen_settings'),
+        ('encoding', 'gen_encoding'),
+        ('legalize', 'gen_legalizer'),
+        ('registers', 'gen_registers'),
+        ('binemit', 'gen_binemit')]
+
+
+def is_test(path):
+    # type: (str) -> bool
+    """
+    Check if `path` is a unit test module.
+
+        >>> is_test(join('cdsl', 'test_ti.py'))
+        True
+        >>> is_test(join('cdsl', 'ti.py'))
+        False
+    """
+    return basename(path).startswith('test_')
+
+
+def loaded_sources(top=META_DIR):
+    # type: (str) -> Set[str]
+    """
+    Get the source files in the directory tree `top` of all the modules that
+    are loaded in this process, excluding unit tests.
+    """
+    prefix = join(top, '')
+    paths = set()  # type: Set[str]
+    for mod in list(sys.modules.values()):
+        path = getattr(mod, '__file__', None)
+        if not path:
+            continue
+        path = abspath(path)
+        if path.endswith(('.pyc', '.pyo')):
+            path = path[:-1]
+        if path.startswith(prefix) and not is_test(path):
+            paths.add(path)
+    return paths
+
+
+def output_roots(isa_names, all_isa_names):
+    # type: (Iterable[str], Iterable[str]) -> Dict[str, List[str]]
     """
-    Recursively find all interesting source files and directories in the
-    directory tree starting at top. Yield a path to each file.
+    Get the meta modules that each generated file depends on, when generating
+    the target ISAs in `isa_names`.
+
+    This is conservative: Each per-ISA file depends on the whole ISA package.
+    The opcodes and the per-ISA tables also depend on the instruction
+    definitions of all the target ISAs in `all_isa_names`, since those
+    determine the opcode numbers.
+    """
+    isa_names = list(isa_names)
+    defs = ['isa.{}.defs'.format(name) for name in all_isa_names]
+    roots = {
+            'types.rs': ['gen_types', 'base.types'],
+            'opcodes.rs': ['gen_instr'] + defs,
+            'inst_builder.rs': ['gen_instr'] + defs,
+            'settings.rs': ['gen_settings', 'base.settings'],
+            'legalizer.rs': (
+                ['gen_legalizer'] + ['isa.' + name for name in isa_names])}
+    roots['hash-tables.json'] = (
+            ['gen_all'] + ['isa.' + name for name in isa_names] + defs)
+    shared_sizes = ['gen_instr', 'gen_settings', 'base.settings'] + defs
+    for ext in ('json', 'txt'):
+        roots['table-sizes-shared.' + ext] = shared_sizes
+    for name in isa_names:
+        for prefix, gen in PER_ISA_OUTPUTS:
+            roots['{}-{}.rs'.format(prefix, name)] = (
+                    [gen, 'isa.' + name] + defs)
+        for ext in ('json', 'txt'):
+            roots['table-sizes-{}.{}'.format(name, ext)] = (
+                    ['gen_encoding', 'gen_registers', 'gen_settings',
+                     'isa.' + name] + defs)
+    return roots
+
+
+def dependency_map(isa_names, all_isa_names, top=META_DIR):
+    # type: (Iterable[str], Iterable[str], str) -> Dict[str, List[str]]
     """
-    for (dirpath, dirnames, filenames) in os.walk(top):
-        yield dirpath
-        for f in filenames:
-            if f.endswith('.py'):
-                yield join(dirpath, f)
+    Compute the meta source files that each generated file depends on, as
+    paths relative to `top`.
+    """
+    deps = dict()  # type: Dict[str, List[str]]
+    for output, roots in output_roots(isa_names, all_isa_names).items():
+        deps[output] = [os.path.relpath(p, top)
+                        for p in build_cache.dependencies(roots, top)]
+    return deps
+
+
+def write_dependency_map(path, isa_names, all_isa_names):
+    # type: (str, Iterable[str], Iterable[str]) -> None
+    """Write the dependency map for the generated files as JSON to `path`."""
+    with open(path, 'w') as f:
+        json.dump(dependency_map(isa_names, all_isa_names), f,
+                  indent=2, sort_keys=True)
+        f.write('\n')
 
 
-def generate():
-    # type: () -> None
+def cargo_dependencies(paths=None):
+    # type: (Optional[Iterable[str]]) -> List[str]
+    """
+    Get the sorted paths that Cargo should watch for changes. These are the
+    files in `paths`, which default to the meta modules loaded in this
+    process.
+    """
+    if paths is None:
+        paths = loaded_sources()
+    return sorted(set(paths))
+
+
+def generate(paths=None):
+    # type: (Optional[Iterable[str]]) -> None
+    """
+    Print the Cargo dependencies on `paths`, which default to the meta
+    modules loaded in this process.
+    """
     print("Dependencies from meta language directory:")
-    meta = dirname(abspath(__file__))
-    for path in source_files(meta):
+    for path in cargo_dependencies(paths):
         print("cargo:rerun-if-changed=" + path)
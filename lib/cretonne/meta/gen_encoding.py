@@ -34,6 +34,23 @@ The two-level table lookup allows the level 2 tables to be much smaller with
 good locality. Code in any given function usually only uses a few different
 types, so many of the level 2 tables will be cold.
 
+The level 2 tables are quadratically probed hash tables by default. With the
+`perfect_hash` option, they are perfect hash tables instead, so finding an
+opcode always examines a single table entry. The displacements for all the
+level 2 tables are stored in the `LEVEL2_DISPLACEMENTS` table. Without the
+option, no displacements are emitted and the ISAs use the empty table in
+`isa::enc_tables::defaults`.
+
+When a lookup frequency profile is given with the `profile` option, the most
+frequently used opcodes and types are inserted into the quadratically probed
+tables first, so they are found at the first probe. See `encoding_profile`.
+
+With the `dense_level2` option, level 2 tables where a large enough fraction
+of the opcodes have an encoding list are emitted as direct arrays indexed by
+opcode number instead. The level 1 entry has a `dense` flag, and a dense
+lookup needs no probing or opcode comparison. The dense tables are shared
+with the hash tables in `LEVEL2`.
+
 ## Encoding lists
 
 An encoding list is a non-empty sequence of list entries. Each entry has
@@ -49,162 +66,499 @@ one of these forms:
 
 The instruction predicate is also used to distinguish between polymorphic
 instructions with different types for secondary type variables.
+
+The lists of an ISA are stored as u16 words when they fit the limits of that
+format, and as u32 words otherwise, see `EncListFormat`. The u32 format packs
+the recipe and the encoding bits of an entry into a single word. The
+`enclist_format` option selects a format for all ISAs.
+
+The encodings in a list are tried in the order they were added to the CPU
+mode, except that runs of adjacent encodings with the same predicates and
+operand constraints are sorted by `encoding_cost()`: Smaller encodings first,
+and encodings that preserve the CPU flags before the ones that clobber them.
+Encodings with different operand constraints are never reordered, so the
+register allocator keeps its choice of registers. For example, Intel lists a
+REX encoding that can use all registers before the REX-less encoding that
+can't.
+
+Encodings that are shadowed by an earlier encoding in their list are removed,
+see `EncList.shadowed_encodings()`. The removed encodings are listed in the
+table size report, and `build.py` prints a warning for each of them. Pass
+`shadowed=True` to `CPUMode.enc()` to keep an encoding that is shadowed on
+purpose.
+
+## Predicate leaves
+
+The instruction predicates and the instruction parts of the recipe
+predicates are not evaluated directly on the instruction. Their leaf
+predicates are grouped by instruction format, and a generated function for
+each group decodes the instruction fields once and returns the values of all
+the leaves as a bit mask. Equality tests of the same field and type checks of
+the same argument are exclusive, so they are evaluated as `if`/`else if`
+chains. The predicates get the mask from a `LeafValues`, which evaluates a
+group when it is first needed and keeps the mask of the last group, so the
+predicates tested for an instruction only test bits. A recipe predicate tests
+its ISA predicate before asking for the leaves, so a recipe that is disabled
+by the ISA flags doesn't evaluate any. See `LeafGroup`.
+
+## Preset specialization
+
+With the `specialize_presets` option, an additional set of tables is generated
+for each settings preset of an ISA, in a module named after the preset. The
+ISA predicates that only depend on the settings in the preset are resolved
+when these tables are generated, so their encoding lists don't test them. A
+`PRESET_TABLES_<MODE>` array lists the specialized tables along with the
+predicate values they assume, and the ISA selects matching tables when it is
+created.
+
+## Filtered encoding lists
+
+The ISA predicates in the encoding lists evaluate the same way for every
+lookup with the same ISA flags. With the `enclist_cache` option, the
+`ISAP_ENCLISTS` table lists the position and skip count of every predicate
+entry in the lists that test ISA predicates. The `IsaEncListCache` type is an
+`EncListCache` which uses the table to build copies of these lists without the
+ISA predicates when the ISA is created. Lookups of the lists iterate over the
+copies.
+
+Without the option, neither is emitted. The ISAs then use the defaults in
+`isa::enc_tables::defaults`: an empty table, and the stateless
+`NoEncListCache` which looks up the lists as they are.
 """
 from __future__ import absolute_import
 import srcgen
-from constant_hash import compute_quadratic
+import table_sizes
+from constant_hash import search_quadratic, compute_perfect
+import unique_table
 from unique_table import UniqueSeqTable
 from collections import OrderedDict, defaultdict
+import copy
 import math
 from itertools import groupby
 from cdsl.registers import RegClass, Register, Stack
-from cdsl.predicates import FieldPredicate, TypePredicate
+from cdsl.predicates import Predicate, And, Or, Not, evaluation_order
+from cdsl.predicates import FieldPredicate, IsEqual, TypePredicate
 from cdsl.settings import SettingGroup
 from cdsl.formats import instruction_context, InstructionFormat
 
 try:
-    from typing import Sequence, Set, Tuple, List, Dict, Iterable, DefaultDict, TYPE_CHECKING  # noqa
+    from typing import Any, Callable, Sequence, Set, Tuple, List, Dict, Iterable, DefaultDict, Optional, TYPE_CHECKING  # noqa
     if TYPE_CHECKING:
         from cdsl.isa import TargetISA, OperandConstraint, Encoding, CPUMode, EncRecipe, RecipePred  # noqa
-        from cdsl.predicates import PredNode, PredLeaf  # noqa
+        from cdsl.predicates import PredNode, PredLeaf, PredContext, PredKey  # noqa
         from cdsl.types import ValueType  # noqa
         from cdsl.instructions import Instruction  # noqa
         from cdsl.xform import XFormGroup  # noqa
+        from cdsl.settings import Preset  # noqa
+        from encoding_profile import EncodingProfile  # noqa
 except ImportError:
     pass
 
 
-def emit_instp(instp, fmt, has_dfg=False):
-    # type: (PredNode, srcgen.Formatter, bool) -> None
+class EncodingOptions(object):
+    """
+    Options controlling the layout of the generated encoding tables. The
+    generated tables work the same with any options.
+
+    :param perfect_hash: Generate the level 2 tables as perfect hash tables.
+    :param profile: An `EncodingProfile` with lookup frequencies used to lay
+            out the hash tables.
+    :param dense_level2: Minimum density of the level 2 tables that are
+            emitted as direct arrays indexed by opcode, see
+            `Level2Table.density()`. `None` means always use hash tables.
+    :param enclist_format: Name of the `EncListFormat` to use for the
+            encoding lists, `'u16'` or `'u32'`. `None` means the smallest
+            format that fits each ISA.
+    :param specialize_presets: Also generate tables specialized for each
+            settings preset of the ISAs, see `PresetSpecialization`.
+    :param enclist_cache: Describe the encoding lists with ISA predicates in
+            `ISAP_ENCLISTS`, so they are filtered at run time.
+    """
+
+    def __init__(
+            self, perfect_hash=False, profile=None, dense_level2=None,
+            enclist_format=None, specialize_presets=False,
+            enclist_cache=False):
+        # type: (bool, Optional[EncodingProfile], Optional[float], Optional[str], bool, bool) -> None  # noqa
+        self.perfect_hash = perfect_hash
+        self.profile = profile
+        self.dense_level2 = dense_level2
+        self.enclist_format = enclist_format
+        self.specialize_presets = specialize_presets
+        self.enclist_cache = enclist_cache
+
+    def cache_key(self):
+        # type: () -> str
+        """Describe the options for the build cache key."""
+        key = 'encoding perfect_hash={:d}'.format(self.perfect_hash)
+        if self.profile is not None:
+            key += ' profile=' + ','.join(self.profile.lines())
+        if self.dense_level2 is not None:
+            key += ' dense_level2={!r}'.format(self.dense_level2)
+        if self.enclist_format is not None:
+            key += ' enclist_format=' + self.enclist_format
+        if self.specialize_presets:
+            key += ' specialize_presets=1'
+        if self.enclist_cache:
+            key += ' enclist_cache=1'
+        return key
+
+    def level1_entry(self):
+        # type: () -> str
+        """
+        Get the name of the Rust type of the level 1 table entries. Only the
+        perfect hash and dense level 2 tables need the additional fields of
+        `Level1EntryExt`.
+        """
+        if self.perfect_hash or self.dense_level2 is not None:
+            return 'Level1EntryExt'
+        return 'Level1Entry'
+
+
+def ordered_leafs(pred):
+    # type: (PredNode) -> Iterable[PredLeaf]
+    """Get the leaf predicates of `pred` in the order they appear."""
+    if isinstance(pred, Predicate):
+        for part in pred.parts:
+            for leaf in ordered_leafs(part):
+                yield leaf
+    else:
+        yield pred
+
+
+def leaf_group_name(ctx):
+    # type: (PredContext) -> str
+    """Get the name of the leaf group for the predicate context `ctx`."""
+    if ctx == instruction_context:
+        return 'any'
+    assert isinstance(ctx, InstructionFormat)
+    return ctx.name.lower()
+
+
+def leafs_const(ctx):
+    # type: (PredContext) -> str
     """
-    Emit code for matching an instruction predicate against an
-    `InstructionData` reference called `inst`.
+    Get the name of the `PredicateLeafs` constant for the predicate context
+    `ctx`.
+    """
+    return 'LEAFS_' + leaf_group_name(ctx).upper()
+
 
-    The generated code is an `if let` pattern match that falls through if the
-    instruction has an unexpected format. This should lead to a panic.
+class LeafGroup(object):
     """
-    iform = instp.predicate_context()
+    The leaf predicates of the instruction predicates with the same context,
+    evaluated together by one generated function.
 
-    # Deal with pure type check predicates which apply to any instruction.
-    if iform == instruction_context:
-        fmt.line('let args = inst.arguments(&dfg.value_lists);')
-        fmt.line(instp.rust_predicate(0))
-        return
+    The function decodes the instruction fields once and returns the values
+    of all the leaves as a bit mask. The instruction and recipe predicates are
+    generated as tests on the bits, see `test()`.
+
+    :param context: The `InstructionFormat` of the predicates, or
+            `instruction_context` for type checks that apply to any format.
+    :param number: Number of the group in its ISA.
+    """
+
+    def __init__(self, context, number):
+        # type: (PredContext, int) -> None
+        self.context = context
+        self.number = number
+        # Maps leaf predicate keys to leaves, in bit order.
+        self.leafs = OrderedDict()  # type: OrderedDict[PredKey, PredLeaf]
+
+    def name(self):
+        # type: () -> str
+        return leaf_group_name(self.context)
+
+    def const_name(self):
+        # type: () -> str
+        return leafs_const(self.context)
+
+    def add(self, pred):
+        # type: (PredNode) -> None
+        """Add the leaves of `pred` to this group."""
+        for leaf in ordered_leafs(pred):
+            self.leafs.setdefault(leaf.predicate_key(), leaf)
+        assert len(self.leafs) <= 32, \
+            'Too many predicate leaves for {}'.format(self.name())
+
+    def bit(self, leaf):
+        # type: (PredLeaf) -> int
+        """Get the mask bit holding the value of `leaf`."""
+        return 1 << list(self.leafs).index(leaf.predicate_key())
+
+    def test(self, pred, prec=0):
+        # type: (PredNode, int) -> str
+        """
+        Get a Rust expression computing `pred` from the leaf values in a
+        `leafs` variable. The precedence `prec` is as for `rust_predicate()`.
+
+        The operands of `And` and `Or` are tested in `evaluation_order()`, so
+        an outcome profile also applies here.
+        """
+        if isinstance(pred, Not):
+            return '!' + self.test(pred.parts[0], Not.precedence)
+        if isinstance(pred, (And, Or)):
+            op = ' && ' if isinstance(pred, And) else ' || '
+            s = op.join(self.test(p, pred.precedence) for p in
+                        evaluation_order(pred.parts, pred.decides))
+            if prec > pred.precedence:
+                s = '({})'.format(s)
+            return s
+        assert not isinstance(pred, Predicate)
+        s = 'leafs & {:#x} != 0'.format(self.bit(pred))
+        if prec >= Not.precedence:
+            s = '({})'.format(s)
+        return s
+
+
+def exclusive_key(leaf):
+    # type: (PredLeaf) -> Any
+    """
+    Get a key that is shared by leaf predicates that can't be true at the
+    same time, or `None`.
+
+    Equality tests of the same field, and type checks of the same argument
+    are exclusive.
+    """
+    if isinstance(leaf, IsEqual):
+        return ('field', leaf.field.rust_name())
+    if isinstance(leaf, TypePredicate):
+        return ('arg', leaf.value_arg)
+    return None
 
-    assert isinstance(iform, InstructionFormat)
-
-    # Which fields do we need in the InstructionData pattern match?
-    has_type_check = False
-    # Collect the leaf predicates.
-    leafs = set()  # type: Set[PredLeaf]
-    instp.predicate_leafs(leafs)
-    # All the leafs are FieldPredicate or TypePredicate instances. Here we just
-    # care about the field names.
-    fnames = set()  # type: Set[str]
-    for p in leafs:
-        if isinstance(p, FieldPredicate):
-            fnames.add(p.field.rust_name())
+
+def make_leaf_groups(isa):
+    # type: (TargetISA) -> Dict[PredContext, LeafGroup]
+    """
+    Group the leaves of the instruction predicates and the recipe predicates
+    of `isa` by their context.
+    """
+    groups = OrderedDict()  # type: OrderedDict[PredContext, LeafGroup]
+    instps = list(isa.instp_number)
+    instps.extend(rcp.instp for rcp in isa.all_recipes if rcp.instp)
+    for instp in instps:
+        ctx = instp.predicate_context()
+        group = groups.get(ctx)
+        if group is None:
+            group = LeafGroup(ctx, len(groups))
+            groups[ctx] = group
+        group.add(instp)
+    return groups
+
+
+def emit_leaf_chain(group, leafs, fmt, ty=None):
+    # type: (LeafGroup, List[PredLeaf], srcgen.Formatter, Optional[str]) -> None  # noqa
+    """
+    Emit code setting the bits of the exclusive `leafs`. Once a leaf is true,
+    the rest are known to be false and aren't evaluated.
+
+    Type checks compare the type in the variable `ty`.
+    """
+    with fmt.indented(None, '}'):
+        for idx, leaf in enumerate(leafs):
+            if ty is None:
+                cond = leaf.rust_predicate(0)
+            else:
+                assert isinstance(leaf, TypePredicate)
+                cond = '{} == {}'.format(ty, leaf.value_type.rust_name())
+            fmt.outdented_line(
+                    '{}if {} {{'.format('} else ' if idx else '', cond))
+            fmt.format('leafs |= {:#x};', group.bit(leaf))
+
+
+def emit_leaf_evals(group, fmt):
+    # type: (LeafGroup, srcgen.Formatter) -> None
+    """
+    Emit code computing the leaf values of `group` in a `leafs` variable.
+    """
+    chains = OrderedDict()  # type: OrderedDict[Any, List[PredLeaf]]
+    for key, leaf in group.leafs.items():
+        chains.setdefault(exclusive_key(leaf) or key, []).append(leaf)
+
+    if any(isinstance(leaf, TypePredicate)
+           for leaf in group.leafs.values()):
+        fmt.line('let args = inst.arguments(&dfg.value_lists);')
+    else:
+        # Silence dead argument warning.
+        fmt.line('let _ = dfg;')
+    fmt.line('let mut leafs = 0;')
+    for key, leafs in chains.items():
+        if isinstance(leafs[0], TypePredicate):
+            # The instruction may not have the argument when the group is
+            # shared by different instructions.
+            with fmt.indented(
+                    'if let Some(&arg) = args.get({}) {{'
+                    .format(leafs[0].value_arg), '}'):
+                fmt.line('let ty = dfg.value_type(arg);')
+                emit_leaf_chain(group, leafs, fmt, 'ty')
         else:
-            assert isinstance(p, TypePredicate)
-            has_type_check = True
-    fields = ', '.join(sorted(fnames))
+            emit_leaf_chain(group, leafs, fmt)
 
+
+def emit_leaf_group(group, fmt):
+    # type: (LeafGroup, srcgen.Formatter) -> None
+    """
+    Emit the function evaluating the leaves of `group` and the
+    `PredicateLeafs` constant referring to it.
+
+    For an instruction format, the generated function has an `if let`
+    pattern match that falls through if the instruction has an unexpected
+    format. This should lead to a panic.
+    """
+    fname = 'inst_leafs_{}'.format(group.name())
     with fmt.indented(
-            'if let ir::InstructionData::{} {{ {}, .. }} = *inst {{'
-            .format(iform.name, fields), '}'):
-        if has_type_check:
-            # We could implement this if we need to.
-            assert has_dfg, "Recipe predicates can't check type variables."
-            fmt.line('let args = inst.arguments(&dfg.value_lists);')
-        elif has_dfg:
-            # Silence dead argument warning.
-            fmt.line('let _ = dfg;')
-        fmt.format('return {};', instp.rust_predicate(0))
-    fmt.line('unreachable!();')
-
-
-def emit_inst_predicates(instps, fmt):
-    # type: (OrderedDict[PredNode, int], srcgen.Formatter) -> None
+            'fn {}(dfg: &ir::DataFlowGraph, inst: &ir::InstructionData) '
+            '-> u32 {{'.format(fname), '}'):
+        iform = group.context
+        if iform == instruction_context:
+            emit_leaf_evals(group, fmt)
+            fmt.line('leafs')
+        else:
+            assert isinstance(iform, InstructionFormat)
+            fnames = set(
+                    leaf.field.rust_name() for leaf in group.leafs.values()
+                    if isinstance(leaf, FieldPredicate))
+            fields = ''.join(f + ', ' for f in sorted(fnames))
+            with fmt.indented(
+                    'if let ir::InstructionData::{} {{ {}.. }} = *inst {{'
+                    .format(iform.name, fields), '}'):
+                emit_leaf_evals(group, fmt)
+                fmt.line('return leafs;')
+            fmt.line('unreachable!();')
+    fmt.format(
+            'const {}: PredicateLeafs = PredicateLeafs {{ group: {}, '
+            'eval: {} }};', group.const_name(), group.number, fname)
+
+
+def emit_inst_predicates(instps, groups, fmt):
+    # type: (OrderedDict[PredNode, int], Dict[PredContext, LeafGroup], srcgen.Formatter) -> None  # noqa
     """
     Emit private functions for matching instruction predicates as well as a
     static `INST_PREDICATES` array indexed by predicate number.
     """
     for instp, number in instps.items():
-        name = 'inst_predicate_{}'.format(number)
+        group = groups[instp.predicate_context()]
         with fmt.indented(
-                'fn {}(dfg: &ir::DataFlowGraph, inst: &ir::InstructionData)'
-                '-> bool {{'.format(name), '}'):
-            emit_instp(instp, fmt, has_dfg=True)
+                'fn inst_predicate_{}(leafs: &mut LeafValues) -> bool {{'
+                .format(number), '}'):
+            fmt.format('let leafs = leafs.get({});', group.const_name())
+            fmt.line(group.test(instp))
 
     # Generate the static table.
     with fmt.indented(
             'pub static INST_PREDICATES: [InstPredicate; {}] = ['
             .format(len(instps)), '];'):
-        for instp, number in instps.items():
+        for number in instps.values():
             fmt.format('inst_predicate_{},', number)
 
 
-def emit_recipe_predicates(isa, fmt):
-    # type: (TargetISA, srcgen.Formatter) -> None
+def emit_recipe_predicates(isa, groups, fmt, specs=()):
+    # type: (TargetISA, Dict[PredContext, LeafGroup], srcgen.Formatter, Sequence[PresetSpecialization]) -> Dict[RecipePred, str]  # noqa
     """
     Emit private functions for checking recipe predicates as well as a static
     `RECIPE_PREDICATES` array indexed by recipe number.
 
     A recipe predicate is a combination of an ISA predicate and an instruction
-    predicates. Many recipes have identical predicates.
+    predicates. Many recipes have identical predicates. The instruction
+    predicate is tested on the leaf values of its group in `groups`.
+
+    Also emit the functions needed by the recipe predicates of the preset
+    specializations in `specs`, see `emit_recipe_predicate_table()`.
+
+    Returns a dictionary mapping recipe predicates to function names.
     """
     # Table for uniquing recipe predicates. Maps predicate to generated
     # function name.
     pname = dict()  # type: Dict[RecipePred, str]
 
     # Generate unique recipe predicates.
-    for rcp in isa.all_recipes:
-        p = rcp.recipe_pred()
-        if p is None or p in pname:
-            continue
-        name = 'recipe_predicate_{}'.format(rcp.name.lower())
-        pname[p] = name
-        isap, instp = p
+    all_specs = [None]  # type: List[Optional[PresetSpecialization]]
+    all_specs.extend(specs)
+    for spec in all_specs:
+        for rcp in isa.all_recipes:
+            p = spec.recipe_pred(rcp) if spec else rcp.recipe_pred()
+            if p is None or p in pname:
+                continue
+            name = 'recipe_predicate_{}'.format(rcp.name.lower())
+            if spec:
+                name += '_' + spec.preset.name
+            pname[p] = name
+            isap, instp = p
+
+            # Generate the predicate function.
+            with fmt.indented(
+                    'fn {}({}: ::settings::PredicateView, '
+                    '{}: &mut LeafValues) -> bool {{'.format(
+                        name,
+                        'isap' if isap else '_',
+                        'leafs' if instp else '_'), '}'):
+                if isap:
+                    n = isa.settings.predicate_number[isap]
+                    with fmt.indented(
+                            'if !isap.test({}) {{'.format(n), '}'):
+                        fmt.line('return false;')
+                if instp:
+                    group = groups[instp.predicate_context()]
+                    fmt.format(
+                            'let leafs = leafs.get({});', group.const_name())
+                    fmt.line(group.test(instp))
+                else:
+                    fmt.line('true')
 
-        # Generate the predicate function.
-        with fmt.indented(
-                'fn {}({}: ::settings::PredicateView, '
-                '{}: &ir::InstructionData) -> bool {{'
-                .format(
-                    name,
-                    'isap' if isap else '_',
-                    'inst' if instp else '_'), '}'):
-            if isap:
-                n = isa.settings.predicate_number[isap]
-                with fmt.indented('if !isap.test({}) {{'.format(n), '}'):
-                    fmt.line('return false;')
-            if instp:
-                emit_instp(instp, fmt)
-            else:
-                fmt.line('true')
+    emit_recipe_predicate_table(isa, pname, fmt)
+    return pname
 
-    # Generate the static table.
+
+def emit_recipe_predicate_table(isa, pname, fmt, spec=None):
+    # type: (TargetISA, Dict[RecipePred, str], srcgen.Formatter, Optional[PresetSpecialization]) -> None  # noqa
+    """
+    Emit the static `RECIPE_PREDICATES` array using the functions in `pname`.
+
+    If `spec` is given, emit the recipe predicates specialized for its
+    preset.
+    """
+    preset = spec.preset if spec else None
+    table_sizes.record(
+            isa.name, spec_table_name('RECIPE_PREDICATES', preset),
+            'RecipePredicate', len(isa.all_recipes))
     with fmt.indented(
             'pub static RECIPE_PREDICATES: [RecipePredicate; {}] = ['
             .format(len(isa.all_recipes)), '];'):
         for rcp in isa.all_recipes:
-            p = rcp.recipe_pred()
+            p = spec.recipe_pred(rcp) if spec else rcp.recipe_pred()
             if p is None:
                 fmt.line('None,')
             else:
                 fmt.format('Some({}),', pname[p])
 
 
-# The u16 values in an encoding list entry are interpreted as follows:
+def spec_table_name(name, preset):
+    # type: (str, Optional[Preset]) -> str
+    """
+    Get the name of the static table `name` used in size reports. The tables
+    specialized for a preset are in a module named after the preset.
+    """
+    if preset is None:
+        return name
+    return '{}::{}'.format(preset.name, name)
+
+
+# The words in an encoding list are interpreted as follows:
 #
 # NR = len(all_recipes)
 #
-# entry < 2*NR
-#     Try Encoding(entry/2, next_entry) if the recipe predicate is satisfied.
-#     If bit 0 is set, stop with the default legalization code.
-#     If bit 0 is clear, keep going down the list.
 # entry < PRED_START
-#     Stop with legalization code `entry - 2*NR`.
+#     code = entry >> ENCBITS, where ENCBITS is the number of low bits holding
+#     the encoding bits in the recipe entries of the list format.
+#
+#     code < 2*NR
+#         Try Encoding(code/2, bits) if the recipe predicate is satisfied.
+#         The encoding bits are `entry & 0xffff` in a packed format, or the
+#         next word otherwise.
+#         If bit 0 is set, stop with the default legalization code.
+#         If bit 0 is clear, keep going down the list.
+#     otherwise
+#         Stop with legalization code `code - 2*NR`.
 #
 # Remaining entries are interpreted as (skip, pred) pairs, where:
 #
@@ -212,12 +566,87 @@ def emit_recipe_predicates(isa, fmt):
 #     pred = (entry - PRED_START) & PRED_MASK
 #
 # If the predicate is satisfied, keep going. Otherwise skip over the next
-# `skip` entries. If skip == 0, stop with the default legalization code.
+# `skip` words. If skip == 0, stop with the default legalization code.
 #
 # The `pred` predicate number is interpreted as an instruction predicate if it
 # is in range, otherwise an ISA predicate.
 
 
+class EncListFormat(object):
+    """
+    A word format for the encoding lists, see above.
+
+    The Rust `EncListEntry` trait in `src/isa/enc_tables.rs` must be
+    implemented for `rust_type` with the same parameters.
+
+    :param rust_type: The Rust type of the list words.
+    :param pred_start: The first word representing a predicate entry.
+    :param pred_bits: Number of bits used to hold a predicate number
+            (instruction + ISA predicates).
+    :param encbits: Number of low bits holding the encoding bits in a packed
+            recipe entry, or 0 when they follow in the next word.
+    """
+
+    def __init__(self, rust_type, pred_start, pred_bits, encbits):
+        # type: (str, int, int, int) -> None
+        self.rust_type = rust_type
+        self.code_bits = int(rust_type[1:])
+        self.pred_start = pred_start
+        self.pred_bits = pred_bits
+        self.pred_mask = (1 << pred_bits) - 1
+        self.encbits = encbits
+
+    def __str__(self):
+        # type: () -> str
+        return self.rust_type
+
+    def recipe_words(self):
+        # type: () -> int
+        """The number of words in a recipe+bits entry."""
+        return 1 if self.encbits else 2
+
+    def max_code(self):
+        # type: () -> int
+        """The largest recipe or legalization code."""
+        return (self.pred_start >> self.encbits) - 1
+
+    def max_skip(self):
+        # type: () -> int
+        """The maximum number of words that a predicate can skip."""
+        return ((1 << self.code_bits) - self.pred_start - 1) >> self.pred_bits
+
+    def word_format(self):
+        # type: () -> str
+        """Format string for emitting a word in hexadecimal."""
+        return '{{:#0{}x}}'.format(2 + self.code_bits // 4)
+
+    def fits(self, isa, trees):
+        # type: (TargetISA, Iterable[EncNode]) -> bool
+        """
+        Check if this format can represent the encoding lists of `isa` whose
+        encoder trees are `trees`.
+        """
+        # The legalization codes follow the two codes of each recipe.
+        ncodes = 2 * len(isa.all_recipes) + len(isa.legalize_codes)
+        npreds = len(isa.instp_number)
+        if isa.settings:
+            npreds += len(isa.settings.predicate_number)
+        return (ncodes <= self.max_code() + 1 and
+                npreds <= self.pred_mask + 1 and
+                all(t.max_skip(self) <= self.max_skip() for t in trees))
+
+
+# Encoding lists of u16 words. Recipe entries take two words.
+U16_LISTS = EncListFormat('u16', 0x1000, 12, 0)
+
+# Encoding lists of u32 words. Recipe entries take one word holding the recipe
+# code and the encoding bits.
+U32_LISTS = EncListFormat('u32', 0x80000000, 20, 16)
+
+# The supported list formats, smallest first.
+ENCLIST_FORMATS = OrderedDict((f.rust_type, f) for f in (U16_LISTS, U32_LISTS))
+
+
 class Encoder:
     """
     Encoder for the list format above.
@@ -228,55 +657,53 @@ class Encoder:
     :param NI: Number of instruction predicates.
     """
 
-    def __init__(self, isa):
-        # type: (TargetISA) -> None
+    def __init__(self, isa, listfmt=U16_LISTS):
+        # type: (TargetISA, EncListFormat) -> None
         self.isa = isa
+        self.listfmt = listfmt
         self.NR = len(isa.all_recipes)
         self.NI = len(isa.instp_number)
-        # u16 encoding list words.
+        # Encoding list words.
         self.words = list()  # type: List[int]
         # Documentation comments: Index into `words` + comment.
         self.docs = list()  # type: List[Tuple[int, str]]
-
-    # Encoding lists are represented as u16 arrays.
-    CODE_BITS = 16
-
-    # Beginning of the predicate code words.
-    PRED_START = 0x1000
-
-    # Number of bits used to hold a predicate number (instruction + ISA
-    # predicates.
-    PRED_BITS = 12
-
-    # Mask for extracting the predicate number.
-    PRED_MASK = (1 << PRED_BITS) - 1
+        # Predicate entries: Index into `words`, skip count, and a flag set
+        # for ISA predicates.
+        self.preds = list()  # type: List[Tuple[int, int, bool]]
 
     def max_skip(self):
         # type: () -> int
-        """The maximum number of entries that a predicate can skip."""
-        return (1 << (self.CODE_BITS - self.PRED_BITS)) - 1
+        """The maximum number of words that a predicate can skip."""
+        return self.listfmt.max_skip()
 
     def recipe(self, enc, final):
         # type: (Encoding, bool) -> None
         """Add a recipe+bits entry to the list."""
         offset = len(self.words)
         code = 2 * enc.recipe.number
-        doc = '--> {}'.format(enc)
+        doc = '--> {} {} bytes'.format(enc, enc.recipe.size)
+        if enc.recipe.clobbers_flags:
+            doc += ', clobbers flags'
         if final:
             code += 1
             doc += ' and stop'
 
-        assert(code < self.PRED_START)
-        self.words.extend((code, enc.encbits))
+        assert code <= self.listfmt.max_code()
+        if self.listfmt.encbits:
+            assert enc.encbits < (1 << self.listfmt.encbits)
+            self.words.append((code << self.listfmt.encbits) | enc.encbits)
+        else:
+            self.words.extend((code, enc.encbits))
         self.docs.append((offset, doc))
 
-    def _pred(self, pred, skip, n):
-        # type: (PredNode, int, int) -> None
+    def _pred(self, pred, skip, n, isap=False):
+        # type: (PredNode, int, int, bool) -> None
         """Add a predicate entry."""
-        assert n <= self.PRED_MASK
-        code = n | (skip << self.PRED_BITS)
-        code += self.PRED_START
-        assert code < (1 << self.CODE_BITS)
+        assert n <= self.listfmt.pred_mask
+        assert skip <= self.max_skip()
+        code = n | (skip << self.listfmt.pred_bits)
+        code += self.listfmt.pred_start
+        assert code < (1 << self.listfmt.code_bits)
 
         if skip == 0:
             doc = 'stop'
@@ -285,6 +712,7 @@ class Encoder:
         doc = '{} unless {}'.format(doc, pred)
 
         self.docs.append((len(self.words), doc))
+        self.preds.append((len(self.words), skip, isap))
         self.words.append(code)
 
     def instp(self, pred, skip):
@@ -298,7 +726,12 @@ class Encoder:
         """Add an ISA predicate entry."""
         n = self.isa.settings.predicate_number[pred]
         # ISA predicates follow the instruction predicates.
-        self._pred(pred, skip, self.NI + n)
+        self._pred(pred, skip, self.NI + n, isap=True)
+
+    def has_isap(self):
+        # type: () -> bool
+        """Check if the list has any ISA predicate entries."""
+        return any(isap for _, _, isap in self.preds)
 
 
 class EncNode(object):
@@ -308,11 +741,16 @@ class EncNode(object):
     This tree is used to simplify the predicates guarding recipe+bits entries.
     """
 
-    def size(self):
-        # type: () -> int
-        """Get the number of list entries needed to encode this tree."""
+    def size(self, listfmt):
+        # type: (EncListFormat) -> int
+        """Get the number of list words needed to encode this tree."""
         raise NotImplementedError('EncNode.size() is abstract')
 
+    def max_skip(self, listfmt):
+        # type: (EncListFormat) -> int
+        """Get the largest skip count needed to encode this tree."""
+        return 0
+
     def encode(self, encoder, final):
         # type: (Encoder, bool) -> None
         """Encode this tree."""
@@ -341,16 +779,21 @@ class EncPred(EncNode):
         self.pred = pred
         self.children = children
 
-    def size(self):
-        # type: () -> int
+    def size(self, listfmt):
+        # type: (EncListFormat) -> int
         s = 1 if self.pred else 0
-        s += sum(c.size() for c in self.children)
+        s += sum(c.size(listfmt) for c in self.children)
         return s
 
+    def max_skip(self, listfmt):
+        # type: (EncListFormat) -> int
+        skip = self.size(listfmt) - 1 if self.pred else 0
+        return max([skip] + [c.max_skip(listfmt) for c in self.children])
+
     def encode(self, encoder, final):
         # type: (Encoder, bool) -> None
         if self.pred:
-            skip = 0 if final else self.size() - 1
+            skip = 0 if final else self.size(encoder.listfmt) - 1
             ctx = self.pred.predicate_context()
             if isinstance(ctx, SettingGroup):
                 encoder.isap(self.pred, skip)
@@ -410,22 +853,100 @@ class EncLeaf(EncNode):
         # type: (Encoding) -> None
         self.encoding = encoding
 
-    def size(self):
-        # type: () -> int
-        # recipe + bits.
-        return 2
+    def size(self, listfmt):
+        # type: (EncListFormat) -> int
+        return listfmt.recipe_words()
 
     def encode(self, encoder, final):
         # type: (Encoder, bool) -> None
         encoder.recipe(self.encoding, final)
 
 
+def encoding_cost(enc):
+    # type: (Encoding) -> Tuple[int, bool]
+    """
+    Get the cost of `enc` used to order interchangeable encodings. Cheaper
+    encodings are tried first.
+    """
+    return (enc.recipe.size, enc.recipe.clobbers_flags)
+
+
+def has_register_fields(iform):
+    # type: (InstructionFormat) -> bool
+    """
+    Check if `iform` has immediate fields holding registers. The operand
+    constraints of a recipe don't cover those registers.
+    """
+    return any(f.kind.name == 'regunit' for f in iform.imm_fields)
+
+
+def interchangeable(enc):
+    # type: (Encoding) -> Tuple[Any, ...]
+    """
+    Get a key that is the same for encodings that can be reordered without
+    affecting anything but the cost of the selected encoding.
+
+    Encodings of instructions with register fields like `regfill` are never
+    interchangeable, since a REX-less Intel encoding can't encode all the
+    registers in those fields.
+    """
+    if has_register_fields(enc.inst.format):
+        return (enc,)
+    return (enc.isap, enc.instp, tuple(enc.recipe.ins), tuple(enc.recipe.outs))
+
+
+def guard(enc):
+    # type: (Encoding) -> Tuple[Optional[PredNode], ...]
+    """
+    Get the predicates that must all be satisfied for `enc` to be legal: The
+    ISA and instruction predicates of the encoding and of its recipe.
+    """
+    return (enc.isap, enc.instp, enc.recipe.isap, enc.recipe.instp)
+
+
+def branch_reach(recipe):
+    # type: (EncRecipe) -> Tuple[int, int]
+    """
+    Get the range of branch destinations relative to the start of the
+    instruction that `recipe` can encode.
+    """
+    origin, bits = recipe.branch_range
+    return (origin - (1 << (bits - 1)), origin + (1 << (bits - 1)) - 1)
+
+
+def can_replace(a, b):
+    # type: (Encoding, Encoding) -> bool
+    """
+    Check if encoding `a` can be used instead of `b` everywhere: It has the
+    same recipe, or the same operand constraints, it is not larger, it only
+    clobbers the CPU flags if `b` does, and it can reach all branch
+    destinations `b` can. Different recipes can't replace each other for
+    instructions with register fields, see `interchangeable()`.
+    """
+    ra, rb = a.recipe, b.recipe
+    if ra is rb:
+        return True
+    if has_register_fields(a.inst.format):
+        return False
+    if (tuple(ra.ins), tuple(ra.outs)) != (tuple(rb.ins), tuple(rb.outs)):
+        return False
+    if ra.size > rb.size or (ra.clobbers_flags and not rb.clobbers_flags):
+        return False
+    if rb.branch_range is None:
+        return True
+    if ra.branch_range is None:
+        return False
+    lo_a, hi_a = branch_reach(ra)
+    lo_b, hi_b = branch_reach(rb)
+    return lo_a <= lo_b and hi_b <= hi_a
+
+
 class EncList(object):
     """
     List of instructions for encoding a given type + opcode pair.
 
     An encoding list contains a sequence of predicates and encoding recipes,
-    all encoded as u16 values.
+    all encoded as words of an `EncListFormat`.
 
     :param inst: The instruction opcode being encoded.
     :param ty: Value of the controlling type variable, or `None`.
@@ -438,6 +959,8 @@ class EncList(object):
         # List of applicable Encoding instances.
         # These will have different predicates.
         self.encodings = []  # type: List[Encoding]
+        # Encoder holding the encoded list, see `make_encoder()`.
+        self.encoder = None  # type: Optional[Encoder]
 
     def name(self):
         # type: () -> str
@@ -448,15 +971,62 @@ class EncList(object):
             name += ' ({})'.format(self.encodings[0].cpumode)
         return name
 
+    def ordered_encodings(self):
+        # type: () -> List[Encoding]
+        """
+        Get the encodings in the order they should be tried.
+
+        Runs of adjacent interchangeable encodings are sorted by cost. The
+        sort is stable, so equal cost encodings keep their declared order.
+        """
+        ordered = list()  # type: List[Encoding]
+        for _, run in groupby(self.encodings, key=interchangeable):
+            ordered.extend(sorted(run, key=encoding_cost))
+        return ordered
+
+    def shadowed_encodings(self, isa):
+        # type: (TargetISA) -> List[Tuple[Encoding, Optional[Encoding]]]
+        """
+        Find the encodings in this list that are never needed.
+
+        An encoding is shadowed by an earlier encoding in the order they are
+        tried if the earlier encoding is legal whenever it is, and the earlier
+        encoding can replace it, see `can_replace()`. Such an encoding is
+        never returned by `encode()`, and a user of `legal_encodings()` can
+        always pick the earlier encoding instead.
+
+        An encoding whose predicates can never be satisfied is shadowed by
+        `None`.
+
+        Returns a list of `(shadowed, by)` pairs.
+        """
+        shadowed = list()  # type: List[Tuple[Encoding, Optional[Encoding]]]
+        kept = list()  # type: List[Encoding]
+        for enc in self.ordered_encodings():
+            g = guard(enc)
+            if not isa.pred_satisfiable(g):
+                shadowed.append((enc, None))
+                continue
+            by = next(
+                    (e for e in kept
+                        if can_replace(e, enc) and
+                        isa.pred_implies(g, guard(e))),
+                    None)
+            if by is None:
+                kept.append(enc)
+            else:
+                shadowed.append((enc, by))
+        return shadowed
+
     def encoder_tree(self):
         # type: () -> EncNode
         """
         Generate an optimized encoder tree for this list. The tree represents
-        all of the encodings with parent nodes for the predicates that need
-        checking.
+        all of the encodings in cost order with parent nodes for the
+        predicates that need checking.
         """
         forest = list()  # type: List[EncNode]
-        for enc in self.encodings:
+        for enc in self.ordered_encodings():
             n = EncLeaf(enc)  # type: EncNode
             if enc.instp:
                 n = EncPred(enc.instp, [n])
@@ -466,26 +1036,38 @@ class EncList(object):
 
         return EncPred(None, forest).optimize()
 
-    def encode(self, seq_table, doc_table, isa):
-        # type: (UniqueSeqTable, DefaultDict[int, List[str]], TargetISA) -> None  # noqa
+    def make_encoder(self, isa, listfmt):
+        # type: (TargetISA, EncListFormat) -> Encoder
         """
-        Encode this list as a sequence of u16 numbers.
+        Encode this list as a sequence of `listfmt` words, unless that was
+        already done.
+
+        Return the `Encoder` holding the encoded words.
+        """
+        if self.encoder is None or self.encoder.listfmt is not listfmt:
+            # Use an encoder object to hold the parameters.
+            self.encoder = Encoder(isa, listfmt)
+            self.encoder_tree().encode(self.encoder, True)
+        return self.encoder
+
+    def encode(self, seq_table, doc_table, isa, listfmt):
+        # type: (UniqueSeqTable, DefaultDict[int, List[str]], TargetISA, EncListFormat) -> None  # noqa
+        """
+        Encode this list as a sequence of `listfmt` words.
 
         Adds the sequence to `seq_table` and records the returned offset as
         `self.offset`.
 
         Adds comment lines to `doc_table` keyed by seq_table offsets.
         """
-        # Use an encoder object to hold the parameters.
-        encoder = Encoder(isa)
-        tree = self.encoder_tree()
-        tree.encode(encoder, True)
-
+        encoder = self.make_encoder(isa, listfmt)
         self.offset = seq_table.add(encoder.words)
 
         # Add doc comments.
-        doc_table[self.offset].append(
-                '{:06x}: {}'.format(self.offset, self.name()))
+        doc = '{:06x}: {}'.format(self.offset, self.name())
+        if self.ordered_encodings() != self.encodings:
+            doc += ', reordered by cost'
+        doc_table[self.offset].append(doc)
         for pos, doc in encoder.docs:
             doc_table[self.offset + pos].append(doc)
         doc_table[self.offset + len(encoder.words)].insert(
@@ -507,6 +1089,8 @@ class Level2Table(object):
         # type: (ValueType, XFormGroup) -> None
         self.ty = ty
         self.legalize = legalize
+        # Is this table laid out as a direct array indexed by opcode?
+        self.dense = False
         # Maps inst -> EncList
         self.lists = OrderedDict()  # type: OrderedDict[Instruction, EncList]
 
@@ -532,37 +1116,104 @@ class Level2Table(object):
         # type: () -> Iterable[EncList]
         return iter(self.lists.values())
 
-    def layout_hashtable(self, level2_hashtables, level2_doc):
-        # type: (List[EncList], DefaultDict[int, List[str]]) -> None
+    def density(self):
+        # type: () -> float
+        """
+        Get the fraction of the opcode numbers up to the largest one in this
+        table that have an encoding list.
+
+        This is the fraction of used entries in a dense table.
+        """
+        return float(len(self.lists)) / self.dense_len()
+
+    def dense_len(self):
+        # type: () -> int
+        """Get the length of this table laid out as a dense table."""
+        return max(inst.number for inst in self.lists) + 1
+
+    def layout_dense(self, level2_hashtables, level2_doc):
+        # type: (List[Optional[EncList]], DefaultDict[int, List[str]]) -> None  # noqa
+        """
+        Lay out a direct table mapping opcode number -> enclist.
+
+        Append the table to `level2_hashtables` and record the offset. The
+        table has an entry for every opcode number up to the largest one, and
+        `None` for opcodes without an encoding list.
+        """
+        dense_table = [None] * self.dense_len()  # type: List[Optional[EncList]]  # noqa
+        for enclist in self.lists.values():
+            dense_table[enclist.inst.number] = enclist
+
+        self.dense = True
+        self.hash_table_offset = len(level2_hashtables)
+        self.hash_table_len = len(dense_table)
+        self.disp_offset = 0
+        self.disp_len = 0
+
+        level2_doc[self.hash_table_offset].append(
+                '{:06x}: {}, {} entries, dense ({:.0%} used)'.format(
+                    self.hash_table_offset,
+                    self.ty,
+                    self.hash_table_len,
+                    self.density()))
+        level2_hashtables.extend(dense_table)
+
+    def layout_hashtable(
+            self, level2_hashtables, level2_doc, displacements, perfect,
+            name, weight=None):
+        # type: (List[Optional[EncList]], DefaultDict[int, List[str]], List[int], bool, str, Optional[Callable[[EncList], int]]) -> None  # noqa
         """
         Compute the hash table mapping opcode -> enclist.
 
         Append the hash table to `level2_hashtables` and record the offset.
+
+        If `perfect` is set, build a perfect hash table and append its
+        displacements to `displacements`. Otherwise, `weight` can give the
+        lookup frequency of each list, and frequently used lists are placed
+        first.
+
+        The table statistics are recorded under `name`.
         """
         def hash_func(enclist):
             # type: (EncList) -> int
             return enclist.inst.number
-        hash_table = compute_quadratic(self.lists.values(), hash_func)
+        if perfect:
+            hash_table, disp = compute_perfect(
+                    self.lists.values(), hash_func, name)
+        else:
+            hash_table, stats = search_quadratic(
+                    self.lists.values(), hash_func, name, weight)
+            disp = []
 
         self.hash_table_offset = len(level2_hashtables)
         self.hash_table_len = len(hash_table)
+        self.disp_offset = len(displacements)
+        self.disp_len = len(disp)
+        displacements.extend(disp)
 
         level2_doc[self.hash_table_offset].append(
                 '{:06x}: {}, {} entries'.format(
                     self.hash_table_offset,
                     self.ty,
                     self.hash_table_len))
+        if not perfect:
+            level2_doc[self.hash_table_offset].append(stats.comment())
         level2_hashtables.extend(hash_table)
 
 
 class Level1Table(object):
     """
     Level 1 table mapping types to `Level2` objects.
+
+    :param cpumode: The CPU mode whose encodings are in the table.
+    :param preset: The settings preset that the table is specialized for, or
+            `None`.
     """
 
-    def __init__(self, cpumode):
-        # type: (CPUMode) -> None
+    def __init__(self, cpumode, preset=None):
+        # type: (CPUMode, Optional[Preset]) -> None
         self.cpumode = cpumode
+        self.preset = preset
         self.tables = OrderedDict()  # type: OrderedDict[ValueType, Level2Table]  # noqa
 
         if cpumode.default_legalize is None:
@@ -588,13 +1239,98 @@ class Level1Table(object):
         return (l2 for l2 in self.tables.values() if not l2.is_empty())
 
 
-def make_tables(cpumode):
-    # type: (CPUMode) -> Level1Table
+class PresetSpecialization(object):
+    """
+    Specialization of the encoding tables of `isa` for a settings preset.
+
+    The ISA predicates that `preset` determines are resolved when the tables
+    are generated: Encodings whose predicates are false are removed, and the
+    predicates that are true are not tested at all.
+
+    The specialized tables are valid for any ISA flags where the resolved
+    predicates have the same values, see `resolved`.
+
+    :param isa: The target ISA.
+    :param preset: A preset in the settings group of `isa`.
+    """
+
+    def __init__(self, isa, preset):
+        # type: (TargetISA, Preset) -> None
+        self.isa = isa
+        self.preset = preset
+        # The value of each resolved ISA predicate, keyed by number.
+        self.resolved = dict()  # type: Dict[int, bool]
+
+    def resolve(self, isap):
+        # type: (PredNode) -> Optional[bool]
+        """
+        Get the value of the ISA predicate `isap` with the preset settings,
+        or `None` if it can't be resolved.
+
+        Record the value of a resolved predicate in `resolved`.
+        """
+        value = self.preset.evaluate(isap)
+        if value is not None:
+            self.resolved[self.isa.settings.predicate_number[isap]] = value
+        return value
+
+    def specialize(self, enc):
+        # type: (Encoding) -> Optional[Encoding]
+        """
+        Get the encoding `enc` with its ISA predicate resolved, or `None` if
+        it is never legal with the preset settings.
+        """
+        if enc.recipe.isap and self.resolve(enc.recipe.isap) is False:
+            return None
+        if enc.isap:
+            value = self.resolve(enc.isap)
+            if value is False:
+                return None
+            if value is True:
+                enc = copy.copy(enc)
+                enc.isap = None
+        return enc
+
+    def recipe_pred(self, recipe):
+        # type: (EncRecipe) -> Optional[RecipePred]
+        """
+        Get the recipe predicate of `recipe` without the ISA predicate if it
+        is always true with the preset settings.
+        """
+        p = recipe.recipe_pred()
+        if p is None or p[0] is None or self.resolve(p[0]) is not True:
+            return p
+        return None if p[1] is None else (None, p[1])
+
+    def predicate_masks(self):
+        # type: () -> List[Tuple[int, int]]
+        """
+        Get `(mask, value)` pairs for the bytes of the ISA predicate vector
+        that select the resolved predicates and their values.
+        """
+        masks = [(0, 0)] * ((max(self.resolved) // 8 + 1)
+                            if self.resolved else 0)
+        for n, value in self.resolved.items():
+            mask, bits = masks[n // 8]
+            bit = 1 << (n % 8)
+            masks[n // 8] = (mask | bit, bits | bit if value else bits)
+        return masks
+
+
+def make_tables(cpumode, spec=None):
+    # type: (CPUMode, Optional[PresetSpecialization]) -> Level1Table
     """
     Generate tables for `cpumode` as described above.
+
+    If `spec` is given, generate tables specialized for its preset.
     """
-    table = Level1Table(cpumode)
-    for enc in cpumode.encodings:
+    table = Level1Table(cpumode, spec.preset if spec else None)
+    for orig_enc in cpumode.encodings:
+        enc = orig_enc  # type: Optional[Encoding]
+        if spec is not None:
+            enc = spec.specialize(orig_enc)
+        if enc is None:
+            continue
         ty = enc.ctrl_typevar()
         inst = enc.inst
         table[ty][inst].encodings.append(enc)
@@ -607,20 +1343,88 @@ def make_tables(cpumode):
     return table
 
 
-def encode_enclists(level1, seq_table, doc_table, isa):
-    # type: (Level1Table, UniqueSeqTable, DefaultDict[int, List[str]], TargetISA) -> None  # noqa
+def remove_shadowed(level1, isa):
+    # type: (Level1Table, TargetISA) -> List[str]
+    """
+    Remove the shadowed encodings from the encoding lists in `level1`.
+
+    Return a description of each removed encoding. Encodings that are marked
+    as intentionally shadowed are kept.
+    """
+    removed = list()  # type: List[str]
+    for level2 in level1.l2tables():
+        for inst, enclist in list(level2.lists.items()):
+            for enc, by in enclist.shadowed_encodings(isa):
+                if enc.shadowed:
+                    continue
+                if by is None:
+                    reason = 'has unsatisfiable predicates'
+                else:
+                    reason = 'is shadowed by {}'.format(by)
+                removed.append('{}: Removed encoding {}, which {}'
+                               .format(enclist.name(), enc, reason))
+                enclist.encodings.remove(enc)
+            if not enclist.encodings:
+                del level2.lists[inst]
+    return removed
+
+
+def select_enclist_format(isa, level1_tables, name=None):
+    # type: (TargetISA, Iterable[Level1Table], Optional[str]) -> EncListFormat  # noqa
+    """
+    Select the word format for the encoding lists in `level1_tables`.
+
+    Use the list format called `name` if given, otherwise the smallest format
+    that can represent the lists. The u16 format has room for 4096 codes
+    (two per recipe, and one per legalization action), 4096 predicates, and
+    predicates skipping up to 14 words. The u32 format raises these limits,
+    and it packs each recipe entry into a single word.
+    """
+    trees = [enclist.encoder_tree()
+             for level1 in level1_tables
+             for level2 in level1.l2tables()
+             for enclist in level2.enclists()]
+    if name is not None:
+        candidates = [ENCLIST_FORMATS[name]]
+    else:
+        candidates = list(ENCLIST_FORMATS.values())
+    for listfmt in candidates:
+        if listfmt.fits(isa, trees):
+            return listfmt
+    raise AssertionError(
+            'The {} encoding lists don\'t fit the {} list format'
+            .format(isa.name, candidates[-1]))
+
+
+def pack_enclists(level1_tables, seq_table, isa, listfmt):
+    # type: (Iterable[Level1Table], UniqueSeqTable, TargetISA, EncListFormat) -> None  # noqa
+    """
+    Encode all the encoding lists in `level1_tables` and pack them into
+    `seq_table` before their offsets are assigned by `encode_enclists()`.
+    """
+    seq_table.pack(
+            enclist.make_encoder(isa, listfmt).words
+            for level1 in level1_tables
+            for level2 in level1.l2tables()
+            for enclist in level2.enclists())
+
+
+def encode_enclists(level1, seq_table, doc_table, isa, listfmt):
+    # type: (Level1Table, UniqueSeqTable, DefaultDict[int, List[str]], TargetISA, EncListFormat) -> None  # noqa
     """
     Compute encodings and doc comments for encoding lists in `level1`.
     """
     for level2 in level1.l2tables():
         for enclist in level2.enclists():
-            enclist.encode(seq_table, doc_table, isa)
+            enclist.encode(seq_table, doc_table, isa, listfmt)
 
 
-def emit_enclists(seq_table, doc_table, fmt):
-    # type: (UniqueSeqTable, DefaultDict[int, List[str]], srcgen.Formatter) -> None  # noqa
+def emit_enclists(seq_table, doc_table, listfmt, fmt):
+    # type: (UniqueSeqTable, DefaultDict[int, List[str]], EncListFormat, srcgen.Formatter) -> None  # noqa
+    word = listfmt.word_format() + ', '
     with fmt.indented(
-            'pub static ENCLISTS: [u16; {}] = ['.format(len(seq_table.table)),
+            'pub static ENCLISTS: [{}; {}] = ['
+            .format(listfmt, len(seq_table.table)),
             '];'):
         line = ''
         for idx, entry in enumerate(seq_table.table):
@@ -630,19 +1434,131 @@ def emit_enclists(seq_table, doc_table, fmt):
                     line = ''
                 for doc in doc_table[idx]:
                     fmt.comment(doc)
-            line += '{:#06x}, '.format(entry)
+            line += word.format(entry)
         if line:
             fmt.line(line)
 
 
-def encode_level2_hashtables(level1, level2_hashtables, level2_doc):
-    # type: (Level1Table, List[EncList], DefaultDict[int, List[str]]) -> None
+def isap_enclists(level1_tables):
+    # type: (Iterable[Level1Table]) -> List[EncList]
+    """
+    Get the encoded lists in `level1_tables` that have ISA predicate entries,
+    sorted by offset. Lists sharing an offset are only included once.
+    """
+    lists = dict()  # type: Dict[int, EncList]
+    for level1 in level1_tables:
+        for level2 in level1.l2tables():
+            for enclist in level2.enclists():
+                assert enclist.encoder is not None, 'Lists must be encoded'
+                if enclist.encoder.has_isap():
+                    lists.setdefault(enclist.offset, enclist)
+    return [lists[offset] for offset in sorted(lists)]
+
+
+def emit_isap_enclists(isa, level1_tables, fmt):
+    # type: (TargetISA, Sequence[Level1Table], srcgen.Formatter) -> None
+    """
+    Emit the `ISAP_ENCLISTS` table describing the predicate entries of the
+    lists with ISA predicates in `level1_tables`.
+
+    Also emit the `IsaEncListCache` type used by the ISA, which is an
+    `EncListCache`.
+    """
+    enclists = isap_enclists(level1_tables)
+    npreds = 0
+    fmt.doc_comment(
+            'Encoding lists with ISA predicate entries, sorted by offset in '
+            '`ENCLISTS`.')
+    with fmt.indented(
+            'pub static ISAP_ENCLISTS: [IsapEncList; {}] = ['
+            .format(len(enclists)), '];'):
+        for enclist in enclists:
+            encoder = enclist.encoder
+            assert encoder is not None
+            assert len(encoder.words) < (1 << 16)
+            npreds += len(encoder.preds)
+            fmt.comment(enclist.name())
+            with fmt.indented('IsapEncList {', '},'):
+                fmt.format('offset: {:#08x},', enclist.offset)
+                fmt.format('len: {},', len(encoder.words))
+                fmt.format('preds: &[{}],', ', '.join(
+                    '({}, {}, {})'.format(pos, skip, str(isap).lower())
+                    for pos, skip, isap in encoder.preds))
+    fmt.doc_comment('Encoding list cache type for the ISA.')
+    fmt.line('pub type IsaEncListCache = EncListCache;')
+    table_sizes.record(
+            isa.name, 'ISAP_ENCLISTS', 'IsapEncList', len(enclists))
+    table_sizes.record(
+            isa.name, 'ISAP_ENCLISTS preds', '(u16, u16, bool)', npreds)
+
+
+def table_name(cpumode, level, ty=None, preset=None):
+    # type: (CPUMode, int, Optional[ValueType], Optional[Preset]) -> str
+    """
+    Get the name used for the statistics of an encoding hash table.
+
+    :param level: 1 or 2.
+    :param ty: The controlling type of a level 2 table.
+    :param preset: The preset that the table is specialized for.
+    """
+    name = 'encoding.{}.{}.level{}'.format(cpumode.isa.name, cpumode, level)
+    if preset is not None:
+        name = 'encoding.{}.{}.{}.level{}'.format(
+                cpumode.isa.name, preset.name, cpumode, level)
+    if level == 2:
+        name += '.' + (ty.name if ty is not None else 'void')
+    return name
+
+
+def enclist_weight(profile, cpumode, ty):
+    # type: (EncodingProfile, CPUMode, ValueType) -> Callable[[EncList], int]
+    """
+    Get a function returning the lookup count of an encoding list in the level
+    2 table for `cpumode` and `ty`.
+    """
+    def weight(enclist):
+        # type: (EncList) -> int
+        return profile.count(cpumode, ty, enclist.inst)
+    return weight
+
+
+def level2_weight(profile, cpumode):
+    # type: (EncodingProfile, CPUMode) -> Callable[[Level2Table], int]
+    """
+    Get a function returning the lookup count of a level 2 table for
+    `cpumode`.
+    """
+    def weight(level2):
+        # type: (Level2Table) -> int
+        return profile.type_count(cpumode, level2.ty)
+    return weight
+
+
+def encode_level2_hashtables(
+        level1, level2_hashtables, level2_doc, displacements, perfect,
+        profile=None, dense=None):
+    # type: (Level1Table, List[Optional[EncList]], DefaultDict[int, List[str]], List[int], bool, Optional[EncodingProfile], Optional[float]) -> None  # noqa
+    """
+    Lay out the level 2 tables in `level1`.
+
+    Tables with a density of at least `dense` are laid out as dense tables,
+    the others as hash tables.
+    """
+    cpumode = level1.cpumode
     for level2 in level1.l2tables():
-        level2.layout_hashtable(level2_hashtables, level2_doc)
+        if dense is not None and level2.density() >= dense:
+            level2.layout_dense(level2_hashtables, level2_doc)
+            continue
+        weight = None  # type: Optional[Callable[[EncList], int]]
+        if profile is not None:
+            weight = enclist_weight(profile, cpumode, level2.ty)
+        level2.layout_hashtable(
+                level2_hashtables, level2_doc, displacements, perfect,
+                table_name(cpumode, 2, level2.ty, level1.preset), weight)
 
 
 def emit_level2_hashtables(level2_hashtables, offt, level2_doc, fmt):
-    # type: (List[EncList], str, DefaultDict[int, List[str]], srcgen.Formatter) -> None  # noqa
+    # type: (List[Optional[EncList]], str, DefaultDict[int, List[str]], srcgen.Formatter) -> None  # noqa
     """
     Emit the big concatenation of level 2 hash tables.
     """
@@ -665,26 +1581,79 @@ def emit_level2_hashtables(level2_hashtables, offt, level2_doc, fmt):
                         '{ opcode: None, offset: 0 },')
 
 
-def emit_level1_hashtable(cpumode, level1, offt, fmt):
-    # type: (CPUMode, Level1Table, str, srcgen.Formatter) -> None  # noqa
+def emit_level2_displacements(level1_tables, displacements, fmt):
+    # type: (Iterable[Level1Table], List[int], srcgen.Formatter) -> None
+    """
+    Emit the displacements for all the level 2 perfect hash tables.
+    """
+    with fmt.indented(
+            'pub static LEVEL2_DISPLACEMENTS: [u16; {}] = ['
+            .format(len(displacements)),
+            '];'):
+        for level1 in level1_tables:
+            for level2 in level1.l2tables():
+                if not level2.disp_len:
+                    continue
+                fmt.comment('{:06x}: {}'.format(
+                    level2.disp_offset, level2.ty))
+                fmt.line(''.join(
+                    '{},'.format(d) for d in displacements[
+                        level2.disp_offset:
+                        level2.disp_offset + level2.disp_len]))
+
+
+def emit_level1_hashtable(
+        cpumode, level1, offt, fmt, profile=None, entry='Level1Entry'):
+    # type: (CPUMode, Level1Table, str, srcgen.Formatter, Optional[EncodingProfile], str) -> None  # noqa
     """
     Emit a level 1 hash table for `cpumode`.
+
+    If `profile` is given, the most frequently used types are placed first.
+    The entries are of the Rust type `entry`, either `Level1Entry` or
+    `Level1EntryExt`. Only the latter can refer to perfect hash or dense
+    level 2 tables.
     """
     def hash_func(level2):
         # type: (Level2Table) -> int
         return level2.ty.number if level2.ty is not None else 0
-    hash_table = compute_quadratic(level1.tables.values(), hash_func)
 
+    def line(ty, log2len, offset, legalize, dense=False, log2disp=0, disp=0,
+             comment=None):
+        # type: (str, Any, Any, int, bool, int, int, Optional[str]) -> None
+        fields = 'ty: {}, log2len: {}, offset: {}, legalize: {}'.format(
+                ty, log2len, offset, legalize)
+        if entry == 'Level1EntryExt':
+            fields += ', dense: {}, log2disp: {}, disp: {:#08x}'.format(
+                    str(dense).lower(), log2disp, disp)
+        else:
+            assert not dense and not disp, 'Level1Entry without extra fields'
+        s = '{} {{ {} }},'.format(entry, fields)
+        if comment is not None:
+            s += ' // ' + comment
+        fmt.line(s)
+
+    weight = None  # type: Optional[Callable[[Level2Table], int]]
+    if profile is not None:
+        weight = level2_weight(profile, cpumode)
+    hash_table, stats = search_quadratic(
+            level1.tables.values(), hash_func,
+            table_name(cpumode, 1, preset=level1.preset), weight)
+    table_sizes.record(
+            cpumode.isa.name,
+            spec_table_name(
+                'LEVEL1_{}'.format(cpumode.name.upper()), level1.preset),
+            '{}<{}>'.format(entry, offt), len(hash_table),
+            empty=hash_table.count(None))
+
+    fmt.comment(stats.comment())
     with fmt.indented(
-            'pub static LEVEL1_{}: [Level1Entry<{}>; {}] = ['
-            .format(cpumode.name.upper(), offt, len(hash_table)), '];'):
+            'pub static LEVEL1_{}: [{}<{}>; {}] = ['
+            .format(cpumode.name.upper(), entry, offt, len(hash_table)),
+            '];'):
         for level2 in hash_table:
             # Empty hash table entry. Include the default legalization action.
             if not level2:
-                fmt.format(
-                        'Level1Entry {{ ty: ir::types::VOID, log2len: !0, '
-                        'offset: 0, legalize: {} }},',
-                        level1.legalize_code)
+                line('ir::types::VOID', '!0', 0, level1.legalize_code)
                 continue
 
             if level2.ty is not None:
@@ -699,22 +1668,27 @@ def emit_level1_hashtable(cpumode, level1, offt, fmt):
             # Set an offset that is out of bounds, but make sure it doesn't
             # overflow its type when adding `1<<log2len`.
             if level2.is_empty():
-                fmt.format(
-                        'Level1Entry {{ '
-                        'ty: {}, log2len: 0, offset: !0 - 1, '
-                        'legalize: {} }}, // {}',
-                        tyname, lcode, level2.legalize)
+                line(tyname, 0, '!0 - 1', lcode, comment=str(level2.legalize))
+                continue
+
+            # Dense level 2 table indexed by opcode. The `disp` field holds
+            # the table length.
+            if level2.dense:
+                line(tyname, 0, '{:#08x}'.format(level2.hash_table_offset),
+                     lcode, dense=True, disp=level2.hash_table_len,
+                     comment=str(level2.legalize))
                 continue
 
             # Proper level 2 hash table.
             l2l = int(math.log(level2.hash_table_len, 2))
-            assert l2l > 0, "Level2 hash table too small"
-            fmt.format(
-                    'Level1Entry {{ '
-                    'ty: {}, log2len: {}, offset: {:#08x}, '
-                    'legalize: {} }}, // {}',
-                    tyname, l2l, level2.hash_table_offset,
-                    lcode, level2.legalize)
+            if level2.disp_len:
+                l2d = int(math.log(level2.disp_len, 2))
+            else:
+                assert l2l > 0, "Level2 hash table too small"
+                l2d = 0
+            line(tyname, l2l, '{:#08x}'.format(level2.hash_table_offset),
+                 lcode, log2disp=l2d, disp=level2.disp_offset,
+                 comment=str(level2.legalize))
 
 
 def offset_type(length):
@@ -737,6 +1711,7 @@ def emit_recipe_names(isa, fmt):
 
     This is used for pretty-printing encodings.
     """
+    table_sizes.record(isa.name, 'RECIPE_NAMES', '&str', len(isa.all_recipes))
     with fmt.indented(
             'static RECIPE_NAMES: [&str; {}] = ['
             .format(len(isa.all_recipes)), '];'):
@@ -752,6 +1727,13 @@ def emit_recipe_constraints(isa, fmt):
     These are used by the register allocator to pick registers that can be
     properly encoded.
     """
+    table_sizes.record(
+            isa.name, 'RECIPE_CONSTRAINTS', 'RecipeConstraints',
+            len(isa.all_recipes))
+    table_sizes.record(
+            isa.name, 'RECIPE_CONSTRAINTS.operands',
+            'isa::OperandConstraint',
+            sum(len(r.ins) + len(r.outs) for r in isa.all_recipes))
     with fmt.indented(
             'static RECIPE_CONSTRAINTS: [RecipeConstraints; {}] = ['
             .format(len(isa.all_recipes)), '];'):
@@ -826,6 +1808,8 @@ def emit_recipe_sizing(isa, fmt):
     """
     Emit a table of encoding recipe code size information.
     """
+    table_sizes.record(
+            isa.name, 'RECIPE_SIZING', 'RecipeSizing', len(isa.all_recipes))
     with fmt.indented(
             'static RECIPE_SIZING: [RecipeSizing; {}] = ['
             .format(len(isa.all_recipes)), '];'):
@@ -842,43 +1826,174 @@ def emit_recipe_sizing(isa, fmt):
                     fmt.line('branch_range: None,')
 
 
-def gen_isa(isa, fmt):
-    # type: (TargetISA, srcgen.Formatter) -> None
-
-    # Make the `RECIPE_PREDICATES` table.
-    emit_recipe_predicates(isa, fmt)
-
-    # Make the `INST_PREDICATES` table.
-    emit_inst_predicates(isa.instp_number, fmt)
+def emit_tables(isa, level1_tables, listfmt, options, fmt, offts=None):
+    # type: (TargetISA, Sequence[Level1Table], EncListFormat, EncodingOptions, srcgen.Formatter, Optional[Tuple[str, str]]) -> Tuple[str, str]  # noqa
+    """
+    Emit the `ENCLISTS`, `LEVEL2`, and level 1 tables for `level1_tables`,
+    one per CPU mode, and the `LEVEL2_DISPLACEMENTS` table if the level 2
+    tables are perfect hash tables.
 
-    # Level1 tables, one per CPU mode
-    level1_tables = dict()
+    Use the level 1 and level 2 offset types in `offts` if given. Returns the
+    offset types used.
+    """
+    preset = level1_tables[0].preset
 
     # Tables for enclists with comments.
     seq_table = UniqueSeqTable()
     doc_table = defaultdict(list)  # type: DefaultDict[int, List[str]]
 
     # Single table containing all the level2 hash tables.
-    level2_hashtables = list()  # type: List[EncList]
+    level2_hashtables = list()  # type: List[Optional[EncList]]
     level2_doc = defaultdict(list)  # type: DefaultDict[int, List[str]]
-
-    for cpumode in isa.cpumodes:
-        level2_doc[len(level2_hashtables)].append(cpumode.name)
-        level1 = make_tables(cpumode)
-        level1_tables[cpumode] = level1
-        encode_enclists(level1, seq_table, doc_table, isa)
-        encode_level2_hashtables(level1, level2_hashtables, level2_doc)
-
-    # Level 1 table encodes offsets into the level 2 table.
-    level1_offt = offset_type(len(level2_hashtables))
+    # Displacements for the level2 hash tables, if they are perfect.
+    level2_displacements = list()  # type: List[int]
+
+    if unique_table.packing():
+        pack_enclists(level1_tables, seq_table, isa, listfmt)
+
+    for level1 in level1_tables:
+        level2_doc[len(level2_hashtables)].append(level1.cpumode.name)
+        encode_enclists(level1, seq_table, doc_table, isa, listfmt)
+        encode_level2_hashtables(
+                level1, level2_hashtables, level2_doc,
+                level2_displacements, options.perfect_hash, options.profile,
+                options.dense_level2)
+
+    # Level 1 table encodes offsets into the level 2 table and the level 2
+    # displacements, which are never longer.
+    assert len(level2_displacements) <= len(level2_hashtables)
     # Level 2 tables encodes offsets into seq_table.
-    level2_offt = offset_type(len(seq_table.table))
-
-    emit_enclists(seq_table, doc_table, fmt)
+    if offts is None:
+        offts = (offset_type(len(level2_hashtables)),
+                 offset_type(len(seq_table.table)))
+    level1_offt, level2_offt = offts
+    assert offset_type(len(level2_hashtables)) in ('u16', level1_offt)
+    assert offset_type(len(seq_table.table)) in ('u16', level2_offt)
+
+    emit_enclists(seq_table, doc_table, listfmt, fmt)
+    table_sizes.record(
+            isa.name, spec_table_name('ENCLISTS', preset), listfmt.rust_type,
+            len(seq_table.table), added=seq_table.added)
     emit_level2_hashtables(level2_hashtables, level2_offt, level2_doc, fmt)
-    for cpumode in isa.cpumodes:
+    table_sizes.record(
+            isa.name, spec_table_name('LEVEL2', preset),
+            'Level2Entry<{}>'.format(level2_offt),
+            len(level2_hashtables), empty=level2_hashtables.count(None))
+    if options.perfect_hash:
+        emit_level2_displacements(level1_tables, level2_displacements, fmt)
+        table_sizes.record(
+                isa.name, spec_table_name('LEVEL2_DISPLACEMENTS', preset),
+                'u16', len(level2_displacements))
+    else:
+        assert not level2_displacements
+    for level1 in level1_tables:
         emit_level1_hashtable(
-                cpumode, level1_tables[cpumode], level1_offt, fmt)
+                level1.cpumode, level1, level1_offt, fmt, options.profile,
+                options.level1_entry())
+
+    return offts
+
+
+def emit_preset_tables(isa, specs, offts, listfmt, options, fmt):
+    # type: (TargetISA, Sequence[PresetSpecialization], Tuple[str, str], EncListFormat, EncodingOptions, srcgen.Formatter) -> None  # noqa
+    """
+    Emit a `PRESET_TABLES_<MODE>` array for each CPU mode referencing the
+    tables specialized for the presets in `specs`.
+
+    The specialized tables only have their own `LEVEL2_DISPLACEMENTS` with
+    the `perfect_hash` option. Otherwise they use the empty default.
+    """
+    fmt.doc_comment('Encoding tables specialized for a settings preset.')
+    fmt.format(
+            'pub type PresetTables = '
+            'SpecializedTables<IsaLevel1Entry, {}, {}>;', offts[1], listfmt)
+    for cpumode in isa.cpumodes:
+        mode = cpumode.name.upper()
+        fmt.doc_comment(
+                'Encoding tables for {} specialized for settings presets.'
+                .format(cpumode.name))
+        with fmt.indented(
+                'pub static PRESET_TABLES_{}: [PresetTables; {}] = ['
+                .format(mode, len(specs)), '];'):
+            for spec in specs:
+                m = spec.preset.name
+                with fmt.indented('SpecializedTables {', '},'):
+                    fmt.format('name: "{}",', m)
+                    fmt.format('predicates: &[{}],', ', '.join(
+                        '({:#04x}, {:#04x})'.format(mask, bits)
+                        for mask, bits in spec.predicate_masks()))
+                    fmt.format('level1: &{}::LEVEL1_{},', m, mode)
+                    fmt.format('level2: &{}::LEVEL2,', m)
+                    if options.perfect_hash:
+                        fmt.format(
+                            'level2_displacements: '
+                            '&{}::LEVEL2_DISPLACEMENTS,', m)
+                    else:
+                        fmt.line(
+                            'level2_displacements: &LEVEL2_DISPLACEMENTS,')
+                    fmt.format('enclists: &{}::ENCLISTS,', m)
+                    fmt.format('recipe_preds: &{}::RECIPE_PREDICATES,', m)
+
+
+def gen_isa(isa, fmt, options=None):
+    # type: (TargetISA, srcgen.Formatter, Optional[EncodingOptions]) -> None
+    if options is None:
+        options = EncodingOptions()
+
+    # Level1 tables, one per CPU mode
+    level1_tables = [make_tables(cpumode) for cpumode in isa.cpumodes]
+    for level1 in level1_tables:
+        for removed in remove_shadowed(level1, isa):
+            table_sizes.record_removed(isa.name, removed)
+    listfmt = select_enclist_format(
+            isa, level1_tables, options.enclist_format)
+
+    # Level 1 tables specialized for each settings preset.
+    specs = list()  # type: List[PresetSpecialization]
+    spec_tables = list()  # type: List[List[Level1Table]]
+    if options.specialize_presets and isa.settings:
+        for preset in isa.settings.presets:
+            spec = PresetSpecialization(isa, preset)
+            tables = [make_tables(cpumode, spec) for cpumode in isa.cpumodes]
+            for level1 in tables:
+                remove_shadowed(level1, isa)
+            specs.append(spec)
+            spec_tables.append(tables)
+
+    # Make the functions evaluating the predicate leaves.
+    groups = make_leaf_groups(isa)
+    for group in groups.values():
+        emit_leaf_group(group, fmt)
+
+    # Make the `RECIPE_PREDICATES` table.
+    pname = emit_recipe_predicates(isa, groups, fmt, specs)
+
+    # Make the `INST_PREDICATES` table.
+    emit_inst_predicates(isa.instp_number, groups, fmt)
+    table_sizes.record(
+            isa.name, 'INST_PREDICATES', 'InstPredicate',
+            len(isa.instp_number))
+
+    offts = emit_tables(isa, level1_tables, listfmt, options, fmt)
+    fmt.doc_comment('Type of the level 1 table entries.')
+    fmt.format(
+            'pub type IsaLevel1Entry = {}<{}>;',
+            options.level1_entry(), offts[0])
+    if options.enclist_cache:
+        emit_isap_enclists(isa, level1_tables, fmt)
+
+    # The specialized tables use the same types, so they can be used
+    # interchangeably.
+    for spec, tables in zip(specs, spec_tables):
+        fmt.doc_comment(
+                'Encoding tables specialized for the `{}` preset.'
+                .format(spec.preset.name))
+        with fmt.indented('pub mod {} {{'.format(spec.preset.name), '}'):
+            fmt.line('use super::*;')
+            emit_recipe_predicate_table(isa, pname, fmt, spec)
+            emit_tables(isa, tables, listfmt, options, fmt, offts)
+    if isa.settings and isa.settings.presets:
+        emit_preset_tables(isa, specs, offts, listfmt, options, fmt)
 
     emit_recipe_names(isa, fmt)
     emit_recipe_constraints(isa, fmt)
@@ -891,9 +2006,9 @@ def gen_isa(isa, fmt):
         fmt.line('names: &RECIPE_NAMES,')
 
 
-def generate(isas, out_dir):
-    # type: (Sequence[TargetISA], str) -> None
+def generate(isas, out_dir, options=None):
+    # type: (Sequence[TargetISA], str, Optional[EncodingOptions]) -> None
     for isa in isas:
         fmt = srcgen.Formatter()
-        gen_isa(isa, fmt)
+        gen_isa(isa, fmt, options)
         fmt.update_file('encoding-{}.rs'.format(isa.name), out_dir)
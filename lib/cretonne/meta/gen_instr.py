@@ -4,6 +4,8 @@ Generate sources with instruction info.
 from __future__ import absolute_import
 import srcgen
 import constant_hash
+import unique_table
+import table_sizes
 from unique_table import UniqueTable, UniqueSeqTable
 from cdsl import camel_case
 from cdsl.operands import ImmediateKind
@@ -314,6 +316,9 @@ def gen_opcodes(groups, fmt):
     fmt.line()
 
     # Generate a private opcode_format table.
+    table_sizes.record(
+            table_sizes.SHARED, 'OPCODE_FORMAT', 'InstructionFormat',
+            len(instrs))
     with fmt.indented(
             'const OPCODE_FORMAT: [InstructionFormat; {}] = ['
             .format(len(instrs)),
@@ -333,9 +338,14 @@ def gen_opcodes(groups, fmt):
     fmt.line()
 
     # Generate an opcode hash table for looking up opcodes by name.
-    hash_table = constant_hash.compute_quadratic(
+    hash_table, stats = constant_hash.search_quadratic(
             instrs,
-            lambda i: constant_hash.simple_hash(i.name))
+            lambda i: constant_hash.simple_hash(i.name),
+            'opcodes')
+    fmt.comment(stats.comment())
+    table_sizes.record(
+            table_sizes.SHARED, 'OPCODE_HASH_TABLE', 'Option<Opcode>',
+            len(hash_table), empty=hash_table.count(None))
     with fmt.indented(
             'const OPCODE_HASH_TABLE: [Option<Opcode>; {}] = ['
             .format(len(hash_table)), '];'):
@@ -421,28 +431,43 @@ def gen_type_constraints(fmt, instrs):
     # - `Same`, `Lane`, `AsBool` for controlling typevar-derived constraints.
     operand_seqs = UniqueSeqTable()
 
-    # Preload table with constraints for typical binops.
-    operand_seqs.add(['Same'] * 3)
+    # Collect constraints for the value results and operands of each
+    # instruction, not including `variable_args` results which are always
+    # special cased.
+    ctrl_typesets = list()  # type: List[int]
+    all_constraints = list()  # type: List[List[str]]
+    for i in instrs:
+        constraints = list()
+        ctrl_typevar = None
+        ctrl_typeset = typeset_limit
+        if i.is_polymorphic:
+            ctrl_typevar = i.ctrl_typevar
+            ctrl_typeset = type_sets.add(ctrl_typevar.type_set)
+        for idx in i.value_results:
+            constraints.append(
+                    get_constraint(i.outs[idx], ctrl_typevar, type_sets))
+        for opnum in i.value_opnums:
+            constraints.append(
+                    get_constraint(i.ins[opnum], ctrl_typevar, type_sets))
+        ctrl_typesets.append(ctrl_typeset)
+        all_constraints.append(constraints)
+
+    if unique_table.packing():
+        operand_seqs.pack([['Same'] * 3] + all_constraints)
+    else:
+        # Preload table with constraints for typical binops.
+        operand_seqs.add(['Same'] * 3)
 
     fmt.comment('Table of opcode constraints.')
+    table_sizes.record(
+            table_sizes.SHARED, 'OPCODE_CONSTRAINTS', 'OpcodeConstraints',
+            len(instrs))
     with fmt.indented(
             'const OPCODE_CONSTRAINTS: [OpcodeConstraints; {}] = ['
             .format(len(instrs)), '];'):
-        for i in instrs:
-            # Collect constraints for the value results, not including
-            # `variable_args` results which are always special cased.
-            constraints = list()
-            ctrl_typevar = None
-            ctrl_typeset = typeset_limit
-            if i.is_polymorphic:
-                ctrl_typevar = i.ctrl_typevar
-                ctrl_typeset = type_sets.add(ctrl_typevar.type_set)
-            for idx in i.value_results:
-                constraints.append(
-                        get_constraint(i.outs[idx], ctrl_typevar, type_sets))
-            for opnum in i.value_opnums:
-                constraints.append(
-                        get_constraint(i.ins[opnum], ctrl_typevar, type_sets))
+        for i, ctrl_typeset, constraints in zip(
+                instrs, ctrl_typesets, all_constraints):
+            ctrl_typevar = i.ctrl_typevar if i.is_polymorphic else None
             offset = operand_seqs.add(constraints)
             fixed_results = len(i.value_results)
             fixed_values = len(i.value_opnums)
@@ -481,9 +506,15 @@ def gen_type_constraints(fmt, instrs):
     fmt.line()
 
     gen_typesets_table(fmt, type_sets)
+    table_sizes.record(
+            table_sizes.SHARED, 'TYPE_SETS', 'ir::instructions::ValueTypeSet',
+            len(type_sets.table), added=type_sets.added)
     fmt.line()
 
     fmt.comment('Table of operand constraint sequences.')
+    table_sizes.record(
+            table_sizes.SHARED, 'OPERAND_CONSTRAINTS', 'OperandConstraint',
+            len(operand_seqs.table), added=operand_seqs.added)
     with fmt.indented(
             'const OPERAND_CONSTRAINTS: [OperandConstraint; {}] = ['
             .format(len(operand_seqs.table)), '];'):
@@ -703,10 +734,8 @@ def gen_builder(insts, fmt):
             gen_format_constructor(f, fmt)
 
 
-def generate(isas, out_dir):
-    # type: (Sequence[TargetISA], str) -> None
-    groups = collect_instr_groups(isas)
-
+def generate(groups, out_dir):
+    # type: (Sequence[InstructionGroup], str) -> None
     # opcodes.rs
     fmt = srcgen.Formatter()
     gen_formats(fmt)
@@ -10,7 +10,6 @@ the input instruction.
 from __future__ import absolute_import
 from srcgen import Formatter
 from collections import defaultdict
-from base import instructions
 from cdsl.ast import Var
 from cdsl.ti import ti_rtl, TypeEnv, get_type_env, TypesEqual,\
     InTypeset, WiderOrEq
@@ -19,7 +18,7 @@ from gen_instr import gen_typesets_table
 from cdsl.typevar import TypeVar
 
 try:
-    from typing import Sequence, List, Dict, Set, DefaultDict # noqa
+    from typing import Sequence, List, Dict, Set, DefaultDict, Iterable # noqa
     from cdsl.isa import TargetISA  # noqa
     from cdsl.ast import Def, VarAtomMap  # noqa
     from cdsl.xform import XForm, XFormGroup  # noqa
@@ -256,7 +255,7 @@ def is_value_split(node):
     """
     if len(node.defs) != 2:
         return False
-    return node.expr.inst in (instructions.isplit, instructions.vsplit)
+    return node.expr.inst.name in ('isplit', 'vsplit')
 
 
 def emit_dst_inst(node, fmt):
@@ -412,11 +411,10 @@ def gen_isa(isa, fmt, shared_groups):
     """
     type_sets = UniqueTable()
     for xgrp in isa.legalize_codes.keys():
-        if xgrp.isa is None:
-            shared_groups.add(xgrp)
-        else:
+        if xgrp.isa is not None:
             assert xgrp.isa == isa
             gen_xform_group(xgrp, fmt, type_sets)
+    shared_groups.update(_shared_chained(isa.legalize_codes.keys()))
 
     gen_typesets_table(fmt, type_sets)
 
@@ -427,19 +425,60 @@ def gen_isa(isa, fmt, shared_groups):
             fmt.format('{},', xgrp.rust_name())
 
 
-def generate(isas, out_dir):
-    # type: (Sequence[TargetISA], str) -> None
-    shared_groups = set()  # type: Set[XFormGroup]
+def _shared_chained(xgrps):
+    # type: (Iterable[XFormGroup]) -> Set[XFormGroup]
+    """
+    Get the shared groups among `xgrps` and the groups they chain to.
+
+    A group can chain to a shared group that doesn't have its own legalize
+    code, like `expand_flags` chaining to `expand`. The shared group still
+    needs to be generated when no other ISA uses it directly.
+    """
+    shared = set()  # type: Set[XFormGroup]
+    for xgrp in xgrps:
+        while xgrp is not None and xgrp not in shared:
+            if xgrp.isa is None:
+                shared.add(xgrp)
+            xgrp = xgrp.chain
+    return shared
+
 
+def shared_groups(isas):
+    # type: (Sequence[TargetISA]) -> Set[XFormGroup]
+    """
+    Collect the shared `XFormGroup`s used by `isas`.
+
+    This is the same set that `gen_isa()` accumulates.
+    """
+    shared = set()  # type: Set[XFormGroup]
     for isa in isas:
-        fmt = Formatter()
-        gen_isa(isa, fmt, shared_groups)
-        fmt.update_file('legalize-{}.rs'.format(isa.name), out_dir)
+        shared.update(_shared_chained(isa.legalize_codes.keys()))
+    return shared
+
 
-    # Shared xform groups.
+def gen_shared(shared_groups, out_dir):
+    # type: (Set[XFormGroup], str) -> None
+    """
+    Generate `legalizer.rs` containing the shared xform groups.
+
+    The groups are emitted in name order, so the output doesn't depend on the
+    order they were collected in.
+    """
     fmt = Formatter()
     type_sets = UniqueTable()
     for xgrp in sorted(shared_groups, key=lambda g: g.name):
         gen_xform_group(xgrp, fmt, type_sets)
     gen_typesets_table(fmt, type_sets)
     fmt.update_file('legalizer.rs', out_dir)
+
+
+def generate(isas, out_dir):
+    # type: (Sequence[TargetISA], str) -> None
+    shared_groups = set()  # type: Set[XFormGroup]
+
+    for isa in isas:
+        fmt = Formatter()
+        gen_isa(isa, fmt, shared_groups)
+        fmt.update_file('legalize-{}.rs'.format(isa.name), out_dir)
+
+    gen_shared(shared_groups, out_dir)
@@ -4,6 +4,7 @@ Generate register bank descriptions for each ISA.
 
 from __future__ import absolute_import
 import srcgen
+import table_sizes
 
 try:
     from typing import Sequence, List  # noqa
@@ -77,6 +78,11 @@ def gen_isa(isa, fmt):
     if not isa.regbanks:
         print('cargo:warning={} has no register banks'.format(isa.name))
 
+    table_sizes.record(isa.name, 'INFO.banks', 'RegBank', len(isa.regbanks))
+    # The classes are referenced from `INFO`, but each one is a separate
+    # `*_DATA` static.
+    table_sizes.record(
+            isa.name, 'INFO.classes', 'RegClassData', len(isa.regclasses))
     with fmt.indented('pub static INFO: RegInfo = RegInfo {', '};'):
         # Bank descriptors.
         with fmt.indented('banks: &[', '],'):
@@ -3,11 +3,12 @@ Generate sources with settings.
 """
 from __future__ import absolute_import
 import srcgen
+import unique_table
+import table_sizes
 from unique_table import UniqueSeqTable
 import constant_hash
 from cdsl import camel_case
 from cdsl.settings import BoolSetting, NumSetting, EnumSetting
-from base import settings
 
 try:
     from typing import Sequence, Set, Tuple, List, Union, TYPE_CHECKING  # noqa
@@ -114,7 +115,14 @@ def gen_descriptors(sgrp, fmt):
     """
 
     enums = UniqueSeqTable()
-
+    if unique_table.packing():
+        enums.pack(
+                s.values for s in sgrp.settings
+                if isinstance(s, EnumSetting))
+
+    table_sizes.record(
+            sgrp.name, 'DESCRIPTORS', 'detail::Descriptor',
+            len(sgrp.settings) + len(sgrp.presets))
     with fmt.indented(
             'static DESCRIPTORS: [detail::Descriptor; {}] = ['
             .format(len(sgrp.settings) + len(sgrp.presets)),
@@ -146,6 +154,9 @@ def gen_descriptors(sgrp, fmt):
                 fmt.line('offset: {},'.format(idx * sgrp.settings_size))
                 fmt.line('detail: detail::Detail::Preset,')
 
+    table_sizes.record(
+            sgrp.name, 'ENUMERATORS', '&str', len(enums.table),
+            added=enums.added)
     with fmt.indented(
             'static ENUMERATORS: [&str; {}] = ['
             .format(len(enums.table)),
@@ -160,7 +171,12 @@ def gen_descriptors(sgrp, fmt):
     hash_elems = []  # type: List[Union[Setting, Preset]]
     hash_elems.extend(sgrp.settings)
     hash_elems.extend(sgrp.presets)
-    hash_table = constant_hash.compute_quadratic(hash_elems, hash_setting)
+    hash_table, stats = constant_hash.search_quadratic(
+            hash_elems, hash_setting, 'settings.' + sgrp.name)
+    fmt.comment(stats.comment())
+    table_sizes.record(
+            sgrp.name, 'HASH_TABLE', 'u16', len(hash_table),
+            empty=hash_table.count(None))
     with fmt.indented(
             'static HASH_TABLE: [u16; {}] = ['
             .format(len(hash_table)),
@@ -171,6 +187,9 @@ def gen_descriptors(sgrp, fmt):
             else:
                 fmt.line('{},'.format(h.descriptor_index))
 
+    table_sizes.record(
+            sgrp.name, 'PRESETS', '(u8, u8)',
+            len(sgrp.presets) * sgrp.settings_size)
     with fmt.indented(
             'static PRESETS: [(u8, u8); {}] = ['
             .format(len(sgrp.presets) * sgrp.settings_size),
@@ -296,14 +315,31 @@ def gen_group(sgrp, fmt):
     gen_display(sgrp, fmt)
 
 
-def generate(isas, out_dir):
-    # type: (Sequence[TargetISA], str) -> None
-    # Generate shared settings.
+def shared_group(isas):
+    # type: (Sequence[TargetISA]) -> SettingGroup
+    """
+    Get the shared settings group which is the parent of the ISA settings.
+    """
+    parents = set(isa.settings.parent for isa in isas)
+    assert len(parents) == 1, 'ISAs must have the same shared settings'
+    return parents.pop()
+
+
+def gen_shared(sgrp, out_dir):
+    # type: (SettingGroup, str) -> None
+    """
+    Generate the shared settings in `settings.rs`.
+    """
     fmt = srcgen.Formatter()
-    settings.group.qual_mod = 'settings'
-    gen_group(settings.group, fmt)
+    sgrp.qual_mod = 'settings'
+    gen_group(sgrp, fmt)
     fmt.update_file('settings.rs', out_dir)
 
+
+def generate(isas, out_dir):
+    # type: (Sequence[TargetISA], str) -> None
+    gen_shared(shared_group(isas), out_dir)
+
     # Generate ISA-specific settings.
     for isa in isas:
         isa.settings.qual_mod = 'isa::{}::settings'.format(
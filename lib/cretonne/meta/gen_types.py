@@ -10,7 +10,6 @@ This ensures that Python and Rust use the same type numbering.
 from __future__ import absolute_import
 import srcgen
 from cdsl.types import ValueType
-import base.types  # noqa
 
 try:
     from typing import Iterable  # noqa
@@ -59,6 +58,11 @@ def emit_types(fmt):
 
 def generate(out_dir):
     # type: (str) -> None
+    """
+    Generate `types.rs` for all the defined value types.
+
+    The types must already be defined, typically by importing `base.types`.
+    """
     fmt = srcgen.Formatter()
     emit_types(fmt)
     fmt.update_file('types.rs', out_dir)
@@ -4,21 +4,113 @@ Cretonne target ISA definitions
 
 The :py:mod:`isa` package contains sub-packages for each target instruction set
 architecture supported by Cretonne.
+
+The sub-packages are loaded on demand by :py:func:`get_isa`, so the cost of
+building the encoding tables and legalization patterns is only paid for the
+target ISAs that are actually used. Importing this package by itself doesn't
+load any of them.
 """
 from __future__ import absolute_import
-from cdsl.isa import TargetISA  # noqa
-from . import riscv, intel, arm32, arm64
+import importlib
+import sys
+import build_profile
+from isa_names import ISA_NAMES  # noqa
 
+# The typing module is only required by mypy, and we don't use these imports
+# outside type comments.
 try:
-    from typing import List  # noqa
+    from typing import Any, Dict, Iterable, List, Optional, TYPE_CHECKING  # noqa
+    if TYPE_CHECKING:
+        from cdsl.isa import TargetISA  # noqa
+        from cdsl.instructions import InstructionGroup  # noqa
+        # The target ISA packages are imported on demand at run time. Import
+        # them here so mypy checks them.
+        from . import riscv, intel, arm32, arm64  # noqa
 except ImportError:
     pass
 
+# Finished target ISAs, indexed by name.
+_finished = dict()  # type: Dict[str, TargetISA]
+
+
+def _check_names(names):
+    # type: (Iterable[str]) -> List[str]
+    """Validate `names` and return them in the canonical order."""
+    names = set(names)
+    unknown = names.difference(ISA_NAMES)
+    if unknown:
+        raise ValueError(
+                'Unknown target ISA: {}'.format(', '.join(sorted(unknown))))
+    return [name for name in ISA_NAMES if name in names]
+
+
+def get_isa(name):
+    # type: (str) -> TargetISA
+    """
+    Get the target ISA named `name`, represented as a
+    :py:class:`cdsl.isa.TargetISA` instance.
+
+    The ISA package is imported and finished the first time it is requested.
+    Raise `ValueError` if `name` is not a supported target ISA.
+    """
+    target = _finished.get(name)
+    if target is None:
+        _check_names([name])
+        with build_profile.phase('import', name):
+            pkg = importlib.import_module('.' + name, __name__)  # type: Any
+            target = pkg.load()
+        with build_profile.phase('finish', name):
+            target.finish(
+                    lambda step: build_profile.phase(
+                        'finish', '{}.{}'.format(name, step)))
+        _finished[name] = target
+    return target
+
+
+def unload_isa(name):
+    # type: (str) -> None
+    """
+    Forget the target ISA `name` and unload its package, so the next call to
+    :py:func:`get_isa` imports it again from the current sources.
 
-def all_isas():
-    # type: () -> List[TargetISA]
+    The shared definitions in the `base` package are not affected.
+    """
+    _check_names([name])
+    _finished.pop(name, None)
+    pkg = '{}.{}'.format(__name__, name)
+    for mod in list(sys.modules):
+        if mod == pkg or mod.startswith(pkg + '.'):
+            del sys.modules[mod]
+    if name in globals():
+        del globals()[name]
+
+
+def all_isas(names=None):
+    # type: (Optional[Iterable[str]]) -> List[TargetISA]
     """
     Get a list of all the supported target ISAs. Each target ISA is represented
-    as a :py:class:`cretonne.TargetISA` instance.
+    as a :py:class:`cdsl.isa.TargetISA` instance.
+
+    :param names: Only load the target ISAs with these names.
+    """
+    return [get_isa(name)
+            for name in _check_names(ISA_NAMES if names is None else names)]
+
+
+def instruction_groups():
+    # type: () -> List[InstructionGroup]
+    """
+    Get the instruction groups used by all the supported target ISAs.
+
+    The shared opcode enumeration covers all of these groups, even when only
+    some of the target ISAs are generated. This only imports the basic
+    definitions of each target ISA, without finishing it.
     """
-    return [riscv.ISA, intel.ISA, arm32.ISA, arm64.ISA]
+    groups = []  # type: List[InstructionGroup]
+    for name in ISA_NAMES:
+        defs = importlib.import_module(
+                '.{}.defs'.format(name), __name__)  # type: Any
+        for g in defs.ISA.instruction_groups:
+            if g not in groups:
+                groups.append(g)
+    return groups
@@ -26,7 +26,21 @@ RV32G / RV64G
 """
 from __future__ import absolute_import
 from . import defs
-from . import encodings, settings, registers  # noqa
 
-# Re-export the primary target ISA definition.
-ISA = defs.ISA.finish()
+try:
+    from cdsl.isa import TargetISA  # noqa
+except ImportError:
+    pass
+
+
+def load():
+    # type: () -> TargetISA
+    """
+    Import the complete target ISA definition. The returned ISA still needs
+    to be finished.
+
+    Use :py:func:`isa.get_isa` instead of calling this directly, it makes
+    sure that each target ISA is only finished once.
+    """
+    from . import encodings, settings, registers  # noqa
+    return defs.ISA
@@ -0,0 +1,28 @@
+from __future__ import absolute_import
+import subprocess
+import sys
+from os.path import abspath, dirname
+from unittest import TestCase
+import isa
+
+
+class TestRegistry(TestCase):
+    def test_get_isa(self):
+        # type: () -> None
+        intel = isa.get_isa('intel')
+        self.assertEqual(intel.name, 'intel')
+        self.assertIs(isa.get_isa('intel'), intel)
+        self.assertIs(isa.all_isas(['intel'])[0], intel)
+        self.assertEqual([i.name for i in isa.all_isas()], isa.ISA_NAMES)
+        with self.assertRaises(ValueError):
+            isa.get_isa('vax')
+
+    def test_lazy(self):
+        # type: () -> None
+        # Check in a fresh interpreter since other tests load the ISAs.
+        code = ('import sys, isa, isa.intel; '
+                'sys.exit("isa.intel.encodings" in sys.modules)')
+        meta_dir = dirname(dirname(abspath(__file__)))
+        self.assertEqual(
+                subprocess.call([sys.executable, '-c', code], cwd=meta_dir),
+                0)
@@ -0,0 +1,9 @@
+"""
+Names of the target ISAs supported by Cretonne.
+
+This module has no imports, so the build script can get the target ISA names
+without loading the :py:mod:`isa` package.
+"""
+
+#: Names of all the supported target ISAs, in the canonical order.
+ISA_NAMES = ['riscv', 'intel', 'arm32', 'arm64']
@@ -0,0 +1,98 @@
+"""
+Outcome profiles for the generated predicates.
+
+A profile counts how often each predicate was evaluated, and how often it was
+false. The `And` and `Or` predicates in `cdsl.predicates` use it to order
+their operands so the generated Rust expressions short-circuit as early as
+possible, see `cdsl.predicates.configure_outcomes()`.
+
+A profile is a text file with one predicate per line:
+
+    1200 1150 is_signed_int(imm, 8, 0)
+    310 12 intel.use_popcnt
+
+The first column is the number of evaluations and the second column is how
+many of them were false. The rest of the line is the predicate as printed by
+`str()`. Blank lines and lines starting with `#` are ignored, as are
+predicates that don't appear in the generated code.
+"""
+from __future__ import absolute_import
+from collections import OrderedDict
+
+try:
+    from typing import Any, Dict, Iterable, List, Optional, Tuple  # noqa
+except ImportError:
+    pass
+
+
+class PredicateProfile(object):
+    """
+    Evaluation and false outcome counts for predicates.
+
+        >>> p = PredicateProfile()
+        >>> p.add('shared.is_pic', 10, 9)
+        >>> p.add('shared.is_pic', 10, 1)
+        >>> p.false_ratio('shared.is_pic')
+        0.5
+        >>> p.false_ratio('shared.is_64bit') is None
+        True
+    """
+
+    def __init__(self):
+        # type: () -> None
+        self.counts = OrderedDict()  # type: Dict[str, Tuple[int, int]]
+
+    def add(self, pred, evaluations, false_count):
+        # type: (str, int, int) -> None
+        assert false_count <= evaluations
+        n, f = self.counts.get(pred, (0, 0))
+        self.counts[pred] = (n + evaluations, f + false_count)
+
+    def false_ratio(self, pred):
+        # type: (Any) -> Optional[float]
+        """
+        Get the fraction of the evaluations of `pred` that were false, or
+        `None` if it was never evaluated.
+        """
+        n, f = self.counts.get(str(pred), (0, 0))
+        if n == 0:
+            return None
+        return float(f) / n
+
+    def lines(self):
+        # type: () -> List[str]
+        """Get the profile in the text format."""
+        return ['{} {} {}'.format(n, f, pred)
+                for pred, (n, f) in self.counts.items()]
+
+    @staticmethod
+    def parse(lines, source='<profile>'):
+        # type: (Iterable[str], str) -> PredicateProfile
+        """
+        Parse a profile from the lines of the text format.
+
+            >>> p = PredicateProfile.parse(
+            ...         ['# hot', '8 2 is_signed_int(imm, 8, 0)'])
+            >>> p.lines()
+            ['8 2 is_signed_int(imm, 8, 0)']
+        """
+        profile = PredicateProfile()
+        for lineno, line in enumerate(lines, 1):
+            line = line.strip()
+            if not line or line.startswith('#'):
+                continue
+            fields = line.split(None, 2)
+            if (len(fields) != 3 or not fields[0].isdigit() or
+                    not fields[1].isdigit() or
+                    int(fields[1]) > int(fields[0])):
+                raise ValueError(
+                        '{}:{}: expected "evaluations false_count predicate"'
+                        .format(source, lineno))
+            profile.add(fields[2], int(fields[0]), int(fields[1]))
+        return profile
+
+    @staticmethod
+    def load(path):
+        # type: (str) -> PredicateProfile
+        with open(path) as f:
+            return PredicateProfile.parse(f, path)
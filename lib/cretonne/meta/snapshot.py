@@ -0,0 +1,217 @@
+"""
+Snapshots of the finished ISA model.
+
+Importing the ISA definitions builds the complete in-memory model: the
+instructions, the legalization patterns with their type inference, the
+encodings, and the tables computed by `TargetISA.finish()`. That is most of
+the work done by the build script, and it is the same every time the meta
+sources haven't changed.
+
+A snapshot is a pickle of the finished model which is stored in the build
+cache directory. The snapshot file name contains a hash of all the meta
+sources that define the model, so a stale snapshot is never used.
+
+A snapshot can only be loaded into a process that hasn't imported the `base`
+definitions. Otherwise the process would end up with two copies of the
+model, and generators that compare objects by identity would get confused.
+`load_model()` simply builds the model when the definitions are already
+imported.
+
+The unit tests don't use snapshots. Many test modules import the `base`
+definitions directly, and the tests are meant to check the model built from
+the current sources anyway. Only `build.py` loads snapshots, and only with a
+cache directory.
+"""
+from __future__ import absolute_import
+import importlib
+import os
+import pickle
+import sys
+import tempfile
+from os.path import join, isfile
+import build_cache
+import build_profile
+from cdsl.types import ValueType
+from cdsl.formats import InstructionFormat
+
+try:
+    from typing import Any, Dict, List, Optional, Sequence, Tuple  # noqa
+    from typing import IO, TYPE_CHECKING  # noqa
+    if TYPE_CHECKING:
+        from cdsl.isa import TargetISA  # noqa
+        from cdsl.instructions import InstructionGroup  # noqa
+except ImportError:
+    pass
+
+
+# Bump this when the snapshot format changes in a way that isn't captured by
+# the meta sources.
+SNAPSHOT_VERSION = 1
+
+# The modules defining the model. A snapshot depends on all the meta sources
+# imported by these modules.
+MODEL_MODULES = ['isa', 'snapshot']
+
+# Pickling follows references recursively, and the model has some long chains
+# of objects.
+RECURSION_LIMIT = 20000
+
+
+class Model(object):
+    """
+    The finished ISA model that the generators work on.
+
+    This also holds the class-level registries of value types and instruction
+    formats, which are not reachable from the ISA objects.
+
+    :param isas: Finished target ISAs.
+    :param groups: Instruction groups to include in the shared opcodes.
+    """
+
+    def __init__(self, isas, groups):
+        # type: (List[TargetISA], List[InstructionGroup]) -> None
+        self.isas = isas
+        self.groups = groups
+        self.types = (
+                ValueType._registry,
+                ValueType.all_lane_types,
+                ValueType.all_special_types)
+        self.formats = (
+                InstructionFormat._registry,
+                InstructionFormat.all_formats)
+
+    def install(self):
+        # type: () -> None
+        """
+        Install the registries from a loaded snapshot in the `ValueType` and
+        `InstructionFormat` classes.
+        """
+        (ValueType._registry,
+         ValueType.all_lane_types,
+         ValueType.all_special_types) = self.types
+        (InstructionFormat._registry,
+         InstructionFormat.all_formats) = self.formats
+
+
+def build_model(isa_names=None):
+    # type: (Optional[Sequence[str]]) -> Model
+    """Import the ISA definitions and build the model for `isa_names`."""
+    import isa
+    return Model(isa.all_isas(isa_names), isa.instruction_groups())
+
+
+def _cdsl_globals():
+    # type: () -> Dict[int, Tuple[str, str]]
+    """
+    Find the objects defined at the top level of the loaded `cdsl` modules.
+
+    These objects, like `cdsl.operands.VALUE`, are compared by identity, so
+    they are pickled as references to the module attributes.
+    """
+    refs = dict()  # type: Dict[int, Tuple[str, str]]
+    for modname, mod in list(sys.modules.items()):
+        if mod is None or modname.split('.')[0] != 'cdsl':
+            continue
+        for name, obj in vars(mod).items():
+            if type(obj).__module__.split('.')[0] == 'cdsl':
+                refs[id(obj)] = (modname, name)
+    return refs
+
+
+class _Pickler(pickle.Pickler):
+    def __init__(self, f):
+        # type: (IO[bytes]) -> None
+        pickle.Pickler.__init__(self, f, pickle.HIGHEST_PROTOCOL)
+        self.refs = _cdsl_globals()
+
+    def persistent_id(self, obj):
+        # type: (Any) -> Optional[Tuple[str, str]]
+        return self.refs.get(id(obj))
+
+
+class _Unpickler(pickle.Unpickler):
+    def persistent_load(self, pid):
+        # type: (Tuple[str, str]) -> Any
+        modname, name = pid
+        return getattr(importlib.import_module(modname), name)
+
+
+def snapshot_key(isa_names):
+    # type: (Sequence[str]) -> str
+    """Compute the key identifying a snapshot of the model for `isa_names`."""
+    return build_cache.source_key(
+            MODEL_MODULES,
+            extra=['snapshot {}'.format(SNAPSHOT_VERSION),
+                   'isa=' + ','.join(isa_names)])
+
+
+def save(model, path):
+    # type: (Model, str) -> None
+    """
+    Save a snapshot of `model` to `path`.
+
+    The snapshot is written to a temporary file first and then renamed, so
+    concurrent builds never see a partial snapshot.
+    """
+    fd, tmp = tempfile.mkstemp(
+            prefix='tmp-', dir=os.path.dirname(path) or os.curdir)
+    limit = sys.getrecursionlimit()
+    try:
+        sys.setrecursionlimit(max(limit, RECURSION_LIMIT))
+        with os.fdopen(fd, 'wb') as f:
+            _Pickler(f).dump((SNAPSHOT_VERSION, model))
+        os.rename(tmp, path)
+    except OSError:
+        # Another build may have renamed its snapshot into place first.
+        if not isfile(path):
+            raise
+    finally:
+        sys.setrecursionlimit(limit)
+        if isfile(tmp):
+            os.remove(tmp)
+
+
+def load(path):
+    # type: (str) -> Optional[Model]
+    """
+    Load the snapshot in `path` and install its registries.
+
+    Return `None` if the snapshot can't be read.
+    """
+    try:
+        with open(path, 'rb') as f:
+            data = _Unpickler(f).load()  # type: Tuple[int, Model]
+    except Exception:
+        # A truncated or otherwise broken snapshot is simply rebuilt.
+        return None
+    version, model = data
+    if version != SNAPSHOT_VERSION:
+        return None
+    model.install()
+    return model
+
+
+def load_model(isa_names, cache_dir=None):
+    # type: (Sequence[str], Optional[str]) -> Model
+    """
+    Get the finished model for the target ISAs in `isa_names`.
+
+    Load it from a snapshot in `cache_dir` if possible, or build it and save
+    a snapshot for next time.
+    """
+    if cache_dir is None or 'base' in sys.modules:
+        return build_model(isa_names)
+
+    path = join(cache_dir, 'model-{}.pickle'.format(snapshot_key(isa_names)))
+    if isfile(path):
+        with build_profile.phase('snapshot', 'load'):
+            model = load(path)
+        if model is not None:
+            return model
+
+    model = build_model(isa_names)
+    if not os.path.isdir(cache_dir):
+        os.makedirs(cache_dir)
+    with build_profile.phase('snapshot', 'save'):
+        save(model, path)
+    return model
@@ -11,7 +11,7 @@ import os
 from collections import OrderedDict
 
 try:
-    from typing import Any, List, Set, Tuple  # noqa
+    from typing import Any, List, Optional, Set, Tuple  # noqa
 except ImportError:
     pass
 
@@ -84,15 +84,25 @@ class Formatter(object):
         f.writelines(self.lines)
 
     def update_file(self, filename, directory):
-        # type: (str, str) -> None
+        # type: (str, str) -> bool
+        """
+        Write all lines to `filename` in `directory`, unless the file already
+        has the same contents.
+
+        Return `True` if the file was written.
+        """
         if directory is not None:
             filename = os.path.join(directory, filename)
-        with open(filename, 'w') as f:
-            self.writelines(f)
+        return update_file(filename, self.contents())
+
+    def contents(self):
+        # type: () -> bytes
+        """Get all lines as UTF-8 encoded bytes."""
+        return b''.join(_to_bytes(line) for line in self.lines)
 
     class _IndentedScope(object):
         def __init__(self, fmt, after):
-            # type: (Formatter, str) -> None
+            # type: (Formatter, Optional[str]) -> None
             self.fmt = fmt
             self.after = after
 
@@ -107,7 +117,7 @@ class Formatter(object):
                 self.fmt.line(self.after)
 
     def indented(self, before=None, after=None):
-        # type: (str, str) -> Formatter._IndentedScope
+        # type: (Optional[str], Optional[str]) -> Formatter._IndentedScope  # noqa
         """
         Return a scope object for use with a `with` statement:
 
@@ -194,6 +204,77 @@ class Formatter(object):
                             self.multi_line(body)
 
 
+def _to_bytes(s):
+    # type: (str) -> bytes
+    if isinstance(s, bytes):
+        return s
+    return s.encode('utf-8')
+
+
+# Number of files checked and actually written by `update_file()`.
+_update_stats = [0, 0]
+
+
+def update_stats():
+    # type: () -> Tuple[int, int]
+    """
+    Get the number of files that `update_file()` was asked to write, and the
+    number of those that were actually written because their contents
+    changed.
+    """
+    return (_update_stats[0], _update_stats[1])
+
+
+def reset_update_stats():
+    # type: () -> None
+    """Reset the counts returned by `update_stats()`."""
+    _update_stats[0] = 0
+    _update_stats[1] = 0
+
+
+def same_contents(filename, data, chunk_size=1 << 16):
+    # type: (str, bytes, int) -> bool
+    """
+    Check if the file `filename` exists and contains exactly `data`.
+
+    The file is compared in chunks, so a mismatch is usually detected without
+    reading the whole file.
+    """
+    try:
+        if os.path.getsize(filename) != len(data):
+            return False
+        with open(filename, 'rb') as f:
+            pos = 0
+            while pos < len(data):
+                chunk = f.read(chunk_size)
+                if not chunk or chunk != data[pos:pos + len(chunk)]:
+                    return False
+                pos += len(chunk)
+            return not f.read(1)
+    except (IOError, OSError):
+        return False
+
+
+def update_file(filename, data):
+    # type: (str, bytes) -> bool
+    """
+    Write `data` to `filename` unless the file already contains the same
+    bytes.
+
+    Leaving unchanged files alone preserves their modification time, so Cargo
+    and rustc don't redo work for generated files that didn't change.
+
+    Return `True` if the file was written.
+    """
+    _update_stats[0] += 1
+    if same_contents(filename, data):
+        return False
+    with open(filename, 'wb') as f:
+        f.write(data)
+    _update_stats[1] += 1
+    return True
+
+
 def _indent(s):
     # type: (str) -> int
     """
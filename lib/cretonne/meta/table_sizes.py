@@ -0,0 +1,236 @@
+"""
+Size report for the generated static tables.
+
+The generators record the element count of every static table they emit with
+`record()`. The reports written by `write_reports()` show how much memory the
+tables take, how many hash table slots are empty, and how many elements were
+saved by de-duplicating sequences with a `UniqueSeqTable`.
+
+The encodings removed from the encoding lists because they are shadowed are
+recorded with `record_removed()` and listed in the same reports. They can be
+read back from the reports with `read_removed_encodings()`, for example when
+the generated files were restored from a cache.
+
+Byte sizes are computed from the element sizes in `RUST_SIZES`, which assume a
+64-bit target.
+"""
+from __future__ import absolute_import
+import json
+import os
+from collections import OrderedDict
+import srcgen
+
+try:
+    from typing import Any, Dict, Iterable, List, Optional, Sequence  # noqa
+except ImportError:
+    pass
+
+
+# Size in bytes of the element types used by the generated tables on a 64-bit
+# target. These must be updated when the Rust types change.
+RUST_SIZES = {
+        'u16': 2,
+        'u32': 4,
+        '(u8, u8)': 2,
+        '(u16, u16, bool)': 6,
+        '&str': 16,
+        'InstPredicate': 8,
+        'RecipePredicate': 8,
+        'IsapEncList': 24,
+        'Level1Entry<u16>': 6,
+        'Level1Entry<u32>': 8,
+        'Level1EntryExt<u16>': 10,
+        'Level1EntryExt<u32>': 16,
+        'Level2Entry<u16>': 4,
+        'Level2Entry<u32>': 8,
+        'RecipeConstraints': 40,
+        'isa::OperandConstraint': 16,
+        'OperandConstraint': 2,
+        'RecipeSizing': 4,
+        'InstructionFormat': 1,
+        'Option<Opcode>': 1,
+        'OpcodeConstraints': 4,
+        'ir::instructions::ValueTypeSet': 6,
+        'detail::Descriptor': 24,
+        'RegBank': 72,
+        'RegClassData': 48,
+        }
+
+# Group name used for tables that are not specific to a target ISA.
+SHARED = 'shared'
+
+
+class TableSize(object):
+    """
+    The size of a generated table.
+
+    :param rust_type: The Rust type of the table elements.
+    :param elements: The number of elements in the table.
+    :param empty: The number of empty slots in a hash table.
+    :param added: The number of elements added to a de-duplicated table
+            before duplicates were removed.
+    """
+
+    def __init__(self, rust_type, elements, empty=None, added=None):
+        # type: (str, int, Optional[int], Optional[int]) -> None
+        assert rust_type in RUST_SIZES, 'Unknown size: ' + rust_type
+        self.rust_type = rust_type
+        self.elements = elements
+        self.empty = empty
+        self.added = added
+
+    @property
+    def bytes(self):
+        # type: () -> int
+        return self.elements * RUST_SIZES[self.rust_type]
+
+    def empty_ratio(self):
+        # type: () -> float
+        """Get the fraction of empty hash table slots."""
+        assert self.empty is not None
+        return float(self.empty) / self.elements if self.elements else 0.0
+
+    def saved(self):
+        # type: () -> int
+        """Get the number of elements saved by de-duplication."""
+        assert self.added is not None
+        return self.added - self.elements
+
+    def to_json(self):
+        # type: () -> Dict[str, Any]
+        d = OrderedDict([
+            ('type', self.rust_type),
+            ('elements', self.elements),
+            ('bytes', self.bytes)])  # type: Dict[str, Any]
+        if self.empty is not None:
+            d['empty'] = self.empty
+            d['empty_ratio'] = round(self.empty_ratio(), 4)
+        if self.added is not None:
+            d['added'] = self.added
+            d['saved'] = self.saved()
+        return d
+
+
+# Table sizes recorded by this process, keyed by group and table name.
+_table_sizes = OrderedDict()  # type: Dict[str, Dict[str, TableSize]]
+
+
+def record(group, name, rust_type, elements, empty=None, added=None):
+    # type: (str, str, str, int, Optional[int], Optional[int]) -> None
+    """
+    Record the size of the generated table `name`.
+
+    :param group: The target ISA name, or `SHARED`.
+    """
+    tables = _table_sizes.setdefault(group, OrderedDict())
+    tables[name] = TableSize(rust_type, elements, empty, added)
+
+
+# Descriptions of the removed encodings recorded by this process, keyed by
+# group.
+_removed_encodings = OrderedDict()  # type: Dict[str, List[str]]
+
+
+def record_removed(group, description):
+    # type: (str, str) -> None
+    """Record that an encoding was removed from the tables of `group`."""
+    _removed_encodings.setdefault(group, list()).append(description)
+
+
+def table_sizes():
+    # type: () -> Dict[str, Dict[str, TableSize]]
+    """Get the sizes recorded for all the tables generated so far."""
+    return _table_sizes
+
+
+def removed_encodings():
+    # type: () -> Dict[str, List[str]]
+    """Get the encodings removed from all the tables generated so far."""
+    return _removed_encodings
+
+
+def reset_table_sizes():
+    # type: () -> None
+    _table_sizes.clear()
+    _removed_encodings.clear()
+
+
+def summary(group, tables, removed=()):
+    # type: (str, Dict[str, TableSize], Sequence[str]) -> List[str]
+    """
+    Get the lines of a text summary of the tables in `group`, followed by the
+    `removed` encodings.
+
+        >>> t = OrderedDict()
+        >>> t['ENCLISTS'] = TableSize('u16', 100, added=120)
+        >>> t['LEVEL2'] = TableSize('Level2Entry<u16>', 16, empty=4)
+        >>> for line in summary('intel', t): print(line)
+        Generated tables for intel:
+        table    type             elements    bytes  empty  saved
+        ENCLISTS u16                   100      200            20
+        LEVEL2   Level2Entry<u16>       16       64  25.0%
+        total                          116      264
+    """
+    lines = ['Generated tables for {}:'.format(group)]
+    name_width = max([len('table')] + [len(n) for n in tables])
+    type_width = max([len('type')] + [len(t.rust_type)
+                                      for t in tables.values()])
+    row = '{{:<{}}} {{:<{}}} {{:>8}} {{:>8}} {{:>6}} {{:>6}}'.format(
+            name_width, type_width)
+    lines.append(row.format(
+        'table', 'type', 'elements', 'bytes', 'empty', 'saved'))
+    for name, t in tables.items():
+        empty = ''
+        if t.empty is not None:
+            empty = '{:.1%}'.format(t.empty_ratio())
+        saved = '' if t.added is None else str(t.saved())
+        lines.append(row.format(
+            name, t.rust_type, t.elements, t.bytes, empty, saved).rstrip())
+    lines.append(row.format(
+        'total', '', sum(t.elements for t in tables.values()),
+        sum(t.bytes for t in tables.values()), '', '').rstrip())
+    if removed:
+        lines.append('Removed encodings:')
+        lines.extend(removed)
+    return lines
+
+
+def write_reports(out_dir):
+    # type: (str) -> None
+    """
+    Write a JSON report and a text summary of the recorded table sizes and
+    removed encodings for each group to `out_dir`.
+    """
+    for group, tables in _table_sizes.items():
+        base = os.path.join(out_dir, 'table-sizes-{}'.format(group))
+        report = OrderedDict([
+            ('tables', OrderedDict(
+                (name, t.to_json()) for name, t in tables.items())),
+            ('elements', sum(t.elements for t in tables.values())),
+            ('bytes', sum(t.bytes for t in tables.values()))])
+        removed = _removed_encodings.get(group, [])
+        if removed:
+            report['removed_encodings'] = removed
+        data = json.dumps(report, indent=2, separators=(',', ': ')) + '\n'
+        srcgen.update_file(base + '.json', data.encode('utf-8'))
+        text = '\n'.join(summary(group, tables, removed)) + '\n'
+        srcgen.update_file(base + '.txt', text.encode('utf-8'))
+
+
+def read_removed_encodings(out_dir, groups):
+    # type: (str, Iterable[str]) -> Dict[str, List[str]]
+    """
+    Read the removed encodings of `groups` back from the JSON reports written
+    to `out_dir` by `write_reports()`. Groups without any removed encodings
+    are left out.
+    """
+    removed = OrderedDict()  # type: Dict[str, List[str]]
+    for group in groups:
+        path = os.path.join(out_dir, 'table-sizes-{}.json'.format(group))
+        if not os.path.exists(path):
+            continue
+        with open(path) as f:
+            descriptions = json.load(f).get('removed_encodings')
+        if descriptions:
+            removed[group] = [str(d) for d in descriptions]
+    return removed
@@ -0,0 +1,20 @@
+from __future__ import absolute_import
+import json
+from unittest import TestCase
+import benchmark
+
+
+class TestBenchmark(TestCase):
+    def test_run(self):
+        # type: () -> None
+        report = benchmark.run(
+                ['gen_encoding.arm', 'unique_seq_table', 'compute_quadratic'],
+                iterations=2)
+        report = json.loads(json.dumps(report))
+        self.assertEqual(
+                sorted(report['benchmarks'].keys()),
+                ['compute_quadratic', 'gen_encoding.arm32',
+                 'gen_encoding.arm64', 'unique_seq_table'])
+        for r in report['benchmarks'].values():
+            self.assertEqual(len(r['times']), 2)
+            self.assertLessEqual(r['min'], r['max'])
@@ -0,0 +1,75 @@
+from __future__ import absolute_import
+import doctest
+import os
+import shutil
+import tempfile
+from os.path import basename, join
+from unittest import TestCase
+import build_cache
+from build_cache import OutputCache, dependencies, source_key
+
+
+def load_tests(loader, tests, ignore):
+    tests.addTests(doctest.DocTestSuite(build_cache))
+    return tests
+
+
+class TestDependencies(TestCase):
+    def test_generators(self):
+        # type: () -> None
+        deps = dependencies(['isa', 'gen_all'])
+        names = [os.path.relpath(p, build_cache.META_DIR) for p in deps]
+        self.assertIn('gen_encoding.py', names)
+        self.assertIn(join('isa', 'intel', 'encodings.py'), names)
+        self.assertIn(join('base', 'legalize.py'), names)
+        for n in names:
+            self.assertFalse(basename(n).startswith('test_'), n)
+        self.assertNotIn(join('semantics', 'smtlib.py'), names)
+
+    def test_relative(self):
+        # type: () -> None
+        # `from . import defs` inside a package.
+        deps = dependencies(['isa.riscv'])
+        self.assertIn(
+                join(build_cache.META_DIR, 'isa', 'riscv', 'defs.py'), deps)
+
+    def test_key(self):
+        # type: () -> None
+        k1 = source_key(['gen_types'])
+        self.assertEqual(k1, source_key(['gen_types']))
+        self.assertNotEqual(k1, source_key(['gen_types'], extra=['x']))
+        self.assertNotEqual(k1, source_key(['gen_instr']))
+
+
+class TestOutputCache(TestCase):
+    def setUp(self):
+        # type: () -> None
+        self.tmpdir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        # type: () -> None
+        shutil.rmtree(self.tmpdir)
+
+    def test_roundtrip(self):
+        # type: () -> None
+        cache = OutputCache(join(self.tmpdir, 'cache'))
+        out_dir = join(self.tmpdir, 'out')
+        os.mkdir(out_dir)
+
+        self.assertFalse(cache.restore('k', out_dir))
+
+        staging = cache.staging_dir()
+        with open(join(staging, 'foo.rs'), 'w') as f:
+            f.write('// foo\n')
+        cache.store('k', staging)
+        self.assertFalse(os.path.exists(staging))
+
+        self.assertTrue(cache.restore('k', out_dir))
+        with open(join(out_dir, 'foo.rs')) as f:
+            self.assertEqual(f.read(), '// foo\n')
+
+        # Storing the same key again keeps the first entry.
+        staging = cache.staging_dir()
+        cache.store('k', staging)
+        self.assertFalse(os.path.exists(staging))
+        self.assertEqual(os.listdir(cache.entry('k')), ['foo.rs'])
@@ -0,0 +1,35 @@
+from __future__ import absolute_import
+import doctest
+import json
+from unittest import TestCase
+import build_profile
+
+
+def load_tests(loader, tests, ignore):
+    tests.addTests(doctest.DocTestSuite(build_profile))
+    return tests
+
+
+class TestProfile(TestCase):
+    def tearDown(self):
+        # type: () -> None
+        build_profile.stop()
+
+    def test_phases(self):
+        # type: () -> None
+        prof = build_profile.start()
+        with build_profile.phase('outer', 'a'):
+            with build_profile.phase('inner', 'b'):
+                pass
+        self.assertIs(build_profile.stop(), prof)
+        with build_profile.phase('ignored', 'c'):
+            pass
+
+        report = json.loads(json.dumps(prof.report(jobs=2)))
+        self.assertEqual(report['info'], {'jobs': 2})
+        self.assertEqual(
+                [(p['category'], p['name']) for p in report['phases']],
+                [('inner', 'b'), ('outer', 'a')])
+        for p in report['phases']:
+            self.assertGreaterEqual(p['wall_time'], 0)
+            self.assertGreaterEqual(p['cpu_time'], 0)
@@ -1,8 +1,63 @@
 from __future__ import absolute_import
 import doctest
+from unittest import TestCase
 import constant_hash
 
 
 def load_tests(loader, tests, ignore):
     tests.addTests(doctest.DocTestSuite(constant_hash))
     return tests
+
+
+def lookup(table, displacements, key, h):
+    """Look up `key` in a perfect hash table like `perfect_probe()` does."""
+    b = constant_hash.perfect_bucket(h, len(displacements))
+    idx = constant_hash.displace(h, displacements[b]) & (len(table) - 1)
+    return table[idx] == key
+
+
+class TestPerfect(TestCase):
+    def test_lookup(self):
+        # type: () -> None
+        for n in (0, 1, 2, 7, 16, 100, 513):
+            keys = [3 * k + 1 for k in range(n)]
+            table, disp = constant_hash.compute_perfect(keys, lambda k: k)
+            # The smallest power of two that fits.
+            self.assertEqual(len(table) & (len(table) - 1), 0)
+            self.assertTrue(len(table) // 2 < n <= len(table) or n == 0)
+            self.assertEqual(sorted(k for k in table if k is not None), keys)
+            for k in keys:
+                self.assertTrue(lookup(table, disp, k, k), k)
+            self.assertFalse(lookup(table, disp, 2, 2))
+
+    def test_strings(self):
+        # type: () -> None
+        names = ['opcode{}'.format(i) for i in range(300)]
+        h = constant_hash.simple_hash
+        table, disp = constant_hash.compute_perfect(names, h)
+        for name in names:
+            self.assertTrue(lookup(table, disp, name, h(name)), name)
+
+
+class TestSearch(TestCase):
+    def tearDown(self):
+        # type: () -> None
+        constant_hash.configure_search()
+
+    def test_search(self):
+        # type: () -> None
+        keys = [k * 5 for k in range(40)]
+        first = constant_hash.compute_quadratic(keys, lambda k: k)
+        base = constant_hash.quadratic_stats(first, lambda k: k)
+        self.assertEqual(base.items, len(keys))
+        self.assertEqual(base.size, 64)
+
+        constant_hash.configure_search(seeds=8, multipliers=[1.2, 2])
+        table, stats = constant_hash.search_quadratic(
+                keys, lambda k: k, 'test.table')
+        self.assertLessEqual(stats.key(), base.key())
+        self.assertEqual(stats.key(), constant_hash.quadratic_stats(
+            table, lambda k: k, stats.seed).key())
+        self.assertIs(constant_hash.table_stats()['test.table'], stats)
+        report = constant_hash.stats_report({'test.table': stats})
+        self.assertEqual(report['tables']['test.table']['items'], 40)
@@ -0,0 +1,67 @@
+from __future__ import absolute_import
+import doctest
+import os
+import shutil
+import tempfile
+from unittest import TestCase
+import isa
+import encoding_profile
+from encoding_profile import EncodingProfile, FiletestCollector
+
+FILETEST = """
+test binemit
+set is_64bit
+isa intel haswell
+
+function %f(i32, i64) -> b1 {
+ebb0(v0: i32, v1: i64):
+    [-,%rax]    v2 = iadd v0, v0      ; bin: 01 c0
+                v3 = iconst.i64 4
+                v4 = icmp eq v1, v3
+                brz v4, ebb1
+                v5 = bogus v0
+                return v4
+
+ebb1:
+                v6 = iadd v7, v7
+                jump ebb0(v0, v1)
+}
+"""
+
+
+def load_tests(loader, tests, ignore):
+    tests.addTests(doctest.DocTestSuite(encoding_profile))
+    return tests
+
+
+class TestFiletestCollector(TestCase):
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.dir)
+
+    def test_collect(self):
+        # type: () -> None
+        with open(os.path.join(self.dir, 'f.cton'), 'w') as f:
+            f.write(FILETEST)
+        instrs = dict()
+        for group in isa.instruction_groups():
+            for inst in group.instructions:
+                instrs[inst.name] = inst
+        intel = isa.get_isa('intel')
+        collector = FiletestCollector(instrs, {'intel': intel.cpumodes})
+        profile = collector.collect([self.dir])
+        # The type of `v7` is unknown, and `bogus` isn't an instruction.
+        self.assertEqual(sorted(profile.lines()), [
+            'intel.I64 b1 brz 1',
+            'intel.I64 i32 iadd 1',
+            'intel.I64 i64 icmp 1',
+            'intel.I64 i64 iconst 1',
+            'intel.I64 void jump 1',
+            'intel.I64 void return 1'])
+
+    def test_parse_error(self):
+        # type: () -> None
+        with self.assertRaises(ValueError):
+            EncodingProfile.parse(['intel.I64 i32 iadd'])
@@ -0,0 +1,79 @@
+from __future__ import absolute_import
+import os
+import shutil
+import tempfile
+from unittest import TestCase
+import isa
+import gen_all
+import build
+
+try:
+    from typing import Dict  # noqa
+except ImportError:
+    pass
+
+
+def read_tree(top):
+    # type: (str) -> Dict[str, bytes]
+    """Read all the files in the directory `top`, keyed by file name."""
+    files = dict()  # type: Dict[str, bytes]
+    for name in os.listdir(top):
+        with open(os.path.join(top, name), 'rb') as f:
+            files[name] = f.read()
+    return files
+
+
+class TestGenAll(TestCase):
+    def setUp(self):
+        # type: () -> None
+        self.tmpdir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        # type: () -> None
+        shutil.rmtree(self.tmpdir)
+
+    def out_dir(self, name):
+        # type: (str) -> str
+        d = os.path.join(self.tmpdir, name)
+        os.mkdir(d)
+        return d
+
+    def test_parallel(self):
+        # type: () -> None
+        if gen_all.fork_context() is None:
+            self.skipTest('fork() is not available')
+        isas = isa.all_isas()
+
+        serial = self.out_dir('serial')
+        gen_all.generate(isas, serial, jobs=1)
+        parallel = self.out_dir('parallel')
+        gen_all.generate(isas, parallel, jobs=4)
+
+        self.assertEqual(read_tree(serial), read_tree(parallel))
+
+    def test_subset(self):
+        # type: () -> None
+        full = self.out_dir('full')
+        gen_all.generate(
+                isa.all_isas(), full, groups=isa.instruction_groups())
+        intel = self.out_dir('intel')
+        gen_all.generate(
+                isa.all_isas(['intel']), intel,
+                groups=isa.instruction_groups())
+
+        full_files = read_tree(full)
+        intel_files = read_tree(intel)
+        self.assertNotIn('encoding-riscv.rs', intel_files)
+        self.assertEqual(intel_files['encoding-intel.rs'],
+                         full_files['encoding-intel.rs'])
+        # The opcodes are shared by all ISAs.
+        self.assertEqual(intel_files['opcodes.rs'], full_files['opcodes.rs'])
+        # `expand_flags` chains to `expand` which Intel doesn't use directly.
+        self.assertIn(b'fn expand(', intel_files['legalizer.rs'])
+
+    def test_isa_names(self):
+        # type: () -> None
+        self.assertEqual(build.parse_isa_names(['intel,riscv', 'intel']),
+                         ['intel', 'riscv'])
+        with self.assertRaises(ValueError):
+            isa.all_isas(['vax'])
@@ -0,0 +1,65 @@
+from __future__ import absolute_import
+import doctest
+import os
+import shutil
+import tempfile
+from os.path import join
+from unittest import TestCase
+import isa
+import gen_all
+import gen_build_deps
+from gen_build_deps import META_DIR
+
+
+def load_tests(loader, tests, ignore):
+    tests.addTests(doctest.DocTestSuite(gen_build_deps))
+    return tests
+
+
+class TestBuildDeps(TestCase):
+    def test_loaded_sources(self):
+        # type: () -> None
+        isa.get_isa('intel')
+        paths = gen_build_deps.loaded_sources()
+        self.assertIn(join(META_DIR, 'gen_all.py'), paths)
+        self.assertIn(join(META_DIR, 'isa', 'intel', 'encodings.py'), paths)
+        # This test module is loaded, but it is not a dependency.
+        self.assertNotIn(join(META_DIR, 'test_gen_build_deps.py'), paths)
+        for p in paths:
+            self.assertFalse(gen_build_deps.is_test(p), p)
+
+    def test_dependency_map(self):
+        # type: () -> None
+        out_dir = tempfile.mkdtemp()
+        try:
+            gen_all.generate(
+                    isa.all_isas(['intel']), out_dir,
+                    groups=isa.instruction_groups())
+            outputs = set(os.listdir(out_dir))
+        finally:
+            shutil.rmtree(out_dir)
+
+        deps = gen_build_deps.dependency_map(['intel'], isa.ISA_NAMES)
+        self.assertEqual(set(deps.keys()), outputs)
+        self.assertIn(join('isa', 'intel', 'encodings.py'),
+                      deps['encoding-intel.rs'])
+        self.assertNotIn(join('isa', 'intel', 'encodings.py'),
+                         deps['types.rs'])
+
+    def test_cargo_dependencies(self):
+        # type: () -> None
+        isa.get_isa('intel')
+        deps = gen_build_deps.cargo_dependencies()
+        self.assertIn(join(META_DIR, 'isa', '__init__.py'), deps)
+        # Cargo checks all the files below a directory, so no dependency can
+        # contain a unit test.
+        tests = []
+        for dirpath, dirnames, filenames in os.walk(META_DIR):
+            tests.extend(join(dirpath, f) for f in filenames
+                         if f.startswith('test_') and f.endswith('.py'))
+        self.assertIn(join(META_DIR, 'test_gen_build_deps.py'), tests)
+        for dep in deps:
+            for test in tests:
+                self.assertFalse(
+                        test.startswith(join(dep, '')) or test == dep,
+                        '{} covers {}'.format(dep, test))
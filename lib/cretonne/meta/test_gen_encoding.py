@@ -0,0 +1,207 @@
+from __future__ import absolute_import
+from unittest import TestCase
+from base.formats import Jump
+from base.instructions import GROUP, jump, popcnt
+from base.settings import is_pic
+from cdsl.isa import TargetISA, CPUMode, EncRecipe
+from cdsl.predicates import And, Or, Not
+from gen_encoding import EncList, make_tables, select_enclist_format
+from gen_encoding import U16_LISTS, U32_LISTS, PresetSpecialization
+from gen_encoding import EncListFormat
+from gen_encoding import make_leaf_groups, EncodingOptions, gen_isa
+from isa.intel.settings import use_popcnt
+import isa
+import srcgen
+import table_sizes
+
+
+class TestShadowed(TestCase):
+    def setUp(self):
+        self.isa = TargetISA('test', [GROUP])
+        self.mode = CPUMode('T', self.isa)
+        self.short = EncRecipe('jmpb', Jump, 2, (), (), branch_range=(2, 8))
+        self.long = EncRecipe('jmpd', Jump, 5, (), (), branch_range=(5, 32))
+
+    def shadowed(self, *encs):
+        enclist = EncList(jump, None)
+        for recipe, isap in encs:
+            self.mode.enc(jump, recipe, 0, isap=isap)
+            enclist.encodings.append(self.mode.encodings[-1])
+        return [(str(e), str(by)) for e, by in
+                enclist.shadowed_encodings(self.isa)]
+
+    def test_range(self):
+        # A short branch can't replace a long branch.
+        self.assertEqual(
+                self.shadowed((self.short, None), (self.long, None)), [])
+        # The long branch is tried second because it is larger.
+        self.assertEqual(
+                self.shadowed((self.long, None), (self.short, None)), [])
+
+    def test_duplicate(self):
+        self.assertEqual(
+                self.shadowed(
+                    (self.short, None), (self.long, None),
+                    (self.short, None)),
+                [('[jmpb#00]', '[jmpb#00]')])
+
+    def test_implied(self):
+        self.assertEqual(
+                self.shadowed((self.short, None), (self.short, is_pic)),
+                [('[jmpb#00]', '[jmpb#00]')])
+        self.assertEqual(
+                self.shadowed((self.short, is_pic), (self.short, None)), [])
+        self.assertEqual(
+                self.shadowed(
+                    (self.short, Not(is_pic)), (self.short, is_pic),
+                    (self.short, And(is_pic, Not(is_pic)))),
+                [('[jmpb#00]', 'None')])
+
+
+class TestEncListFormat(TestCase):
+    def setUp(self):
+        self.isa = isa.all_isas(['riscv'])[0]
+        self.level1 = make_tables(self.isa.cpumodes[0])
+        i32 = [l2 for l2 in self.level1.l2tables() if str(l2.ty) == 'i32'][0]
+        self.icmp = [e for e in i32.enclists() if e.inst.name == 'icmp'][0]
+        self.imul = [e for e in i32.enclists() if e.inst.name == 'imul'][0]
+
+    def test_limits(self):
+        self.assertEqual(U16_LISTS.max_code(), 0xfff)
+        self.assertEqual(U16_LISTS.max_skip(), 14)
+        self.assertEqual(U32_LISTS.max_code(), 0x7fff)
+        self.assertEqual(U32_LISTS.max_skip(), 2047)
+
+    def test_words(self):
+        # instp, recipe, bits, instp, recipe + stop, bits.
+        self.assertEqual(
+                self.icmp.make_encoder(self.isa, U16_LISTS).words,
+                [0x3001, 0x8, 0x4c, 0x1002, 0x9, 0x6c])
+        # The u32 entries pack the encoding bits with the recipe.
+        self.assertEqual(
+                self.icmp.make_encoder(self.isa, U32_LISTS).words,
+                [0x80100001, 0x8004c, 0x80000002, 0x9006c])
+
+    def test_preds(self):
+        encoder = self.icmp.make_encoder(self.isa, U16_LISTS)
+        self.assertEqual(encoder.preds, [(0, 2, False), (3, 0, False)])
+        self.assertFalse(encoder.has_isap())
+        # The RV32M multiply is guarded by the `use_m` ISA predicate.
+        encoder = self.imul.make_encoder(self.isa, U16_LISTS)
+        self.assertEqual(encoder.preds, [(0, 0, True)])
+        self.assertTrue(encoder.has_isap())
+
+    def test_fits(self):
+        trees = [self.icmp.encoder_tree(), self.imul.encoder_tree()]
+        ncodes = 2 * len(self.isa.all_recipes)
+        nlegalize = len(self.isa.legalize_codes)
+        self.assertGreater(nlegalize, 0)
+        # The largest code is the last legalization code.
+        fmt = EncListFormat('u32', ncodes + nlegalize, 20, 0)
+        self.assertEqual(fmt.max_code(), ncodes + nlegalize - 1)
+        self.assertTrue(fmt.fits(self.isa, trees))
+        fmt = EncListFormat('u32', ncodes + nlegalize - 1, 20, 0)
+        self.assertFalse(fmt.fits(self.isa, trees))
+
+    def test_select(self):
+        self.assertIs(
+                select_enclist_format(self.isa, [self.level1]), U16_LISTS)
+        self.assertIs(
+                select_enclist_format(self.isa, [self.level1], 'u32'),
+                U32_LISTS)
+
+
+class TestEncodingOptions(TestCase):
+    def test_cache_key(self):
+        keys = set(o.cache_key() for o in [
+            EncodingOptions(),
+            EncodingOptions(perfect_hash=True),
+            EncodingOptions(dense_level2=0.5),
+            EncodingOptions(enclist_format='u32'),
+            EncodingOptions(specialize_presets=True),
+            EncodingOptions(enclist_cache=True)])
+        self.assertEqual(len(keys), 6)
+        self.assertEqual(
+                EncodingOptions(dense_level2=0.5).cache_key(),
+                EncodingOptions(dense_level2=0.5).cache_key())
+
+    def test_optional_items(self):
+        riscv = isa.all_isas(['riscv'])[0]
+        items = [
+                'pub static LEVEL2_DISPLACEMENTS',
+                'pub static ISAP_ENCLISTS',
+                'pub type IsaEncListCache']
+        try:
+            for options, present in [
+                    (EncodingOptions(), False),
+                    (EncodingOptions(perfect_hash=True, enclist_cache=True),
+                     True)]:
+                fmt = srcgen.Formatter()
+                gen_isa(riscv, fmt, options)
+                for item in items:
+                    self.assertEqual(
+                            any(line.startswith(item) for line in fmt.lines),
+                            present, item)
+        finally:
+            table_sizes.reset_table_sizes()
+
+
+class TestLeafGroups(TestCase):
+    def setUp(self):
+        self.isa = isa.all_isas(['riscv'])[0]
+        self.groups = dict(
+                (g.name(), g) for g in make_leaf_groups(self.isa).values())
+
+    def test_groups(self):
+        # The branch conditions are all tested in one group.
+        icmp = self.groups['branchicmp']
+        self.assertEqual(len(icmp.leafs), 6)
+        # Type checks that apply to any instruction format.
+        self.assertEqual(
+                [str(leaf) for leaf in self.groups['any'].leafs.values()],
+                ['args[1]:i32', 'args[1]:i64'])
+
+    def test_test(self):
+        icmp = self.groups['branchicmp']
+        eq, ne, slt = list(icmp.leafs.values())[:3]
+        self.assertEqual(icmp.test(ne), 'leafs & 0x2 != 0')
+        self.assertEqual(
+                icmp.test(And(eq, Not(Or(ne, slt)))),
+                'leafs & 0x1 != 0 && !(leafs & 0x2 != 0 || leafs & 0x4 != 0)')
+        self.assertEqual(
+                icmp.test(Not(eq)), '!(leafs & 0x1 != 0)')
+
+
+class TestPresetSpecialization(TestCase):
+    def setUp(self):
+        self.isa = isa.all_isas(['intel'])[0]
+        self.presets = dict((p.name, p) for p in self.isa.settings.presets)
+
+    def popcnt(self, preset):
+        spec = PresetSpecialization(self.isa, self.presets[preset])
+        level1 = make_tables(self.isa.cpumodes[0], spec)
+        i32 = [l2 for l2 in level1.l2tables() if str(l2.ty) == 'i32'][0]
+        if popcnt not in i32.lists:
+            return spec, None
+        return spec, [str(e.isap) for e in i32.lists[popcnt].encodings]
+
+    def test_resolved(self):
+        spec, isaps = self.popcnt('baseline')
+        self.assertEqual(isaps, None)
+        spec, isaps = self.popcnt('haswell')
+        self.assertEqual(isaps, ['None', 'None'])
+        n = self.isa.settings.predicate_number[use_popcnt]
+        self.assertIs(spec.resolved[n], True)
+        mask, bits = spec.predicate_masks()[n // 8]
+        self.assertTrue(mask & bits & (1 << n % 8))
+
+    def test_recipe_pred(self):
+        rcp = [r for r in self.isa.all_recipes
+               if r.name == 'Mp3furmi_rnd'][0]
+        n = self.isa.settings.predicate_number[rcp.isap]
+        spec = PresetSpecialization(self.isa, self.presets['nehalem'])
+        self.assertEqual(spec.recipe_pred(rcp), None)
+        # The folded ISA predicate must be covered by the preset masks.
+        self.assertIs(spec.resolved[n], True)
+        mask, bits = spec.predicate_masks()[n // 8]
+        self.assertTrue(mask & bits & (1 << n % 8))
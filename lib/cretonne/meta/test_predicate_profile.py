@@ -0,0 +1,24 @@
+from __future__ import absolute_import
+import doctest
+from unittest import TestCase
+import predicate_profile
+from predicate_profile import PredicateProfile
+
+
+def load_tests(loader, tests, ignore):
+    tests.addTests(doctest.DocTestSuite(predicate_profile))
+    return tests
+
+
+class TestPredicateProfile(TestCase):
+    def test_parse(self):
+        p = PredicateProfile.parse(
+                ['', '# comment', '4 1 shared.is_pic', '4 3 shared.is_pic'])
+        self.assertEqual(p.false_ratio('shared.is_pic'), 0.5)
+        self.assertEqual(p.lines(), ['8 4 shared.is_pic'])
+
+    def test_errors(self):
+        for line in ['4 shared.is_pic', 'x 1 shared.is_pic',
+                     '1 4 shared.is_pic']:
+            with self.assertRaises(ValueError):
+                PredicateProfile.parse([line], 'p.txt')
@@ -0,0 +1,59 @@
+from __future__ import absolute_import
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+from os.path import abspath, dirname, join
+from unittest import TestCase
+import isa
+import snapshot
+from test_gen_all import read_tree
+
+META_DIR = dirname(abspath(__file__))
+
+# Generate sources from the model in a fresh process, and report if the model
+# came from a snapshot.
+GENERATE = '''
+import sys, snapshot, gen_all
+m = snapshot.load_model(['riscv', 'intel'], sys.argv[1])
+gen_all.generate(m.isas, sys.argv[2], groups=m.groups)
+sys.exit('base.instructions' in sys.modules)
+'''
+
+
+class TestSnapshot(TestCase):
+    def setUp(self):
+        # type: () -> None
+        self.tmpdir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        # type: () -> None
+        shutil.rmtree(self.tmpdir)
+
+    def generate(self, name):
+        # type: (str) -> int
+        out_dir = join(self.tmpdir, name)
+        os.mkdir(out_dir)
+        return subprocess.call(
+                [sys.executable, '-B', '-c', GENERATE,
+                 join(self.tmpdir, 'cache'), out_dir],
+                cwd=META_DIR)
+
+    def test_roundtrip(self):
+        # type: () -> None
+        # The first run builds the model and saves the snapshot.
+        self.assertEqual(self.generate('built'), 1)
+        self.assertEqual(self.generate('loaded'), 0)
+        self.assertEqual(read_tree(join(self.tmpdir, 'built')),
+                         read_tree(join(self.tmpdir, 'loaded')))
+
+    def test_imported(self):
+        # type: () -> None
+        # The definitions are already imported here, so the snapshot can't be
+        # used.
+        isa.get_isa('riscv')
+        cache_dir = join(self.tmpdir, 'cache')
+        model = snapshot.load_model(['riscv'], cache_dir)
+        self.assertIs(model.isas[0], isa.get_isa('riscv'))
+        self.assertFalse(os.path.exists(cache_dir))
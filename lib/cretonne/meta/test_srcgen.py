@@ -1,8 +1,47 @@
 from __future__ import absolute_import
 import doctest
+import os
+import shutil
+import tempfile
+from unittest import TestCase
 import srcgen
 
 
 def load_tests(loader, tests, ignore):
     tests.addTests(doctest.DocTestSuite(srcgen))
     return tests
+
+
+class TestUpdateFile(TestCase):
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+        srcgen.reset_update_stats()
+
+    def tearDown(self):
+        shutil.rmtree(self.dir)
+
+    def test_unchanged(self):
+        fmt = srcgen.Formatter()
+        fmt.line('fn foo() {}')
+        self.assertTrue(fmt.update_file('foo.rs', self.dir))
+        path = os.path.join(self.dir, 'foo.rs')
+        os.utime(path, (0, 0))
+
+        self.assertFalse(fmt.update_file('foo.rs', self.dir))
+        self.assertEqual(os.path.getmtime(path), 0)
+        self.assertEqual(srcgen.update_stats(), (2, 1))
+
+        fmt.line('fn bar() {}')
+        self.assertTrue(fmt.update_file('foo.rs', self.dir))
+        self.assertEqual(srcgen.update_stats(), (3, 2))
+        with open(path) as f:
+            self.assertEqual(f.read(), 'fn foo() {}\nfn bar() {}\n')
+
+    def test_same_contents(self):
+        path = os.path.join(self.dir, 'f')
+        self.assertFalse(srcgen.same_contents(path, b''))
+        with open(path, 'wb') as f:
+            f.write(b'abcdefgh')
+        self.assertTrue(srcgen.same_contents(path, b'abcdefgh', 3))
+        self.assertFalse(srcgen.same_contents(path, b'abcdefgx', 3))
+        self.assertFalse(srcgen.same_contents(path, b'abcdefg', 3))
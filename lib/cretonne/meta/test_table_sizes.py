@@ -0,0 +1,66 @@
+from __future__ import absolute_import
+import doctest
+import json
+import os
+import shutil
+import tempfile
+from unittest import TestCase
+import table_sizes
+
+
+def load_tests(loader, tests, ignore):
+    tests.addTests(doctest.DocTestSuite(table_sizes))
+    return tests
+
+
+class TestTableSizes(TestCase):
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+        table_sizes.reset_table_sizes()
+
+    def tearDown(self):
+        shutil.rmtree(self.dir)
+        table_sizes.reset_table_sizes()
+
+    def test_write_reports(self):
+        # type: () -> None
+        table_sizes.record('intel', 'ENCLISTS', 'u16', 10, added=14)
+        table_sizes.record(
+                'intel', 'LEVEL2', 'Level2Entry<u16>', 8, empty=2)
+        table_sizes.record(table_sizes.SHARED, 'HASH_TABLE', 'u16', 4)
+        table_sizes.write_reports(self.dir)
+        self.assertEqual(
+                sorted(os.listdir(self.dir)),
+                ['table-sizes-intel.json', 'table-sizes-intel.txt',
+                 'table-sizes-shared.json', 'table-sizes-shared.txt'])
+
+        with open(os.path.join(self.dir, 'table-sizes-intel.json')) as f:
+            report = json.load(f)
+        self.assertEqual(report['bytes'], 20 + 32)
+        self.assertEqual(report['tables']['ENCLISTS']['saved'], 4)
+        self.assertEqual(report['tables']['LEVEL2']['empty_ratio'], 0.25)
+        self.assertNotIn('empty', report['tables']['ENCLISTS'])
+
+    def test_removed_encodings(self):
+        # type: () -> None
+        table_sizes.record('intel', 'ENCLISTS', 'u16', 10)
+        table_sizes.record(table_sizes.SHARED, 'HASH_TABLE', 'u16', 4)
+        table_sizes.record_removed('intel', 'I32.iadd: Removed encoding')
+        table_sizes.write_reports(self.dir)
+
+        with open(os.path.join(self.dir, 'table-sizes-intel.json')) as f:
+            report = json.load(f)
+        self.assertEqual(
+                report['removed_encodings'], ['I32.iadd: Removed encoding'])
+        with open(os.path.join(self.dir, 'table-sizes-intel.txt')) as f:
+            self.assertEqual(
+                    f.read().splitlines()[-2:],
+                    ['Removed encodings:', 'I32.iadd: Removed encoding'])
+        with open(os.path.join(self.dir, 'table-sizes-shared.json')) as f:
+            self.assertNotIn('removed_encodings', json.load(f))
+
+        table_sizes.reset_table_sizes()
+        self.assertEqual(
+                table_sizes.read_removed_encodings(
+                    self.dir, ['riscv', 'intel', table_sizes.SHARED]),
+                {'intel': ['I32.iadd: Removed encoding']})
@@ -0,0 +1,80 @@
+from __future__ import absolute_import
+from unittest import TestCase
+from unique_table import UniqueSeqTable
+
+
+def brute_force(seqs):
+    """
+    Map every sub-sequence of `seqs` to its offset the way `UniqueSeqTable`
+    does: the last occurrence in the last sequence containing it.
+    """
+    index = dict()
+    offset = 0
+    for seq in seqs:
+        for length in range(1, len(seq) + 1):
+            for i in range(len(seq) - length + 1):
+                index[tuple(seq[i:i+length])] = offset + i
+        offset += len(seq)
+    return index
+
+
+class TestUniqueSeqTable(TestCase):
+    def test_add(self):
+        # type: () -> None
+        t = UniqueSeqTable()
+        self.assertEqual(t.add([]), 0)
+        self.assertEqual(t.add([1, 2, 3]), 0)
+        self.assertEqual(t.add([2, 3]), 1)
+        self.assertEqual(t.add([3, 4]), 3)
+        self.assertEqual(t.add([1, 2]), 0)
+        # Sequences don't match across the boundary between two sequences.
+        self.assertEqual(t.find([3, 3]), -1)
+        self.assertEqual(t.table, [1, 2, 3, 3, 4])
+        # The last occurrence is reported.
+        self.assertEqual(t.add([3]), 3)
+
+    def test_index(self):
+        # type: () -> None
+        # Repetitive sequences exercise the state splitting.
+        seqs = [
+                [0, 1, 0, 1, 1],
+                [1, 1, 0, 0],
+                [0, 0, 0, 1, 0, 1],
+                [2, 1, 0, 1, 1, 2],
+                [1, 0, 2, 0, 1, 0, 1, 0]]
+        t = UniqueSeqTable()
+        for seq in seqs:
+            t.add(seq)
+        self.assertEqual(t.table, sum(seqs, []))
+        index = brute_force(seqs)
+        for key, offset in index.items():
+            self.assertEqual(t.find(key), offset, key)
+        self.assertEqual(t.find([2, 2]), -1)
+        # The automaton stays linear in the size of the table.
+        self.assertLessEqual(len(t.length), 2 * len(t.table))
+
+    def test_pack(self):
+        # type: () -> None
+        seqs = [[1, 2, 3], [3, 4, 5], [2, 3], [5, 1], [6], [], [1, 2, 3]]
+        t = UniqueSeqTable()
+        t.pack(seqs)
+        # [3, 4, 5, 1, 2, 3] plus [6] in some order.
+        self.assertEqual(len(t.table), 7)
+        size = len(t.table)
+        for seq in seqs:
+            offset = t.add(seq)
+            self.assertEqual(t.table[offset:offset+len(seq)], seq)
+        self.assertEqual(len(t.table), size)
+
+    def test_pack_cycle(self):
+        # type: () -> None
+        # Overlaps that would form a cycle can't all be used.
+        seqs = [[1, 2], [2, 3], [3, 1]]
+        t = UniqueSeqTable()
+        t.add([0])
+        t.pack(seqs)
+        self.assertEqual(len(t.table), 5)
+        for seq in seqs:
+            offset = t.add(seq)
+            self.assertEqual(t.table[offset:offset+len(seq)], seq)
+        self.assertEqual(len(t.table), 5)
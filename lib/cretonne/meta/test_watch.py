@@ -0,0 +1,66 @@
+from __future__ import absolute_import
+import doctest
+import shutil
+import subprocess
+import sys
+import tempfile
+from os.path import join
+from unittest import TestCase
+import watch
+from gen_build_deps import META_DIR
+
+# Generate sources, then reload the intel ISA in watch mode. This runs in a
+# fresh process so reloading doesn't affect the definitions used by the other
+# tests.
+RELOAD = '''
+import os, sys
+from os.path import join
+import isa, srcgen, gen_all, watch
+from gen_build_deps import META_DIR
+out_dir = sys.argv[1]
+gen_all.generate(isa.all_isas(), out_dir, groups=isa.instruction_groups())
+before = sorted(os.listdir(out_dir))
+report = join(out_dir, 'table-sizes-intel.json')
+with open(report) as f:
+    sizes = f.read()
+os.remove(report)
+old = isa.get_isa('intel')
+w = watch.Watcher(out_dir, isa.ISA_NAMES)
+written = srcgen.update_stats()[1]
+w.update([join(META_DIR, 'isa', 'intel', 'encodings.py')])
+assert not w.broken
+assert isa.get_isa('intel') is not old
+# The sources haven't changed, so only the removed report is written.
+assert srcgen.update_stats()[1] == written + 1
+assert sorted(os.listdir(out_dir)) == before
+with open(report) as f:
+    assert f.read() == sizes
+'''
+
+
+def load_tests(loader, tests, ignore):
+    tests.addTests(doctest.DocTestSuite(watch))
+    return tests
+
+
+class TestWatch(TestCase):
+    def setUp(self):
+        # type: () -> None
+        self.out_dir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        # type: () -> None
+        shutil.rmtree(self.out_dir)
+
+    def test_scan(self):
+        # type: () -> None
+        mtimes = watch.scan()
+        self.assertIn(join(META_DIR, 'isa', 'intel', 'encodings.py'), mtimes)
+        self.assertNotIn(join(META_DIR, 'test_watch.py'), mtimes)
+
+    def test_reload_isa(self):
+        # type: () -> None
+        # The output is captured to keep the progress messages quiet.
+        subprocess.check_output(
+                [sys.executable, '-B', '-c', RELOAD, self.out_dir],
+                cwd=META_DIR)
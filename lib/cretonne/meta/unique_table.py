@@ -5,14 +5,37 @@ The `UniqueTable` class collects items into an array, removing duplicates. Each
 item is mapped to its offset in the final array.
 
 This is a compression technique for compile-time generated tables.
+
+A `UniqueSeqTable` can also pack a set of sequences given up front, overlapping
+the end of one sequence with the beginning of another where possible. Packing
+is enabled for the generated tables by `configure_packing()`.
 """
 
 try:
-    from typing import Any, List, Dict, Tuple, Sequence  # noqa
+    from typing import Any, Dict, Iterable, List, Sequence, Set, Tuple  # noqa
 except ImportError:
     pass
 
 
+# Should the generators pack their sequence tables? See `configure_packing()`.
+_pack_tables = [False]
+
+
+def configure_packing(pack):
+    # type: (bool) -> None
+    """
+    Configure whether the generators lay out their `UniqueSeqTable` contents
+    with `UniqueSeqTable.pack()` before adding sequences.
+    """
+    _pack_tables[0] = pack
+
+
+def packing():
+    # type: () -> bool
+    """Check if sequence table packing was enabled by `configure_packing()`."""
+    return _pack_tables[0]
+
+
 class UniqueTable:
     """
     Collect items into the `table` list, removing duplicates.
@@ -23,6 +46,8 @@ class UniqueTable:
         self.table = list()  # type: List[Any]
         # Map item -> index.
         self.index = dict()  # type: Dict[Any, int]
+        # Number of items passed to `add()`, including duplicates.
+        self.added = 0
 
     def add(self, item):
         # type: (Any) -> int
@@ -31,6 +56,7 @@ class UniqueTable:
 
         Return the offset into `self.table` of the item.
         """
+        self.added += 1
         if item in self.index:
             return self.index[item]
 
@@ -45,12 +71,49 @@ class UniqueSeqTable:
     Collect sequences into the `table` list, removing duplicates.
 
     Sequences don't have to be of the same length.
+
+    The sub-sequences of the table are indexed by a generalized suffix
+    automaton over the added sequences, so the index grows linearly with the
+    length of the table. A sub-sequence that occurs more than once is found
+    at its last occurrence in the most recently added sequence containing it.
     """
     def __init__(self):
         # type: () -> None
         self.table = list()  # type: List[Any]
-        # Map seq -> index.
-        self.index = dict()  # type: Dict[Tuple[Any, ...], int]
+        # Automaton states, indexed by state number. State 0 is the initial
+        # state, which matches the empty sequence.
+        #
+        # Outgoing transitions of each state.
+        self.next = [dict()]  # type: List[Dict[Any, int]]
+        # Suffix link of each state.
+        self.link = [-1]  # type: List[int]
+        # Length of the longest sequence matched by each state.
+        self.length = [0]  # type: List[int]
+        # Table offset of the last item in the last occurrence of the
+        # sequences matched by each state.
+        self.last = [0]  # type: List[int]
+        # Number of the last added sequence containing each state.
+        self.mark = [-1]  # type: List[int]
+        # Number of sequences added to the automaton.
+        self.seqs = 0
+        # Total length of the sequences passed to `add()`, including
+        # duplicates.
+        self.added = 0
+
+    def find(self, seq):
+        # type: (Sequence[Any]) -> int
+        """
+        Find `seq` in the table.
+
+        Return the offset into `self.table` of the beginning of `seq`, or -1
+        if it isn't there.
+        """
+        state = 0
+        for item in seq:
+            state = self.next[state].get(item, -1)
+            if state < 0:
+                return -1
+        return self.last[state] - len(seq) + 1
 
     def add(self, seq):
         # type: (Sequence[Any]) -> int
@@ -60,21 +123,183 @@ class UniqueSeqTable:
 
         Return the offset into `self.table` of the beginning of `seq`.
         """
+        self.added += len(seq)
         if len(seq) == 0:
             return 0
-        tseq = tuple(seq)
-        if tseq in self.index:
-            return self.index[tseq]
+        idx = self.find(seq)
+        if idx >= 0:
+            return idx
+        return self._append(seq)
 
+    def _append(self, seq):
+        # type: (Sequence[Any]) -> int
+        """
+        Append `seq` to the table and the automaton.
+
+        Return the offset into `self.table` of the beginning of `seq`.
+        """
         idx = len(self.table)
-        self.table.extend(tseq)
+        self.table.extend(seq)
 
-        # Add seq and all sub-sequences to `index`.
-        index = self.index  # type: Dict[Tuple[Any, ...], int]
-        assert index is not None
-        for length in range(1, len(tseq) + 1):
-            for offset in range(len(tseq) - length + 1):
-                key = tseq[offset:offset+length]
-                index[key] = idx + offset
+        # States matching each prefix of `seq`.
+        prefixes = list()  # type: List[int]
+        state = 0
+        for item in seq:
+            state = self._extend(state, item)
+            prefixes.append(state)
+
+        # Every sequence matched by a state in the suffix link chain of a
+        # prefix occurs at the end of that prefix. Visit the longest prefixes
+        # first so each state records its last occurrence, and stop at states
+        # that have already been visited.
+        mark = self.seqs
+        self.seqs += 1
+        for offset in range(len(prefixes) - 1, -1, -1):
+            state = prefixes[offset]
+            while state > 0 and self.mark[state] != mark:
+                self.mark[state] = mark
+                self.last[state] = idx + offset
+                state = self.link[state]
 
         return idx
+
+    def pack(self, seqs):
+        # type: (Iterable[Sequence[Any]]) -> None
+        """
+        Lay out all of `seqs` in the table, overlapping them as much as
+        possible.
+
+        This uses the greedy heuristic for the shortest common superstring:
+        Sequences contained in other sequences are dropped, and then the pair
+        of sequences with the longest overlap between the end of one and the
+        beginning of the other is merged repeatedly.
+
+        Afterwards, `add()` returns the offset of any of the `seqs` without
+        growing the table.
+        """
+        # Distinct sequences that aren't already in the table, longest first,
+        # so contained sequences can be found by the automaton as we go.
+        distinct = list()  # type: List[Tuple[Any, ...]]
+        seen = set()  # type: Set[Tuple[Any, ...]]
+        for seq in seqs:
+            tseq = tuple(seq)
+            if tseq and tseq not in seen and self.find(tseq) < 0:
+                seen.add(tseq)
+                distinct.append(tseq)
+        order = sorted(
+                range(len(distinct)), key=lambda i: -len(distinct[i]))
+        contained = UniqueSeqTable()
+        keep = list()  # type: List[int]
+        for i in order:
+            if contained.find(distinct[i]) < 0:
+                contained.add(distinct[i])
+                keep.append(i)
+        # Keep the input order among the remaining sequences.
+        parts = [distinct[i] for i in sorted(keep)]
+
+        # Find all the overlaps between a proper suffix of one part and a
+        # proper prefix of another.
+        prefixes = dict()  # type: Dict[Tuple[Any, ...], List[int]]
+        for b, part in enumerate(parts):
+            for k in range(1, len(part)):
+                prefixes.setdefault(part[:k], []).append(b)
+        overlaps = list()  # type: List[Tuple[int, int, int]]
+        for a, part in enumerate(parts):
+            for k in range(1, len(part)):
+                for b in prefixes.get(part[-k:], ()):
+                    if a != b:
+                        overlaps.append((-k, a, b))
+        overlaps.sort()
+
+        # Chain the parts together, taking the longest overlaps first.
+        succ = dict()  # type: Dict[int, Tuple[int, int]]
+        pred = dict()  # type: Dict[int, int]
+        # Map the tail of each chain to its head, and vice versa.
+        head = dict((i, i) for i in range(len(parts)))
+        tail = dict((i, i) for i in range(len(parts)))
+        for negk, a, b in overlaps:
+            if a in succ or b in pred or head[a] == b:
+                continue
+            succ[a] = (b, -negk)
+            pred[b] = a
+            h, t = head.pop(a), tail.pop(b)
+            head[t] = h
+            tail[h] = t
+
+        for i in range(len(parts)):
+            if i in pred:
+                continue
+            chain = list(parts[i])
+            while i in succ:
+                i, k = succ[i]
+                chain.extend(parts[i][k:])
+            if self.find(chain) < 0:
+                self._append(chain)
+
+    def _new_state(self, length, link, next, last, mark):
+        # type: (int, int, Dict[Any, int], int, int) -> int
+        self.next.append(next)
+        self.link.append(link)
+        self.length.append(length)
+        self.last.append(last)
+        self.mark.append(mark)
+        return len(self.length) - 1
+
+    def _clone(self, state, length):
+        # type: (int, int) -> int
+        """
+        Split the sequences no longer than `length` out of `state` into a new
+        state that becomes the suffix link of `state`.
+        """
+        clone = self._new_state(
+                length, self.link[state], dict(self.next[state]),
+                self.last[state], self.mark[state])
+        self.link[state] = clone
+        return clone
+
+    def _redirect(self, state, item, old, new):
+        # type: (int, Any, int, int) -> None
+        """
+        Redirect the `item` transitions into `old` from `state` and its suffix
+        link chain to `new`.
+        """
+        while state >= 0 and self.next[state].get(item) == old:
+            self.next[state][item] = new
+            state = self.link[state]
+
+    def _extend(self, last, item):
+        # type: (int, Any) -> int
+        """
+        Extend the automaton with `item` following the prefix matched by
+        `last`.
+
+        Return the state matching the extended prefix.
+        """
+        length = self.length[last] + 1
+
+        # The extended prefix was already in the automaton from an earlier
+        # sequence.
+        nxt = self.next[last].get(item, -1)
+        if nxt >= 0:
+            if self.length[nxt] == length:
+                return nxt
+            clone = self._clone(nxt, length)
+            self._redirect(last, item, nxt, clone)
+            return clone
+
+        cur = self._new_state(length, 0, dict(), 0, -1)
+        state = last
+        while state >= 0 and item not in self.next[state]:
+            self.next[state][item] = cur
+            state = self.link[state]
+        if state < 0:
+            return cur
+
+        nxt = self.next[state][item]
+        if self.length[nxt] == self.length[state] + 1:
+            self.link[cur] = nxt
+        else:
+            clone = self._clone(nxt, self.length[state] + 1)
+            self._redirect(state, item, nxt, clone)
+            self.link[cur] = clone
+        return cur
@@ -0,0 +1,209 @@
+"""
+Regenerate the Rust sources when the meta sources change.
+
+The `build.py --watch` mode keeps the finished ISA model in memory and polls
+the meta sources for changes. Most edits touch a single target ISA, and those
+are handled by reloading just that ISA package and regenerating the files that
+depend on it. Only files whose contents actually change are written, so cargo
+rebuilds as little as possible.
+
+Changes to anything else, like the shared `base` definitions or the `cdsl`
+classes, are handled by restarting the build script. Those modules hold
+registries and objects that are compared by identity, and they can't be
+reloaded safely in place.
+"""
+from __future__ import absolute_import, print_function
+import os
+import sys
+import time
+import traceback
+from os.path import join, relpath
+import isa
+import srcgen
+import gen_all
+import gen_instr
+import gen_settings
+import gen_legalizer
+import table_sizes
+from gen_build_deps import META_DIR, is_test, loaded_sources
+
+try:
+    from typing import Dict, Iterable, List, Optional, Set, Tuple  # noqa
+    from typing import TYPE_CHECKING  # noqa
+    if TYPE_CHECKING:
+        from cdsl.isa import TargetISA  # noqa
+        from gen_encoding import EncodingOptions  # noqa
+except ImportError:
+    pass
+
+
+# Seconds between polls of the meta sources.
+POLL_INTERVAL = 0.2
+
+
+def scan(top=META_DIR):
+    # type: (str) -> Dict[str, float]
+    """
+    Get the modification times of the Python sources under `top`, excluding
+    unit tests.
+    """
+    mtimes = dict()  # type: Dict[str, float]
+    for dirpath, dirnames, filenames in os.walk(top):
+        dirnames[:] = [d for d in dirnames if not d.startswith('.')]
+        for f in filenames:
+            path = join(dirpath, f)
+            if f.endswith('.py') and not is_test(path):
+                try:
+                    mtimes[path] = os.path.getmtime(path)
+                except OSError:
+                    # Removed while we were looking.
+                    pass
+    return mtimes
+
+
+def changed_files(old, new):
+    # type: (Dict[str, float], Dict[str, float]) -> List[str]
+    """
+    Get the files that were added, removed, or modified between two scans.
+
+        >>> changed_files({'a': 1, 'b': 1}, {'b': 2, 'c': 1})
+        ['a', 'b', 'c']
+    """
+    return sorted(p for p in set(old) | set(new) if old.get(p) != new.get(p))
+
+
+def classify(paths, loaded, top=META_DIR):
+    # type: (Iterable[str], Set[str], str) -> Tuple[Set[str], bool]
+    """
+    Decide how to handle changes to the source files in `paths`.
+
+    Return `(names, restart)` where `names` is the set of target ISAs whose
+    packages must be reloaded, and `restart` is true if the build script must
+    be restarted. Files outside the ISA packages that are not in `loaded` are
+    not used by the build script, so changes to them are ignored.
+
+        >>> loaded = set(['base/legalize.py'])
+        >>> sorted(classify(['isa/intel/encodings.py'], loaded, '')[0])
+        ['intel']
+        >>> classify(['base/legalize.py'], loaded, '')[1]
+        True
+        >>> classify(['benchmark.py'], loaded, '') == (set(), False)
+        True
+    """
+    names = set()  # type: Set[str]
+    restart = False
+    for path in paths:
+        parts = relpath(path, top or os.curdir).split(os.sep)
+        if len(parts) > 2 and parts[0] == 'isa' and parts[1] in isa.ISA_NAMES:
+            names.add(parts[1])
+        elif path in loaded:
+            restart = True
+    return names, restart
+
+
+def regenerate(isas, out_dir, names, enc_options=None):
+    # type: (List[TargetISA], str, Iterable[str], Optional[EncodingOptions]) -> None  # noqa
+    """
+    Regenerate the sources that depend on the target ISAs in `names` after
+    they have been reloaded.
+
+    The instructions are numbered across all target ISAs, so if the opcodes
+    change, the tables for all of `isas` are regenerated.
+    """
+    names = set(names)
+    written = srcgen.update_stats()[1]
+    gen_instr.generate(isa.instruction_groups(), out_dir)
+    if srcgen.update_stats()[1] != written:
+        names = set(target.name for target in isas)
+
+    gen_settings.gen_shared(gen_settings.shared_group(isas), out_dir)
+    for target in isas:
+        if target.name in names:
+            table_sizes.table_sizes().pop(target.name, None)
+            table_sizes.removed_encodings().pop(target.name, None)
+            for filename, fmt in gen_all.gen_isa_sources(
+                    target, enc_options):
+                fmt.update_file(filename, out_dir)
+    gen_legalizer.gen_shared(gen_legalizer.shared_groups(isas), out_dir)
+    # The statistics for the tables that were not rebuilt are still there.
+    gen_all.write_hash_tables_report(out_dir)
+    table_sizes.write_reports(out_dir)
+
+
+def restart():
+    # type: () -> None
+    """Replace this process with a fresh run of the build script."""
+    print('Restarting...')
+    sys.stdout.flush()
+    args = [sys.executable]
+    if sys.flags.dont_write_bytecode:
+        args.append('-B')
+    os.execv(sys.executable, args + sys.argv)
+
+
+class Watcher(object):
+    """
+    Keep the finished target ISAs in `isa_names` in memory and regenerate
+    their sources in `out_dir` when the meta sources change.
+
+    The sources must already have been generated once with the same
+    `enc_options`, so the ISA definitions are loaded.
+    """
+
+    def __init__(self, out_dir, isa_names, enc_options=None):
+        # type: (str, List[str], Optional[EncodingOptions]) -> None
+        self.out_dir = out_dir
+        self.isa_names = isa_names
+        self.enc_options = enc_options
+        self.mtimes = scan()
+        # Set when a reload failed. The shared definitions may be left in an
+        # inconsistent state, so the next change restarts the build script.
+        self.broken = False
+
+    def poll(self):
+        # type: () -> List[str]
+        """Check for changes and handle them. Return the changed files."""
+        mtimes = scan()
+        changed = changed_files(self.mtimes, mtimes)
+        self.mtimes = mtimes
+        if changed:
+            self.update(changed)
+        return changed
+
+    def update(self, changed):
+        # type: (List[str]) -> None
+        """Handle changes to the source files in `changed`."""
+        names, must_restart = classify(changed, loaded_sources())
+        if must_restart or (self.broken and names):
+            restart()
+        if not names:
+            return
+
+        start = time.time()
+        written = srcgen.update_stats()[1]
+        try:
+            for name in names:
+                isa.unload_isa(name)
+            isas = isa.all_isas(self.isa_names)
+            regenerate(isas, self.out_dir, names, self.enc_options)
+        except Exception:
+            traceback.print_exc()
+            self.broken = True
+            print('Fix the error to regenerate.')
+            return
+        print('Reloaded {} in {:.0f}ms, {} files changed.'.format(
+            ', '.join(sorted(names)), (time.time() - start) * 1e3,
+            srcgen.update_stats()[1] - written))
+        sys.stdout.flush()
+
+    def run(self, interval=POLL_INTERVAL):
+        # type: (float) -> None
+        """Poll for changes until interrupted."""
+        print('Watching {} for changes.'.format(META_DIR))
+        sys.stdout.flush()
+        try:
+            while True:
+                time.sleep(interval)
+                self.poll()
+        except KeyboardInterrupt:
+            pass
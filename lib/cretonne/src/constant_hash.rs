@@ -7,6 +7,10 @@
 //! - Contain at least one empty slot.
 //!
 //! This module provides runtime support for lookups in these tables.
+//!
+//! Tables built with `compute_perfect()` are perfect hash tables instead. They also have a
+//! power-of-two size, but they come with a power-of-two sized array of displacements, and a lookup
+//! examines exactly one table entry. See `perfect_probe()`.
 
 /// Trait that must be implemented by the entries in a constant hash table.
 pub trait Table<K: Copy + Eq> {
@@ -56,6 +60,48 @@ pub fn probe<K: Copy + Eq, T: Table<K> + ?Sized>(
     }
 }
 
+/// Scramble the bits of a 32-bit hash value.
+/// Must match `lib/cretonne/meta/constant_hash.py`.
+pub fn mix32(mut h: u32) -> u32 {
+    h ^= h >> 16;
+    h = h.wrapping_mul(0x85eb_ca6b);
+    h ^= h >> 13;
+    h = h.wrapping_mul(0xc2b2_ae35);
+    h ^= h >> 16;
+    h
+}
+
+/// Compute the hash selecting a perfect hash table slot for `hash` with the displacement `d`.
+/// Must match `lib/cretonne/meta/constant_hash.py`.
+pub fn displace(hash: u32, d: u16) -> u32 {
+    mix32(hash.wrapping_add(u32::from(d).wrapping_mul(0x9e37_79b9)))
+}
+
+/// Look for `key` in the perfect hash `table` with the given `displacements`.
+///
+/// The provided `hash` value must have been computed from `key` using the same hash function that
+/// was used to construct the table. Both `table` and `displacements` must have a power-of-two
+/// length.
+///
+/// Returns `Ok(idx)` with the table index containing the found entry, or `Err(idx)` with the only
+/// index where the entry could have been. That entry may contain a different key.
+pub fn perfect_probe<K: Copy + Eq, T: Table<K> + ?Sized>(
+    table: &T,
+    displacements: &[u16],
+    key: K,
+    hash: usize,
+) -> Result<usize, usize> {
+    debug_assert!(table.len().is_power_of_two());
+    debug_assert!(displacements.len().is_power_of_two());
+    let hash = hash as u32;
+    let bucket = (mix32(hash) >> 16) as usize & (displacements.len() - 1);
+    let idx = displace(hash, displacements[bucket]) as usize & (table.len() - 1);
+    match table.key(idx) {
+        Some(k) if k == key => Ok(idx),
+        _ => Err(idx),
+    }
+}
+
 /// A primitive hash function for matching opcodes.
 /// Must match `lib/cretonne/meta/constant_hash.py`.
 pub fn simple_hash(s: &str) -> usize {
@@ -68,12 +114,46 @@ pub fn simple_hash(s: &str) -> usize {
 
 #[cfg(test)]
 mod tests {
-    use super::simple_hash;
+    use super::{Table, simple_hash, mix32, displace, perfect_probe};
 
     #[test]
     fn basic() {
         // c.f. `meta/constant_hash.py` tests.
         assert_eq!(simple_hash("Hello"), 0x2fa70c01);
         assert_eq!(simple_hash("world"), 0x5b0c31d5);
+        assert_eq!(mix32(1), 0x514e28b7);
+        assert_eq!(displace(1, 0), mix32(1));
+        assert_eq!(displace(1, 1), 0x96a0f96b);
+    }
+
+    impl Table<u32> for [Option<u32>] {
+        fn len(&self) -> usize {
+            self.len()
+        }
+
+        fn key(&self, idx: usize) -> Option<u32> {
+            self[idx]
+        }
+    }
+
+    #[test]
+    fn perfect() {
+        // Computed by `compute_perfect(range(1, 6), lambda x: x)`.
+        let table = [
+            Some(2),
+            Some(3),
+            Some(5),
+            None,
+            Some(1),
+            Some(4),
+            None,
+            None,
+        ];
+        let displacements = [3, 2];
+        for k in 1..6 {
+            let idx = perfect_probe(&table[..], &displacements, k, k as usize).unwrap();
+            assert_eq!(table[idx], Some(k));
+        }
+        assert!(perfect_probe(&table[..], &displacements, 6, 6).is_err());
     }
 }
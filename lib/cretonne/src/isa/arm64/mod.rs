@@ -8,7 +8,7 @@ mod registers;
 
 use binemit::{CodeSink, MemoryCodeSink, emit_function};
 use super::super::settings as shared_settings;
-use isa::enc_tables::{lookup_enclist, Encodings};
+use isa::enc_tables::Encodings;
 use isa::Builder as IsaBuilder;
 use isa::{TargetIsa, RegInfo, RegClass, EncInfo};
 use ir;
@@ -20,6 +20,8 @@ use std::boxed::Box;
 struct Isa {
     shared_flags: shared_settings::Flags,
     isa_flags: settings::Flags,
+    /// Encoding lists filtered for `isa_flags`.
+    enclist_cache: enc_tables::IsaEncListCache,
 }
 
 /// Get an ISA builder for creating ARM64 targets.
@@ -34,9 +36,18 @@ fn isa_constructor(
     shared_flags: shared_settings::Flags,
     builder: &shared_settings::Builder,
 ) -> Box<TargetIsa> {
+    let isa_flags = settings::Flags::new(&shared_flags, builder);
+    let enclist_cache = enc_tables::IsaEncListCache::new(
+        &enc_tables::ENCLISTS[..],
+        &enc_tables::ISAP_ENCLISTS[..],
+        &enc_tables::RECIPE_PREDICATES[..],
+        &enc_tables::INST_PREDICATES[..],
+        isa_flags.predicate_view(),
+    );
     Box::new(Isa {
-        isa_flags: settings::Flags::new(&shared_flags, builder),
+        isa_flags,
         shared_flags,
+        enclist_cache,
     })
 }
 
@@ -63,12 +74,13 @@ impl TargetIsa for Isa {
         inst: &'a ir::InstructionData,
         ctrl_typevar: ir::Type,
     ) -> Encodings<'a> {
-        lookup_enclist(
+        self.enclist_cache.lookup_enclist(
             ctrl_typevar,
             inst,
             dfg,
             &enc_tables::LEVEL1_A64[..],
             &enc_tables::LEVEL2[..],
+            &enc_tables::LEVEL2_DISPLACEMENTS[..],
             &enc_tables::ENCLISTS[..],
             &enc_tables::LEGALIZE_ACTIONS[..],
             &enc_tables::RECIPE_PREDICATES[..],
@@ -3,24 +3,74 @@
 //! This module contains types and functions for working with the encoding tables generated by
 //! `lib/cretonne/meta/gen_encoding.py`.
 
-use constant_hash::{Table, probe};
+use constant_hash::{Table, probe, perfect_probe};
 use ir::{Type, Opcode, DataFlowGraph, InstructionData};
 use isa::{Encoding, Legalize};
 use settings::PredicateView;
 use std::ops::Range;
 
+/// A group of instruction predicate leaves.
+///
+/// The leaf predicates tested by the instruction and recipe predicates of an ISA are grouped by
+/// instruction format. The `eval` function of a group decodes the instruction fields once and
+/// evaluates all the leaves in the group. The predicates get the leaf values from a `LeafValues`,
+/// which keeps the values of the last group it evaluated, so the predicates tested for an
+/// instruction share them.
+#[derive(Clone, Copy)]
+pub struct PredicateLeafs {
+    /// Number of the group, unique within an ISA.
+    pub group: u8,
+    /// Evaluate the leaves in the group. Bit `n` of the result is the value of leaf `n`.
+    pub eval: fn(&DataFlowGraph, &InstructionData) -> u32,
+}
+
+/// The predicate leaf values of an instruction, evaluated on demand.
+///
+/// The leaves of a group are evaluated the first time a predicate asks for them. The values are
+/// kept until a predicate asks for a different group.
+pub struct LeafValues<'a> {
+    dfg: &'a DataFlowGraph,
+    inst: &'a InstructionData,
+    // The `PredicateLeafs` group evaluated last, or `!0`, and its leaf values.
+    group: u8,
+    values: u32,
+}
+
+impl<'a> LeafValues<'a> {
+    /// Create a `LeafValues` for `inst` that hasn't evaluated any leaves yet.
+    pub fn new(dfg: &'a DataFlowGraph, inst: &'a InstructionData) -> Self {
+        LeafValues {
+            dfg,
+            inst,
+            group: !0,
+            values: 0,
+        }
+    }
+
+    /// Get the values of the leaves in `group`.
+    pub fn get(&mut self, group: PredicateLeafs) -> u32 {
+        if group.group != self.group {
+            self.values = (group.eval)(self.dfg, self.inst);
+            self.group = group.group;
+        }
+        self.values
+    }
+}
+
 /// A recipe predicate.
 ///
-/// This is a predicate function capable of testing ISA and instruction predicates simultaneously.
+/// This is a predicate function capable of testing ISA predicates and the instruction predicate
+/// leaves in a group simultaneously. The ISA predicate is tested first, so the leaves are only
+/// evaluated when it is satisfied.
 ///
 /// A None predicate is always satisfied.
-pub type RecipePredicate = Option<fn(PredicateView, &InstructionData) -> bool>;
+pub type RecipePredicate = Option<fn(PredicateView, &mut LeafValues) -> bool>;
 
 /// An instruction predicate.
 ///
-/// This is a predicate function that needs to be tested in addition to the recipe predicate. It
-/// can't depend on ISA settings.
-pub type InstPredicate = fn(&DataFlowGraph, &InstructionData) -> bool;
+/// This is a predicate function of the leaves in a group that needs to be tested in addition to
+/// the recipe predicate. It can't depend on ISA settings.
+pub type InstPredicate = fn(&mut LeafValues) -> bool;
 
 /// Legalization action to perform when no encoding can be found for an instruction.
 ///
@@ -42,6 +92,8 @@ pub type LegalizeCode = u8;
 /// Empty entries are encoded with a `!0` value for `log2len` which will always be out of range.
 /// Entries that have a `legalize` value but no level 2 table have an `offset` field that is out f
 /// bounds.
+///
+/// Tables generated with perfect hash or dense level 2 tables use `Level1EntryExt` instead.
 pub struct Level1Entry<OffT: Into<u32> + Copy> {
     pub ty: Type,
     pub log2len: u8,
@@ -49,25 +101,146 @@ pub struct Level1Entry<OffT: Into<u32> + Copy> {
     pub offset: OffT,
 }
 
-impl<OffT: Into<u32> + Copy> Level1Entry<OffT> {
+/// Level 1 hash table entry with the fields needed by perfect hash and dense level 2 tables.
+///
+/// The fields shared with `Level1Entry` have the same meaning.
+///
+/// When the level 2 tables are perfect hash tables, the `disp` and `log2disp` fields similarly
+/// refer to the displacements for the level 2 table in `LEVEL2_DISPLACEMENTS`. Otherwise they are
+/// unused.
+///
+/// When `dense` is set, the level 2 table is not a hash table, but a direct array indexed by
+/// opcode number. Its length is stored in the `disp` field, and `log2len` and `log2disp` are
+/// unused.
+pub struct Level1EntryExt<OffT: Into<u32> + Copy> {
+    pub ty: Type,
+    pub log2len: u8,
+    pub legalize: LegalizeCode,
+    pub dense: bool,
+    pub offset: OffT,
+    pub log2disp: u8,
+    pub disp: OffT,
+}
+
+/// A level 1 hash table entry that can find encoding lists in the level 2 tables.
+///
+/// This is implemented by `Level1Entry` and `Level1EntryExt`, so the lookup functions work with
+/// both level 1 table layouts.
+pub trait Level1Lookup {
+    /// Get the controlling type variable of this entry, or `None` for an empty entry.
+    fn key(&self) -> Option<Type>;
+
+    /// Get the default legalization code for the type.
+    fn legalize(&self) -> LegalizeCode;
+
+    /// Find the offset of the encoding list for `opcode` in the level 2 table of this entry, or
+    /// `!0` when there is none.
+    fn find_enclist<OffT2: Into<u32> + Copy>(
+        &self,
+        opcode: Opcode,
+        level2_table: &[Level2Entry<OffT2>],
+        level2_displacements: &[u16],
+    ) -> usize;
+}
+
+impl<OffT: Into<u32> + Copy> Level1Lookup for Level1Entry<OffT> {
+    fn key(&self) -> Option<Type> {
+        if self.log2len != !0 { Some(self.ty) } else { None }
+    }
+
+    fn legalize(&self) -> LegalizeCode {
+        self.legalize
+    }
+
+    fn find_enclist<OffT2: Into<u32> + Copy>(
+        &self,
+        opcode: Opcode,
+        level2_table: &[Level2Entry<OffT2>],
+        _level2_displacements: &[u16],
+    ) -> usize {
+        let b = self.offset.into() as usize;
+        match level2_table.get(b..b + (1 << self.log2len)) {
+            Some(l2tab) => {
+                match probe(l2tab, opcode, opcode as usize) {
+                    Ok(l2idx) => l2tab[l2idx].offset.into() as usize,
+                    Err(_) => !0,
+                }
+            }
+            // The range is invalid. This means that we just have a customized legalization code
+            // for this type. The level 2 table is empty.
+            None => !0,
+        }
+    }
+}
+
+impl<OffT: Into<u32> + Copy> Level1EntryExt<OffT> {
     /// Get the level 2 table range indicated by this entry.
     fn range(&self) -> Range<usize> {
         let b = self.offset.into() as usize;
-        b..b + (1 << self.log2len)
+        if self.dense {
+            b..b + self.disp.into() as usize
+        } else {
+            b..b + (1 << self.log2len)
+        }
+    }
+
+    /// Get the range of level 2 displacements indicated by this entry.
+    fn disp_range(&self) -> Range<usize> {
+        let b = self.disp.into() as usize;
+        b..b + (1 << self.log2disp)
     }
 }
 
-impl<OffT: Into<u32> + Copy> Table<Type> for [Level1Entry<OffT>] {
+impl<OffT: Into<u32> + Copy> Level1Lookup for Level1EntryExt<OffT> {
+    fn key(&self) -> Option<Type> {
+        if self.log2len != !0 { Some(self.ty) } else { None }
+    }
+
+    fn legalize(&self) -> LegalizeCode {
+        self.legalize
+    }
+
+    fn find_enclist<OffT2: Into<u32> + Copy>(
+        &self,
+        opcode: Opcode,
+        level2_table: &[Level2Entry<OffT2>],
+        level2_displacements: &[u16],
+    ) -> usize {
+        match level2_table.get(self.range()) {
+            Some(l2tab) if self.dense => {
+                // Dense tables have an entry for every opcode number up to the largest one with
+                // an encoding list.
+                match l2tab.get(opcode as usize) {
+                    Some(l2ent) if l2ent.opcode.is_some() => l2ent.offset.into() as usize,
+                    _ => !0,
+                }
+            }
+            Some(l2tab) => {
+                let l2idx = if level2_displacements.is_empty() {
+                    probe(l2tab, opcode, opcode as usize)
+                } else {
+                    let disp = &level2_displacements[self.disp_range()];
+                    perfect_probe(l2tab, disp, opcode, opcode as usize)
+                };
+                match l2idx {
+                    Ok(l2idx) => l2tab[l2idx].offset.into() as usize,
+                    Err(_) => !0,
+                }
+            }
+            // The range is invalid. This means that we just have a customized legalization code
+            // for this type. The level 2 table is empty.
+            None => !0,
+        }
+    }
+}
+
+impl<L1: Level1Lookup> Table<Type> for [L1] {
     fn len(&self) -> usize {
         self.len()
     }
 
     fn key(&self, idx: usize) -> Option<Type> {
-        if self[idx].log2len != !0 {
-            Some(self[idx].ty)
-        } else {
-            None
-        }
+        self[idx].key()
     }
 }
 
@@ -97,52 +270,70 @@ impl<OffT: Into<u32> + Copy> Table<Opcode> for [Level2Entry<OffT>] {
     }
 }
 
+/// Two-level hash table lookup.
+///
+/// Given the controlling type variable and instruction opcode, find the offset of the
+/// corresponding encoding list, or `!0` when there is none, and the default legalization code.
+fn find_enclist<L1, OffT2>(
+    ctrl_typevar: Type,
+    inst: &InstructionData,
+    level1_table: &[L1],
+    level2_table: &[Level2Entry<OffT2>],
+    level2_displacements: &[u16],
+) -> (usize, LegalizeCode)
+where
+    L1: Level1Lookup,
+    OffT2: Into<u32> + Copy,
+{
+    match probe(level1_table, ctrl_typevar, ctrl_typevar.index()) {
+        Err(l1idx) => {
+            // No level 1 entry found for the type.
+            // We have a sentinel entry with the default legalization code.
+            (!0, level1_table[l1idx].legalize())
+        }
+        Ok(l1idx) => {
+            // We have a valid level 1 entry for this type.
+            let l1ent = &level1_table[l1idx];
+            let offset = l1ent.find_enclist(inst.opcode(), level2_table, level2_displacements);
+            (offset, l1ent.legalize())
+        }
+    }
+}
+
 /// Two-level hash table lookup and iterator construction.
 ///
 /// Given the controlling type variable and instruction opcode, find the corresponding encoding
 /// list.
 ///
+/// The level 2 tables are perfect hash tables if `level2_displacements` is not empty. Level 2
+/// tables marked as `dense` in their level 1 entry are indexed directly by opcode.
+///
 /// Returns an iterator that produces legal encodings for `inst`.
-pub fn lookup_enclist<'a, OffT1, OffT2>(
+pub fn lookup_enclist<'a, L1, OffT2, EncT>(
     ctrl_typevar: Type,
     inst: &'a InstructionData,
     dfg: &'a DataFlowGraph,
-    level1_table: &'static [Level1Entry<OffT1>],
+    level1_table: &'static [L1],
     level2_table: &'static [Level2Entry<OffT2>],
-    enclist: &'static [EncListEntry],
+    level2_displacements: &'static [u16],
+    enclist: &'static [EncT],
     legalize_actions: &'static [Legalize],
     recipe_preds: &'static [RecipePredicate],
     inst_preds: &'static [InstPredicate],
     isa_preds: PredicateView<'a>,
 ) -> Encodings<'a>
 where
-    OffT1: Into<u32> + Copy,
+    L1: Level1Lookup,
     OffT2: Into<u32> + Copy,
+    EncT: EncListEntry,
 {
-    let (offset, legalize) = match probe(level1_table, ctrl_typevar, ctrl_typevar.index()) {
-        Err(l1idx) => {
-            // No level 1 entry found for the type.
-            // We have a sentinel entry with the default legalization code.
-            (!0, level1_table[l1idx].legalize)
-        }
-        Ok(l1idx) => {
-            // We have a valid level 1 entry for this type.
-            let l1ent = &level1_table[l1idx];
-            let offset = match level2_table.get(l1ent.range()) {
-                Some(l2tab) => {
-                    let opcode = inst.opcode();
-                    match probe(l2tab, opcode, opcode as usize) {
-                        Ok(l2idx) => l2tab[l2idx].offset.into() as usize,
-                        Err(_) => !0,
-                    }
-                }
-                // The l1ent range is invalid. This means that we just have a customized
-                // legalization code for this type. The level 2 table is empty.
-                None => !0,
-            };
-            (offset, l1ent.legalize)
-        }
-    };
+    let (offset, legalize) = find_enclist(
+        ctrl_typevar,
+        inst,
+        level1_table,
+        level2_table,
+        level2_displacements,
+    );
 
     // Now we have an offset into `enclist` that is `!0` when no encoding list could be found.
     // The default legalization code is always valid.
@@ -151,7 +342,7 @@ where
         legalize,
         inst,
         dfg,
-        enclist,
+        EncT::enclists(enclist),
         legalize_actions,
         recipe_preds,
         inst_preds,
@@ -159,16 +350,414 @@ where
     )
 }
 
+/// An encoding list that contains ISA predicate entries.
+///
+/// The ISA predicates in a list always evaluate the same way for given ISA flags, so an
+/// `EncListCache` can remove them from the list once. These entries describe where the
+/// predicate entries are in the list, so it doesn't need to decode the list structure.
+pub struct IsapEncList {
+    /// Offset of the list in `ENCLISTS`.
+    pub offset: u32,
+    /// Number of words in the list.
+    pub len: u16,
+    /// The predicate entries in the list as `(position, skip, isap)` triples. The position is
+    /// relative to `offset`, the skip count is in words, and `isap` is set for ISA predicates.
+    pub preds: &'static [(u16, u16, bool)],
+}
+
+/// Encoding lists with their ISA predicates evaluated for fixed ISA flags.
+///
+/// When an ISA is created, the encoding lists described in the `IsapEncList` table get their ISA
+/// predicates evaluated, and a copy of each list without them is built in the `u32` list format.
+/// Lookups of those lists iterate over the copies. Lists without ISA predicates are used as they
+/// are.
+///
+/// The lists are never modified after they are built, so the cache can be shared between threads.
+pub struct EncListCache {
+    /// The filtered lists, sorted by their offset in the original table.
+    lists: Vec<(u32, Box<[u32]>)>,
+}
+
+impl EncListCache {
+    /// Filter the lists in `isap_enclists` for the ISA predicates in `isa_preds`.
+    pub fn new<EncT: EncListEntry>(
+        enclist: &[EncT],
+        isap_enclists: &[IsapEncList],
+        recipe_preds: &[RecipePredicate],
+        inst_preds: &[InstPredicate],
+        isa_preds: PredicateView,
+    ) -> Self {
+        let lists = isap_enclists
+            .iter()
+            .map(|meta| {
+                let start = meta.offset as usize;
+                let words = &enclist[start..start + meta.len as usize];
+                let list = filter_enclist(
+                    words,
+                    meta.preds,
+                    recipe_preds.len(),
+                    inst_preds.len(),
+                    isa_preds,
+                );
+                (meta.offset, list.into_boxed_slice())
+            })
+            .collect();
+        EncListCache { lists }
+    }
+
+    /// Look up the encoding list for an instruction.
+    ///
+    /// This is `lookup_enclist()` using the filtered copies of the lists.
+    pub fn lookup_enclist<'a, L1, OffT2, EncT>(
+        &'a self,
+        ctrl_typevar: Type,
+        inst: &'a InstructionData,
+        dfg: &'a DataFlowGraph,
+        level1_table: &'static [L1],
+        level2_table: &'static [Level2Entry<OffT2>],
+        level2_displacements: &'static [u16],
+        enclist: &'static [EncT],
+        legalize_actions: &'static [Legalize],
+        recipe_preds: &'static [RecipePredicate],
+        inst_preds: &'static [InstPredicate],
+        isa_preds: PredicateView<'a>,
+    ) -> Encodings<'a>
+    where
+        L1: Level1Lookup,
+        OffT2: Into<u32> + Copy,
+        EncT: EncListEntry,
+    {
+        let (offset, legalize) = find_enclist(
+            ctrl_typevar,
+            inst,
+            level1_table,
+            level2_table,
+            level2_displacements,
+        );
+        let (offset, lists) =
+            match self.lists.binary_search_by_key(&offset, |l| l.0 as usize) {
+                Ok(idx) => (0, EncLists::Filtered(&self.lists[idx].1)),
+                Err(_) => (offset, EncT::enclists(enclist)),
+            };
+        Encodings::new(
+            offset,
+            legalize,
+            inst,
+            dfg,
+            lists,
+            legalize_actions,
+            recipe_preds,
+            inst_preds,
+            isa_preds,
+        )
+    }
+}
+
+/// The `EncListCache` replacement used by ISAs whose tables were generated without the
+/// `enclist_cache` option.
+///
+/// It has no state, and looks up all the encoding lists as they are.
+#[derive(Clone, Copy)]
+pub struct NoEncListCache;
+
+impl NoEncListCache {
+    /// Create the cache. The arguments are ignored.
+    pub fn new<EncT: EncListEntry>(
+        _enclist: &[EncT],
+        _isap_enclists: &[IsapEncList],
+        _recipe_preds: &[RecipePredicate],
+        _inst_preds: &[InstPredicate],
+        _isa_preds: PredicateView,
+    ) -> Self {
+        NoEncListCache
+    }
+
+    /// Look up the encoding list for an instruction.
+    ///
+    /// This is the same as `lookup_enclist()`.
+    pub fn lookup_enclist<'a, L1, OffT2, EncT>(
+        &'a self,
+        ctrl_typevar: Type,
+        inst: &'a InstructionData,
+        dfg: &'a DataFlowGraph,
+        level1_table: &'static [L1],
+        level2_table: &'static [Level2Entry<OffT2>],
+        level2_displacements: &'static [u16],
+        enclist: &'static [EncT],
+        legalize_actions: &'static [Legalize],
+        recipe_preds: &'static [RecipePredicate],
+        inst_preds: &'static [InstPredicate],
+        isa_preds: PredicateView<'a>,
+    ) -> Encodings<'a>
+    where
+        L1: Level1Lookup,
+        OffT2: Into<u32> + Copy,
+        EncT: EncListEntry,
+    {
+        lookup_enclist(
+            ctrl_typevar,
+            inst,
+            dfg,
+            level1_table,
+            level2_table,
+            level2_displacements,
+            enclist,
+            legalize_actions,
+            recipe_preds,
+            inst_preds,
+            isa_preds,
+        )
+    }
+}
+
+/// Defaults for the generated encoding table items that are only emitted with some of the table
+/// generation options.
+///
+/// The ISA encoding table modules re-export these with a glob import, so the generated items with
+/// the same names take precedence when they exist.
+pub mod defaults {
+    use super::{IsapEncList, NoEncListCache};
+
+    /// Level 2 displacements of ISAs whose tables aren't perfect hash tables.
+    pub static LEVEL2_DISPLACEMENTS: [u16; 0] = [];
+
+    /// Encoding lists with ISA predicate entries of ISAs generated without the `enclist_cache`
+    /// option.
+    pub static ISAP_ENCLISTS: [IsapEncList; 0] = [];
+
+    /// Encoding list cache type of ISAs generated without the `enclist_cache` option.
+    pub type IsaEncListCache = NoEncListCache;
+}
+
+/// Remove the ISA predicate entries from the encoding list `words`, along with the entries they
+/// skip when they are false.
+///
+/// The predicate entries in `preds` are described as in `IsapEncList`. The remaining instruction
+/// predicates get their skip counts adjusted. Returns the filtered list in the `u32` format.
+fn filter_enclist<EncT: EncListEntry>(
+    words: &[EncT],
+    preds: &[(u16, u16, bool)],
+    num_recipes: usize,
+    num_inst_preds: usize,
+    isa_preds: PredicateView,
+) -> Vec<u32> {
+    // Split the list into entries: `(position, pred)` where `pred` indexes `preds` for predicate
+    // entries. Every entry is a single word in the `u32` format.
+    let mut entries = Vec::new();
+    let mut pos = 0;
+    let mut next_pred = 0;
+    while pos < words.len() {
+        if preds.get(next_pred).map_or(false, |p| p.0 as usize == pos) {
+            entries.push((pos, Some(next_pred)));
+            next_pred += 1;
+            pos += 1;
+            continue;
+        }
+        entries.push((pos, None));
+        let code = words[pos].into() as usize >> EncT::ENCBITS;
+        pos += if EncT::ENCBITS == 0 && code >> 1 < num_recipes {
+            2
+        } else {
+            1
+        };
+    }
+
+    // Evaluate the ISA predicates.
+    let mut keep = vec![true; entries.len()];
+    let mut end = entries.len();
+    for i in 0..entries.len() {
+        let (pos, pred) = entries[i];
+        let (_, skip, isap) = match pred {
+            Some(p) if i < end && keep[i] && preds[p].2 => preds[p],
+            _ => continue,
+        };
+        keep[i] = false;
+        let pred_entry = words[pos].into() as usize - EncT::PRED_START;
+        let pred = pred_entry & ((1 << EncT::PRED_BITS) - 1);
+        debug_assert!(isap && pred >= num_inst_preds);
+        if isa_preds.test(pred - num_inst_preds) {
+            continue;
+        }
+        if skip == 0 {
+            end = i;
+            break;
+        }
+        let skip_end = pos + 1 + skip as usize;
+        for j in i + 1..entries.len() {
+            if entries[j].0 >= skip_end {
+                break;
+            }
+            keep[j] = false;
+        }
+    }
+
+    // Recompute the skip counts of the remaining instruction predicates, innermost first. A
+    // predicate that no longer guards any entries is removed.
+    let mut skips = vec![0; entries.len()];
+    for i in (0..end).rev() {
+        let (pos, skip) = match entries[i] {
+            (pos, Some(p)) if keep[i] => (pos, preds[p].1 as usize),
+            _ => continue,
+        };
+        if skip == 0 {
+            continue;
+        }
+        let skip_end = pos + 1 + skip;
+        let count = (i + 1..end)
+            .take_while(|&j| entries[j].0 < skip_end)
+            .filter(|&j| keep[j])
+            .count();
+        if count == 0 {
+            keep[i] = false;
+        }
+        skips[i] = count;
+    }
+
+    let mut filtered = Vec::new();
+    for i in (0..end).filter(|&i| keep[i]) {
+        let (pos, pred) = entries[i];
+        let entry = words[pos].into() as usize;
+        let word = match pred {
+            Some(_) => {
+                let pred_entry = entry - EncT::PRED_START;
+                let pred = pred_entry & ((1 << EncT::PRED_BITS) - 1);
+                <u32 as EncListEntry>::PRED_START + (skips[i] << <u32 as EncListEntry>::PRED_BITS) +
+                    pred
+            }
+            None if EncT::ENCBITS == 0 => {
+                let bits = words.get(pos + 1).map_or(0, |&w| w.into() as usize);
+                if entry >> 1 < num_recipes {
+                    (entry << <u32 as EncListEntry>::ENCBITS) | bits
+                } else {
+                    entry << <u32 as EncListEntry>::ENCBITS
+                }
+            }
+            None => {
+                let code = entry >> EncT::ENCBITS;
+                let bits = entry & ((1 << EncT::ENCBITS) - 1);
+                (code << <u32 as EncListEntry>::ENCBITS) | bits
+            }
+        };
+        filtered.push(word as u32);
+    }
+    filtered
+}
+
+/// Encoding tables specialized for a settings preset.
+///
+/// The ISA predicates that only depend on the settings in the preset are resolved when the tables
+/// are generated, so the encoding lists and recipe predicates don't test them. The tables are
+/// only valid for ISA flags where the resolved predicates have the values in `predicates`.
+///
+/// The tables are generic over the same types as `lookup_enclist()`.
+pub struct SpecializedTables<L1, OffT2, EncT>
+where
+    L1: Level1Lookup + 'static,
+    OffT2: Into<u32> + Copy + 'static,
+    EncT: EncListEntry + 'static,
+{
+    /// Name of the settings preset.
+    pub name: &'static str,
+    /// The resolved ISA predicates as `(mask, value)` pairs for the bytes of the predicate vector.
+    pub predicates: &'static [(u8, u8)],
+    pub level1: &'static [L1],
+    pub level2: &'static [Level2Entry<OffT2>],
+    pub level2_displacements: &'static [u16],
+    pub enclists: &'static [EncT],
+    pub recipe_preds: &'static [RecipePredicate],
+}
+
+impl<L1, OffT2, EncT> SpecializedTables<L1, OffT2, EncT>
+where
+    L1: Level1Lookup,
+    OffT2: Into<u32> + Copy,
+    EncT: EncListEntry,
+{
+    /// Check if these tables are valid for the ISA predicates in `isa_preds`.
+    pub fn matches(&self, isa_preds: PredicateView) -> bool {
+        isa_preds.matches(self.predicates)
+    }
+
+    /// Look up the encoding list for an instruction in these tables.
+    ///
+    /// This is `lookup_enclist()` with the specialized tables.
+    pub fn lookup_enclist<'a>(
+        &self,
+        ctrl_typevar: Type,
+        inst: &'a InstructionData,
+        dfg: &'a DataFlowGraph,
+        legalize_actions: &'static [Legalize],
+        inst_preds: &'static [InstPredicate],
+        isa_preds: PredicateView<'a>,
+    ) -> Encodings<'a> {
+        lookup_enclist(
+            ctrl_typevar,
+            inst,
+            dfg,
+            self.level1,
+            self.level2,
+            self.level2_displacements,
+            self.enclists,
+            legalize_actions,
+            self.recipe_preds,
+            inst_preds,
+            isa_preds,
+        )
+    }
+}
+
 /// Encoding list entry.
 ///
-/// Encoding lists are represented as sequences of u16 words.
-pub type EncListEntry = u16;
+/// Encoding lists are represented as sequences of `u16` or `u32` words. Each ISA uses the smallest
+/// word type that can represent its encoding lists. The parameters of the list format must match
+/// the `EncListFormat` for the word type in `meta/gen_encoding.py`.
+pub trait EncListEntry: Into<u32> + Copy {
+    /// First code word representing a predicate check.
+    const PRED_START: usize;
+
+    /// Number of bits used to represent a predicate.
+    const PRED_BITS: u8;
 
-/// Number of bits used to represent a predicate. c.f. `meta/gen_encoding.py`.
-const PRED_BITS: u8 = 12;
-const PRED_MASK: usize = (1 << PRED_BITS) - 1;
-/// First code word representing a predicate check. c.f. `meta/gen_encoding.py`.
-const PRED_START: usize = 0x1000;
+    /// Number of low bits holding the encoding bits in a recipe entry. When this is 0, the
+    /// encoding bits are stored in the word following the recipe entry.
+    const ENCBITS: u8;
+
+    /// Get the encoding list table in a form that can be stored in an `Encodings` iterator.
+    fn enclists(table: &'static [Self]) -> EncLists<'static>;
+}
+
+/// The u16 list format has room for 2048 recipes and 4096 predicates. Recipe entries take two
+/// words.
+impl EncListEntry for u16 {
+    const PRED_START: usize = 0x1000;
+    const PRED_BITS: u8 = 12;
+    const ENCBITS: u8 = 0;
+
+    fn enclists(table: &'static [u16]) -> EncLists<'static> {
+        EncLists::U16(table)
+    }
+}
+
+/// The u32 list format packs the recipe and the encoding bits of a recipe entry into a single
+/// word.
+impl EncListEntry for u32 {
+    const PRED_START: usize = 0x8000_0000;
+    const PRED_BITS: u8 = 20;
+    const ENCBITS: u8 = 16;
+
+    fn enclists(table: &'static [u32]) -> EncLists<'static> {
+        EncLists::U32(table)
+    }
+}
+
+/// A table of encoding lists with any of the `EncListEntry` word types.
+#[derive(Clone, Copy)]
+pub enum EncLists<'a> {
+    U16(&'static [u16]),
+    U32(&'static [u32]),
+    /// A single list built by an `EncListCache`.
+    Filtered(&'a [u32]),
+}
 
 /// An iterator over legal encodings for the instruction.
 pub struct Encodings<'a> {
@@ -176,9 +765,8 @@ pub struct Encodings<'a> {
     offset: usize,
     // Legalization code to use of no encoding is found.
     legalize: LegalizeCode,
-    inst: &'a InstructionData,
-    dfg: &'a DataFlowGraph,
-    enclist: &'static [EncListEntry],
+    leafs: LeafValues<'a>,
+    enclist: EncLists<'a>,
     legalize_actions: &'static [Legalize],
     recipe_preds: &'static [RecipePredicate],
     inst_preds: &'static [InstPredicate],
@@ -196,7 +784,7 @@ impl<'a> Encodings<'a> {
         legalize: LegalizeCode,
         inst: &'a InstructionData,
         dfg: &'a DataFlowGraph,
-        enclist: &'static [EncListEntry],
+        enclist: EncLists<'a>,
         legalize_actions: &'static [Legalize],
         recipe_preds: &'static [RecipePredicate],
         inst_preds: &'static [InstPredicate],
@@ -204,9 +792,8 @@ impl<'a> Encodings<'a> {
     ) -> Self {
         Encodings {
             offset,
-            inst,
-            dfg,
             legalize,
+            leafs: LeafValues::new(dfg, inst),
             isa_preds,
             recipe_preds,
             inst_preds,
@@ -226,57 +813,61 @@ impl<'a> Encodings<'a> {
     }
 
     /// Check if the `rpred` recipe predicate is satisfied.
-    fn check_recipe(&self, rpred: RecipePredicate) -> bool {
+    fn check_recipe(&mut self, rpred: RecipePredicate) -> bool {
         match rpred {
-            Some(p) => p(self.isa_preds, self.inst),
+            Some(p) => p(self.isa_preds, &mut self.leafs),
             None => true,
         }
     }
 
     /// Check an instruction or isa predicate.
-    fn check_pred(&self, pred: usize) -> bool {
+    fn check_pred(&mut self, pred: usize) -> bool {
         if let Some(&p) = self.inst_preds.get(pred) {
-            p(self.dfg, self.inst)
+            p(&mut self.leafs)
         } else {
             let pred = pred - self.inst_preds.len();
             self.isa_preds.test(pred)
         }
     }
-}
 
-impl<'a> Iterator for Encodings<'a> {
-    type Item = Encoding;
+    /// Get the next legal encoding from the encoding lists in `enclist`.
+    fn next_in<EncT: EncListEntry>(&mut self, enclist: &[EncT]) -> Option<Encoding> {
+        while let Some(&entry) = enclist.get(self.offset) {
+            let entry = entry.into() as usize;
 
-    fn next(&mut self) -> Option<Encoding> {
-        while let Some(entryref) = self.enclist.get(self.offset) {
-            let entry = *entryref as usize;
-
-            // Check for "recipe+bits".
-            let recipe = entry >> 1;
-            if let Some(&rpred) = self.recipe_preds.get(recipe) {
-                let bits = self.offset + 1;
-                if entry & 1 == 0 {
-                    self.offset += 2; // Next entry.
-                } else {
-                    self.offset = !0; // Stop.
-                }
-                if self.check_recipe(rpred) {
-                    return Some(Encoding::new(recipe as u16, self.enclist[bits]));
+            if entry < EncT::PRED_START {
+                let code = entry >> EncT::ENCBITS;
+
+                // Check for "recipe+bits".
+                let recipe = code >> 1;
+                if let Some(&rpred) = self.recipe_preds.get(recipe) {
+                    let bits = if EncT::ENCBITS == 0 {
+                        enclist[self.offset + 1].into() as u16
+                    } else {
+                        entry as u16
+                    };
+                    if code & 1 == 0 {
+                        // Next entry.
+                        self.offset += if EncT::ENCBITS == 0 { 2 } else { 1 };
+                    } else {
+                        self.offset = !0; // Stop.
+                    }
+                    if self.check_recipe(rpred) {
+                        return Some(Encoding::new(recipe as u16, bits));
+                    }
+                    continue;
                 }
-                continue;
-            }
 
-            // Check for "stop with legalize".
-            if entry < PRED_START {
-                self.legalize = (entry - 2 * self.recipe_preds.len()) as LegalizeCode;
+                // This is a "stop with legalize" entry.
+                self.legalize = (code - 2 * self.recipe_preds.len()) as LegalizeCode;
                 self.offset = !0; // Stop.
                 return None;
             }
 
             // Finally, this must be a predicate entry.
-            let pred_entry = entry - PRED_START;
-            let skip = pred_entry >> PRED_BITS;
-            let pred = pred_entry & PRED_MASK;
+            let pred_entry = entry - EncT::PRED_START;
+            let skip = pred_entry >> EncT::PRED_BITS;
+            let pred = pred_entry & ((1 << EncT::PRED_BITS) - 1);
 
             if self.check_pred(pred) {
                 self.offset += 1;
@@ -287,6 +878,81 @@ impl<'a> Iterator for Encodings<'a> {
                 self.offset += 1 + skip;
             }
         }
+        // A filtered list can end without a final entry.
+        self.offset = !0;
         None
     }
 }
+
+impl<'a> Iterator for Encodings<'a> {
+    type Item = Encoding;
+
+    fn next(&mut self) -> Option<Encoding> {
+        match self.enclist {
+            EncLists::U16(enclist) => self.next_in(enclist),
+            EncLists::U32(enclist) => self.next_in(enclist),
+            EncLists::Filtered(enclist) => self.next_in(enclist),
+        }
+    }
+}
+
+#[cfg(test)]
+mod tests {
+    use super::*;
+
+    // An encoding list with 4 recipes, 2 instruction predicates, and ISA predicates 0 and 1:
+    //
+    // skip 3 unless isap 0, skip 2 unless instp 0, recipe 1,
+    // skip 3 unless instp 1, skip 2 unless isap 1, recipe 2,
+    // stop unless isap 0, recipe 3 and stop.
+    const LIST: [u16; 11] = [
+        0x3002,
+        0x2000,
+        2,
+        0x10,
+        0x3001,
+        0x2003,
+        4,
+        0x20,
+        0x1002,
+        7,
+        0x30,
+    ];
+    const PREDS: [(u16, u16, bool); 5] = [
+        (0, 3, true),
+        (1, 2, false),
+        (4, 3, false),
+        (5, 2, true),
+        (8, 0, true),
+    ];
+
+    fn filter(isa_preds: u8) -> Vec<u32> {
+        filter_enclist(&LIST, &PREDS, 4, 2, PredicateView::new(&[isa_preds]))
+    }
+
+    #[test]
+    fn filter_all_true() {
+        assert_eq!(
+            filter(0b11),
+            [0x8010_0000, 0x0002_0010, 0x8010_0001, 0x0004_0020, 0x0007_0030]
+        );
+    }
+
+    #[test]
+    fn filter_skips() {
+        // The block guarded by instp 1 becomes empty, so the predicate is removed too.
+        assert_eq!(filter(0b01), [0x8010_0000, 0x0002_0010, 0x0007_0030]);
+    }
+
+    #[test]
+    fn filter_stop() {
+        assert_eq!(filter(0b00), []);
+    }
+
+    #[test]
+    fn caches_are_shareable() {
+        fn check<T: Send + Sync>() {}
+        check::<EncListCache>();
+        check::<NoEncListCache>();
+    }
+}
@@ -7,6 +7,7 @@ use ir::{self, InstBuilder};
 use ir::condcodes::IntCC;
 use isa::constraints::*;
 use isa::enc_tables::*;
+pub use isa::enc_tables::defaults::*;
 use isa::encoding::RecipeSizing;
 use isa;
 use predicates;
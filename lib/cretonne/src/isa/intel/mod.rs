@@ -8,7 +8,7 @@ mod registers;
 
 use binemit::{CodeSink, MemoryCodeSink, emit_function};
 use super::super::settings as shared_settings;
-use isa::enc_tables::{self as shared_enc_tables, lookup_enclist, Encodings};
+use isa::enc_tables::Encodings;
 use isa::Builder as IsaBuilder;
 use isa::{TargetIsa, RegInfo, RegClass, EncInfo};
 use ir;
@@ -22,7 +22,11 @@ use std::boxed::Box;
 struct Isa {
     shared_flags: shared_settings::Flags,
     isa_flags: settings::Flags,
-    cpumode: &'static [shared_enc_tables::Level1Entry<u16>],
+    cpumode: &'static [enc_tables::IsaLevel1Entry],
+    /// Encoding lists filtered for `isa_flags`.
+    enclist_cache: enc_tables::IsaEncListCache,
+    /// Encoding tables specialized for a settings preset matching `isa_flags`, if any.
+    preset_tables: Option<&'static enc_tables::PresetTables>,
 }
 
 /// Get an ISA builder for creating Intel targets.
@@ -37,15 +41,28 @@ fn isa_constructor(
     shared_flags: shared_settings::Flags,
     builder: &shared_settings::Builder,
 ) -> Box<TargetIsa> {
-    let level1 = if shared_flags.is_64bit() {
-        &enc_tables::LEVEL1_I64[..]
+    let (level1, preset_tables) = if shared_flags.is_64bit() {
+        (&enc_tables::LEVEL1_I64[..], &enc_tables::PRESET_TABLES_I64[..])
     } else {
-        &enc_tables::LEVEL1_I32[..]
+        (&enc_tables::LEVEL1_I32[..], &enc_tables::PRESET_TABLES_I32[..])
     };
+    let isa_flags = settings::Flags::new(&shared_flags, builder);
+    let preset_tables = preset_tables.iter().find(
+        |t| t.matches(isa_flags.predicate_view()),
+    );
+    let enclist_cache = enc_tables::IsaEncListCache::new(
+        &enc_tables::ENCLISTS[..],
+        &enc_tables::ISAP_ENCLISTS[..],
+        &enc_tables::RECIPE_PREDICATES[..],
+        &enc_tables::INST_PREDICATES[..],
+        isa_flags.predicate_view(),
+    );
     Box::new(Isa {
-        isa_flags: settings::Flags::new(&shared_flags, builder),
+        isa_flags,
         shared_flags,
         cpumode: level1,
+        preset_tables,
+        enclist_cache,
     })
 }
 
@@ -72,12 +89,23 @@ impl TargetIsa for Isa {
         inst: &'a ir::InstructionData,
         ctrl_typevar: ir::Type,
     ) -> Encodings<'a> {
-        lookup_enclist(
+        if let Some(tables) = self.preset_tables {
+            return tables.lookup_enclist(
+                ctrl_typevar,
+                inst,
+                dfg,
+                &enc_tables::LEGALIZE_ACTIONS[..],
+                &enc_tables::INST_PREDICATES[..],
+                self.isa_flags.predicate_view(),
+            );
+        }
+        self.enclist_cache.lookup_enclist(
             ctrl_typevar,
             inst,
             dfg,
             self.cpumode,
             &enc_tables::LEVEL2[..],
+            &enc_tables::LEVEL2_DISPLACEMENTS[..],
             &enc_tables::ENCLISTS[..],
             &enc_tables::LEGALIZE_ACTIONS[..],
             &enc_tables::RECIPE_PREDICATES[..],
@@ -4,6 +4,7 @@ use ir;
 use isa;
 use isa::constraints::*;
 use isa::enc_tables::*;
+pub use isa::enc_tables::defaults::*;
 use isa::encoding::RecipeSizing;
 use predicates;
 use super::registers::*;
@@ -8,7 +8,7 @@ mod registers;
 
 use super::super::settings as shared_settings;
 use binemit::{CodeSink, MemoryCodeSink, emit_function};
-use isa::enc_tables::{self as shared_enc_tables, lookup_enclist, Encodings};
+use isa::enc_tables::Encodings;
 use isa::Builder as IsaBuilder;
 use isa::{TargetIsa, RegInfo, RegClass, EncInfo};
 use ir;
@@ -20,7 +20,9 @@ use std::boxed::Box;
 struct Isa {
     shared_flags: shared_settings::Flags,
     isa_flags: settings::Flags,
-    cpumode: &'static [shared_enc_tables::Level1Entry<u16>],
+    cpumode: &'static [enc_tables::IsaLevel1Entry],
+    /// Encoding lists filtered for `isa_flags`.
+    enclist_cache: enc_tables::IsaEncListCache,
 }
 
 /// Get an ISA builder for creating RISC-V targets.
@@ -40,10 +42,19 @@ fn isa_constructor(
     } else {
         &enc_tables::LEVEL1_RV32[..]
     };
+    let isa_flags = settings::Flags::new(&shared_flags, builder);
+    let enclist_cache = enc_tables::IsaEncListCache::new(
+        &enc_tables::ENCLISTS[..],
+        &enc_tables::ISAP_ENCLISTS[..],
+        &enc_tables::RECIPE_PREDICATES[..],
+        &enc_tables::INST_PREDICATES[..],
+        isa_flags.predicate_view(),
+    );
     Box::new(Isa {
-        isa_flags: settings::Flags::new(&shared_flags, builder),
+        isa_flags,
         shared_flags,
         cpumode: level1,
+        enclist_cache,
     })
 }
 
@@ -70,12 +81,13 @@ impl TargetIsa for Isa {
         inst: &'a ir::InstructionData,
         ctrl_typevar: ir::Type,
     ) -> Encodings<'a> {
-        lookup_enclist(
+        self.enclist_cache.lookup_enclist(
             ctrl_typevar,
             inst,
             dfg,
             self.cpumode,
             &enc_tables::LEVEL2[..],
+            &enc_tables::LEVEL2_DISPLACEMENTS[..],
             &enc_tables::ENCLISTS[..],
             &enc_tables::LEGALIZE_ACTIONS[..],
             &enc_tables::RECIPE_PREDICATES[..],
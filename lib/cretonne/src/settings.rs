@@ -183,6 +183,15 @@ impl<'a> PredicateView<'a> {
     pub fn test(self, p: usize) -> bool {
         self.0[p / 8] & (1 << (p % 8)) != 0
     }
+
+    /// Check if the predicates selected by the `(mask, value)` pairs have the given values.
+    ///
+    /// Each pair applies to a byte of the predicate vector, starting from the first.
+    pub fn matches(self, predicates: &[(u8, u8)]) -> bool {
+        predicates.iter().zip(self.0).all(
+            |(&(mask, value), &byte)| byte & mask == value,
+        )
+    }
 }
 
 /// Implementation details for generated code.
@@ -345,7 +354,7 @@ impl<'a> From<&'a TargetIsa> for FlagsOrIsa<'a> {
 
 #[cfg(test)]
 mod tests {
-    use super::{builder, Flags};
+    use super::{builder, Flags, PredicateView};
     use super::Error::*;
     use super::Configurable;
     use std::string::ToString;
@@ -400,4 +409,15 @@ mod tests {
         assert_eq!(f.enable_simd(), false);
         assert_eq!(f.opt_level(), super::OptLevel::Best);
     }
+
+    #[test]
+    fn predicate_view_matches() {
+        let bytes = [0b0101, 0b1000];
+        let view = PredicateView::new(&bytes);
+        assert!(view.matches(&[]));
+        assert!(view.matches(&[(0b0111, 0b0101)]));
+        assert!(view.matches(&[(0, 0), (0b1100, 0b1000)]));
+        assert!(!view.matches(&[(0b0010, 0b0010)]));
+        assert!(!view.matches(&[(0b0001, 0b0001), (0b1000, 0)]));
+    }
 }